@@ -0,0 +1,142 @@
+"""นับสต็อกแบบไม่มีหน้าจอ (Headless) จากโฟลเดอร์รูปภาพหรือไฟล์วิดีโอ
+
+ตัวอย่าง:
+    python batch_count.py shelf_photos/ --out counts.csv
+    python batch_count.py walkthrough.mp4 --every 10 --out counts.jsonl --save-stock
+    python batch_count.py walkthrough.mp4 --track --every 3 --save-stock
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+import cv2
+
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+def iter_images(folder):
+    """อ่านรูปภาพทีละไฟล์จากโฟลเดอร์ (เรียงตามชื่อ) คืนค่า (ชื่อไฟล์, ภาพ BGR)"""
+    for name in sorted(os.listdir(folder)):
+        if not name.lower().endswith(IMAGE_EXTS): continue
+        img = cv2.imread(os.path.join(folder, name))
+        if img is None: print(f"skip unreadable image: {name}", file=sys.stderr); continue
+        yield name, img
+
+def iter_video(path, every=1):
+    """อ่านเฟรมจากไฟล์วิดีโอ เลือกทุก ๆ every เฟรม คืนค่า (เลขเฟรม, ภาพ BGR)"""
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened(): raise SystemExit(f"Can't open video: {path}")
+    i = 0
+    try:
+        while True:
+            ok, frame = cap.read()
+            if not ok: break
+            if i % every == 0: yield f"frame_{i}", frame
+            i += 1
+    finally: cap.release()
+
+def batched(items, size):
+    """รวมรายการเป็นกลุ่มละ size ชิ้นสำหรับส่งเข้าโมเดลครั้งเดียว"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size: yield batch; batch = []
+    if batch: yield batch
+
+class CountWriter:
+    """เขียนผลนับของแต่ละไฟล์ลง CSV (source, product, count) หรือ JSONL ทันทีที่ได้ผล"""
+    def __init__(self, path):
+        self.f = open(path, 'w', newline='', encoding='utf-8') if path else sys.stdout
+        self.jsonl = bool(path) and path.lower().endswith('.jsonl')
+        self.w = None if self.jsonl else csv.writer(self.f)
+        if self.w: self.w.writerow(['source', 'product', 'count'])
+
+    def write(self, source, counts):
+        if self.jsonl: self.f.write(json.dumps({'source': source, 'counts': counts}, ensure_ascii=False) + '\n')
+        else:
+            for n, c in counts.items(): self.w.writerow([source, n, c])
+        self.f.flush()
+
+    def close(self):
+        if self.f is not sys.stdout: self.f.close()
+
+def run(source, detector, batch_size=8, confidence=0.5, out=None, every=1):
+    """ประมวลผลทั้งโฟลเดอร์/วิดีโอเป็น Batch คืนค่า (ยอดรวมต่อสินค้า, จำนวนภาพ, จำนวนภาพที่ตรวจจับไม่สำเร็จ, เวลาที่ใช้)
+
+    โฟลเดอร์รูปภาพ: ยอดรวม = ผลรวมของทุกภาพ (แต่ละภาพคือคนละชั้นวาง)
+    วิดีโอ: ยอดรวม = ค่าสูงสุดต่อสินค้าในเฟรมใดเฟรมหนึ่ง เพราะของชิ้นเดิมปรากฏซ้ำหลายเฟรม
+    Batch ที่โมเดลล้มเหลวจะไม่ถูกเขียนหรือรวมยอด (ไม่ใช้ผล Mock) และนับเป็นภาพที่ไม่สำเร็จ
+    """
+    is_video = not os.path.isdir(source)
+    frames = iter_video(source, every) if is_video else iter_images(source)
+    writer, totals, n, failed, t0 = CountWriter(out), {}, 0, 0, time.perf_counter()
+    try:
+        for batch in batched(frames, batch_size):
+            names, imgs = zip(*batch)
+            n += len(batch)
+            try: results = detector.detect_batch_boxes(imgs, confidence)
+            except Exception as e:
+                print(f"detection failed for {names[0]}..{names[-1]}: {e}", file=sys.stderr)
+                failed += len(batch); continue
+            for name, (counts, _) in zip(names, results):
+                writer.write(name, counts)
+                for p, c in counts.items():
+                    totals[p] = max(totals.get(p, 0), c) if is_video else totals.get(p, 0) + c
+    finally: writer.close()
+    return totals, n, failed, time.perf_counter() - t0
+
+def run_tracked(source, detector, confidence=0.5, out=None, every=3):
+    """นับวิดีโอด้วยการติดตามวัตถุข้ามเฟรม: ของชิ้นเดิมถูกนับครั้งเดียวแม้กล้องจะแพนผ่านหลายเฟรม
+
+    ตรวจจับทุก every เฟรม และเขียนยอดนับไม่ซ้ำสะสม ณ เฟรมที่ตรวจจับลงไฟล์
+    เฟรมที่โมเดลล้มเหลวนับเป็นเฟรมที่ไม่สำเร็จ (ยอดรวมจึงอาจขาด main จะไม่บันทึกลงสต็อก)
+    """
+    from object_tracker import TrackingCounter
+    tc = TrackingCounter(detector, every, confidence, raise_errors=True)
+    writer, n, failed, counts, t0 = CountWriter(out), 0, 0, {}, time.perf_counter()
+    try:
+        for name, frame in iter_video(source):
+            n += 1
+            detected = tc.frame_no % tc.detect_every == 0
+            try: _, counts = tc.update(frame)
+            except Exception as e:
+                print(f"detection failed for {name}: {e}", file=sys.stderr)
+                failed += 1; continue
+            if detected: writer.write(name, counts)
+    finally: writer.close()
+    return counts, n, failed, time.perf_counter() - t0
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Batch stock counting with YOLODetector')
+    ap.add_argument('source', help='folder of images or a video file')
+    ap.add_argument('--model', default='yolov8n.pt')
+    ap.add_argument('--batch', type=int, default=8, help='images per model call')
+    ap.add_argument('--conf', type=float, default=0.5)
+    ap.add_argument('--every', type=int, default=1, help='video: use every N-th frame (with --track: detect every N frames)')
+    ap.add_argument('--track', action='store_true', help='video: count unique objects across frames with a tracker')
+    ap.add_argument('--out', help='output .csv or .jsonl (default: CSV to stdout)')
+    ap.add_argument('--save-stock', action='store_true', help='add the totals to StockData')
+    args = ap.parse_args(argv)
+
+    from yolo_detector import YOLODetector
+    detector = YOLODetector(args.model, cache_ttl=0)
+    # ไม่มีโมเดลก็ไม่มีผลนับจริง (ผล Mock ต้องไม่ถูกเขียนลงไฟล์หรือสต็อก)
+    if not detector.enabled: raise SystemExit(f"Can't count without a model: {args.model}")
+    if args.track and not os.path.isdir(args.source):
+        totals, n, failed, elapsed = run_tracked(args.source, detector, args.conf, args.out, max(1, args.every))
+    else: totals, n, failed, elapsed = run(args.source, detector, args.batch, args.conf, args.out, max(1, args.every))
+
+    print(f"totals: {totals}", file=sys.stderr)
+    print(f"{n} images in {elapsed:.2f}s ({n / elapsed if elapsed else 0:.1f} images/s)", file=sys.stderr)
+    if failed:
+        # ยอดรวมขาดภาพที่ล้มเหลวไป จึงไม่บันทึกลงสต็อก
+        raise SystemExit(f"{failed} of {n} images failed detection" + (", totals not saved to stock" if args.save_stock else ''))
+    if args.save_stock and totals:
+        from stock_backend import open_stock_data
+        stock_data = open_stock_data() # ตาม STOCK_BACKEND / STOCK_FILE
+        stock_data.add_records(totals)
+        print(f"saved {len(totals)} products to {getattr(stock_data, 'filename', 'memory')}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""วัดประสิทธิภาพของระบบจัดเก็บ รวมยอด ค้นหา และตรวจจับ เทียบกับขนาดประวัติสต็อก (ผลลัพธ์เป็น JSON)
+
+สร้างประวัติสังเคราะห์ (สุ่มด้วย seed เดิมทุกครั้ง) ขนาดตาม --sizes แล้วจับเวลา
+add_record, update_record, delete_record, get_product_daily_trends, export_to_csv,
+การกรองรายการแบบเดียวกับ StockListScreen.refresh (ไม่เปิดหน้าจอ) และการตรวจจับของ YOLODetector
+(ถ้าไม่มีไฟล์ Weights หรือ ultralytics จะวัดตัวจำลอง Mock และระบุไว้ในผล)
+ทุก Backend ใน stock_backend (journal, sqlite, json, memory) วัดด้วยชุดเดียวกัน เพื่อเลือก Backend ตามขนาดประวัติของแต่ละร้าน
+ส่วน startup วัดเวลาเปิด StockData ใน Process ใหม่ (Cold start) เทียบการ Parse JSON กับการเปิด Snapshot ไบนารี
+ตัวอย่าง:
+    python bench_stock.py --sizes 10000,100000,1000000 --json bench_v1.json
+    python bench_stock.py --backends all --sizes 10000,100000 --skip-detect --json backends.json
+    python bench_stock.py --backends journal,sqlite --images shelf_photos/ --json bench_v2.json
+    python bench_stock.py --sizes 0 --skip-detect --startup-sizes 100000,1000000
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+PRODUCTS = [f"product_{i:02d}" for i in range(40)] + ['milk', 'Milk Tea', 'bottle', 'cup', 'snack']
+QUERIES = [('', ''), ('milk', ''), ('product_1', ''), ('', '2025-06'), ('', '2025-01..2025-03'), ('cup', '2025-02'), ('', '10:3')]
+
+def synthetic_records(n, seed=0, days=730):
+    """ประวัติสังเคราะห์ n รายการ เรียงตามเวลา กระจายใน days วันย้อนหลังจาก 2025-01-01"""
+    rnd, start = random.Random(seed), datetime(2025, 1, 1)
+    step = days * 86400 / max(n, 1)
+    for i in range(n):
+        ts = start + timedelta(seconds=int(i * step))
+        yield {'product_name': rnd.choice(PRODUCTS), 'count': rnd.randint(0, 50), 'timestamp': ts.strftime('%Y-%m-%d %H:%M:%S')}
+
+def seed_store(backend, folder, name, records):
+    """สร้าง Backend (ตามชื่อใน stock_backend.BACKENDS) ที่มีประวัติ records ในโฟลเดอร์ folder
+    คืนค่า (stock_data, เวลาเปิดเป็นวินาที) ใช้ร่วมกับ conformance_stock"""
+    from stock_backend import BACKENDS, open_stock_data
+    if backend == 'memory':
+        from stock_memory import MemoryStockData
+        records = list(records)
+        t0 = time.perf_counter(); stock_data = MemoryStockData(records)
+        return stock_data, time.perf_counter() - t0
+    path = os.path.join(folder, name + os.path.splitext(BACKENDS[backend][2])[1])
+    if backend == 'sqlite':
+        from stock_sqlite import SQLiteStockData
+        db = SQLiteStockData(path)
+        with db.conn:
+            db.conn.executemany('INSERT INTO records (product_name, count, timestamp, day) VALUES (?, ?, ?, ?)',
+                                ((r['product_name'], r['count'], r['timestamp'], r['timestamp'][:10]) for r in records))
+        db.close()
+    else:
+        # journal นำเข้าจากไฟล์ JSON แบบเดิมในครั้งแรกที่เปิด ส่วน json อ่านไฟล์นี้โดยตรง
+        with open(path, 'w', encoding='utf-8') as f: json.dump(list(records), f, ensure_ascii=False)
+    t0 = time.perf_counter(); stock_data = open_stock_data(backend, path)
+    return stock_data, time.perf_counter() - t0
+
+def summarize(samples):
+    """สรุปเวลา (วินาที) เป็นมิลลิวินาที: จำนวนครั้ง ค่าเฉลี่ย p50 p95 p99 และค่าสูงสุด"""
+    s = sorted(samples)
+    pct = lambda q: s[min(len(s) - 1, int(q * len(s)))] * 1000
+    return {'n': len(s), 'mean_ms': round(statistics.mean(s) * 1000, 4), 'p50_ms': round(pct(0.5), 4),
+            'p95_ms': round(pct(0.95), 4), 'p99_ms': round(pct(0.99), 4), 'max_ms': round(s[-1] * 1000, 4)}
+
+def repeat(fn, times):
+    samples = []
+    for i in range(times):
+        t0 = time.perf_counter(); fn(i); samples.append(time.perf_counter() - t0)
+    return summarize(samples)
+
+def bench_store(backend, n, ops, seed, folder):
+    from stock_search import StockSearch
+    rnd = random.Random(seed + 1)
+    stock_data, load_s = seed_store(backend, folder, f"bench_{backend}_{n}", synthetic_records(n, seed))
+    res = {'backend': backend, 'records': n, 'load_ms': round(load_s * 1000, 2), 'ops': ops}
+
+    res['add_record'] = repeat(lambda i: stock_data.add_record(rnd.choice(PRODUCTS), rnd.randint(0, 50)), ops)
+    keys = [k for k, _ in stock_data.query_records()] # id ของแต่ละรายการที่ใช้กับ update/delete
+    res['update_record'] = repeat(lambda i: stock_data.update_record(rnd.choice(keys), rnd.choice(PRODUCTS), rnd.randint(0, 50)), ops)
+    def delete(i):
+        k = rnd.choice(keys)
+        stock_data.delete_record(k); keys.remove(k)
+    res['delete_record'] = repeat(delete, ops)
+    res['get_product_daily_trends'] = repeat(lambda i: stock_data.get_product_daily_trends(), 5)
+    res['export_to_csv'] = repeat(lambda i: os.remove(stock_data.export_to_csv()), 1 if n >= 500000 else 3)
+
+    # เหมือน StockListScreen.refresh: ค้นหาผ่าน StockSearch แล้วสร้าง data ของ RecycleView (ครั้งแรกรวมการสร้างดัชนี)
+    searcher, refresh = StockSearch(stock_data), {}
+    for name, date in QUERIES:
+        refresh[f"{name}|{date}"] = repeat(lambda i: [{'key': k, 'record': r} for k, r in searcher.query(name, date)], 3)
+    res['refresh'] = refresh
+    # พิมพ์ทีละตัวอักษร (ค้นหาต่อยอดจากผลเดิม)
+    res['refresh_typing'] = repeat(lambda i: searcher.query('milk tea'[:i + 1], ''), len('milk tea'))
+    stock_data.close()
+    return res
+
+# รันใน Process ใหม่ทุกครั้ง: mode 'json' คือ json.load อย่างเดียว (ขั้นต่ำของการโหลดแบบเดิม) 'store' คือ StockData(path)
+_STARTUP = """import json, sys, time
+mode, path = sys.argv[1:3]
+t0 = time.perf_counter()
+if mode == 'json':
+    with open(path, encoding='utf-8') as f: json.load(f)
+    print(json.dumps({'load_ms': (time.perf_counter() - t0) * 1000})); sys.exit()
+from stock_store import StockData
+t1 = time.perf_counter(); s = StockData(path); t2 = time.perf_counter()
+s.query_records('milk', ''); t3 = time.perf_counter()
+s.get_product_daily_trends(); t4 = time.perf_counter()
+print(json.dumps({'import_ms': (t1 - t0) * 1000, 'load_ms': (t2 - t1) * 1000, 'first_query_ms': (t3 - t2) * 1000, 'trends_ms': (t4 - t3) * 1000}))
+"""
+
+def cold_start(mode, path, runs):
+    """จับเวลาใน Process ใหม่ runs ครั้ง คืนค่ามัธยฐานของแต่ละค่า (มิลลิวินาที)"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    samples = []
+    for _ in range(runs):
+        if mode == 'import' and os.path.exists(os.path.splitext(path)[0] + '.snap'): os.remove(os.path.splitext(path)[0] + '.snap')
+        out = subprocess.run([sys.executable, '-c', _STARTUP, 'json' if mode == 'json' else 'store', path],
+                             capture_output=True, text=True, cwd=here, check=True).stdout
+        samples.append(json.loads(out.strip().splitlines()[-1]))
+    return {k: round(statistics.median(s[k] for s in samples), 2) for k in samples[0]}
+
+def bench_startup(n, seed, folder, runs=3):
+    """เวลาเปิดประวัติ n รายการ: Parse JSON แบบเดิม, นำเข้าจาก JSON ครั้งแรก (สร้าง .snap) และเปิด Snapshot ด้วย mmap"""
+    path = os.path.join(folder, f"startup_{n}.json")
+    with open(path, 'w', encoding='utf-8') as f: json.dump(list(synthetic_records(n, seed)), f, ensure_ascii=False, indent=2)
+    res = {'records': n, 'json_mb': round(os.path.getsize(path) / 1e6, 2)}
+    res['json_parse'] = cold_start('json', path, runs)
+    res['json_import'] = cold_start('import', path, runs)
+    res['snapshot_open'] = cold_start('snapshot', path, runs)
+    res['snapshot_mb'] = round(os.path.getsize(os.path.splitext(path)[0] + '.snap') / 1e6, 2)
+    return res
+
+def sample_images(folder, limit=16):
+    """ภาพทดสอบจากโฟลเดอร์ หรือภาพสุ่มขนาด 640x480 ถ้าไม่ได้ระบุ"""
+    if folder:
+        from batch_count import iter_images
+        return [img for _, img in zip(range(limit), iter_images(folder))]
+    import numpy as np
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 255, (480, 640, 3), dtype=np.uint8) for _ in range(limit)]
+
+def bench_detection(model, images_folder, runs):
+    from yolo_detector import YOLODetector
+    detector = YOLODetector(model, cache_ttl=0) # วัดเวลาโมเดลจริง ไม่ใช่ผลจากแคช
+    imgs = sample_images(images_folder)
+    res = {'model': model, 'mock': not detector.enabled, 'images': len(imgs)}
+    if not imgs: return res
+    detector.detect_from_array(imgs[0]) # อุ่นเครื่อง
+    res['detect_from_array'] = repeat(lambda i: detector.detect_from_array(imgs[i % len(imgs)]), runs)
+    res['detect_batch'] = repeat(lambda i: detector.detect_batch(imgs), max(1, runs // len(imgs)))
+    detector.shutdown()
+    return res
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError: return None
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Stock counter benchmark suite')
+    ap.add_argument('--sizes', default='10000,100000,1000000', help='comma-separated history sizes')
+    ap.add_argument('--backends', default='journal', help='comma-separated: journal,sqlite,json,memory (or all)')
+    ap.add_argument('--ops', type=int, default=200, help='timed add/update/delete calls per size')
+    ap.add_argument('--rewrite-max', type=int, default=100000,
+                    help='largest history for the json backend (it rewrites the whole file on every write)')
+    ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--model', default='yolov8n.pt')
+    ap.add_argument('--images', help='folder of sample images (default: random frames)')
+    ap.add_argument('--detect-runs', type=int, default=32)
+    ap.add_argument('--skip-detect', action='store_true')
+    ap.add_argument('--startup-sizes', default='100000,1000000', help='history sizes for the cold-start benchmark')
+    ap.add_argument('--startup-runs', type=int, default=3, help='fresh processes per startup measurement')
+    ap.add_argument('--skip-startup', action='store_true')
+    ap.add_argument('--json', help='write results to this file (default: stdout)')
+    args = ap.parse_args(argv)
+
+    out = {'meta': {'time': datetime.now().isoformat(timespec='seconds'), 'git': git_revision(),
+                    'python': sys.version.split()[0], 'platform': platform.platform(), 'seed': args.seed, 'ops': args.ops},
+           'storage': [], 'startup': [], 'detection': None}
+    folder, cwd = tempfile.mkdtemp(prefix='bench_stock_'), os.getcwd()
+    try:
+        os.chdir(folder) # export_to_csv เขียนไฟล์ลงโฟลเดอร์ปัจจุบัน
+        from stock_backend import BACKENDS
+        for backend in (list(BACKENDS) if args.backends == 'all' else args.backends.split(',')):
+            for n in (int(s) for s in args.sizes.split(',') if int(s)):
+                if backend == 'json' and n > args.rewrite_max:
+                    print(f"json {n}: skipped (--rewrite-max {args.rewrite_max})", file=sys.stderr); continue
+                # json เขียนไฟล์ใหม่ทั้งไฟล์ทุกครั้ง จึงจับเวลาการเขียนน้อยครั้งกว่า
+                res = bench_store(backend, n, min(args.ops, 20) if backend == 'json' else args.ops, args.seed, folder)
+                out['storage'].append(res)
+                print(f"{backend} {n}: load {res['load_ms']:.0f} ms | add p50 {res['add_record']['p50_ms']:.3f} ms"
+                      f" | trends {res['get_product_daily_trends']['p50_ms']:.1f} ms | export {res['export_to_csv']['p50_ms']:.0f} ms",
+                      file=sys.stderr)
+        for n in ([] if args.skip_startup else (int(s) for s in args.startup_sizes.split(','))):
+            res = bench_startup(n, args.seed, folder, args.startup_runs)
+            out['startup'].append(res)
+            print(f"startup {n}: json parse {res['json_parse']['load_ms']:.0f} ms | import {res['json_import']['load_ms']:.0f} ms"
+                  f" | snapshot {res['snapshot_open']['load_ms']:.1f} ms", file=sys.stderr)
+    finally:
+        os.chdir(cwd); shutil.rmtree(folder, ignore_errors=True)
+    if not args.skip_detect: out['detection'] = bench_detection(args.model, args.images, args.detect_runs)
+
+    text = json.dumps(out, indent=2, ensure_ascii=False)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f: f.write(text)
+    else: print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""เปรียบเทียบการตรวจจับแบบภาพเดียว (Single-shot) กับแบบแบ่ง Tile ทั้งความแม่นยำของยอดนับและเวลาที่ใช้
+
+ถ้ามีไฟล์ Label แบบ YOLO (labels/<ชื่อภาพ>.txt บรรทัดละ "class cx cy w h") จะคำนวณความคลาดเคลื่อนเทียบกับยอดจริง
+ตัวอย่าง:
+    python bench_tiling.py shelf_photos/ --tile 640 --overlap 0.2 --json bench_tiling.json
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+from collections import Counter
+
+def load_truth(folder, name, names):
+    """อ่านยอดจริงจากไฟล์ Label ของ YOLO (ถ้าไม่มีคืนค่า None)"""
+    path = os.path.join(folder, 'labels', os.path.splitext(name)[0] + '.txt')
+    if not os.path.exists(path): return None
+    with open(path) as f:
+        return dict(Counter(names[int(line.split()[0])] for line in f if line.strip()))
+
+def count_error(pred, truth):
+    """ผลรวมความต่างของยอดนับทุกคลาส (Absolute count error)"""
+    return sum(abs(pred.get(k, 0) - truth.get(k, 0)) for k in set(pred) | set(truth))
+
+def timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    res = fn(*args, **kwargs)
+    return res, (time.perf_counter() - t0) * 1000
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Single-shot vs tiled detection benchmark')
+    ap.add_argument('folder', help='folder of high-resolution shelf images')
+    ap.add_argument('--model', default='yolov8n.pt')
+    ap.add_argument('--conf', type=float, default=0.5)
+    ap.add_argument('--tile', type=int, default=640)
+    ap.add_argument('--overlap', type=float, default=0.2)
+    ap.add_argument('--json', help='write per-image results to this file')
+    args = ap.parse_args(argv)
+
+    from batch_count import iter_images
+    from yolo_detector import YOLODetector
+    detector = YOLODetector(args.model, cache_ttl=0) # ไม่ใช้แคช ไม่เช่นนั้นภาพแรกจะได้ผลจากรอบอุ่นเครื่อง
+    if not detector.enabled: raise SystemExit("model is not available, can't benchmark detection")
+    names = detector.names
+
+    rows = []
+    for name, img in iter_images(args.folder):
+        if not rows: detector.detect_tiled(img, args.conf, args.tile, args.overlap) # อุ่นเครื่องก่อนจับเวลาภาพแรก
+        single, t_single = timed(detector.detect_from_array, img, args.conf)
+        tiled, t_tiled = timed(detector.detect_tiled, img, args.conf, args.tile, args.overlap)
+        truth = load_truth(args.folder, name, names)
+        row = {'image': name, 'size': list(img.shape[1::-1]), 'single': single, 'tiled': tiled,
+               'single_ms': round(t_single, 1), 'tiled_ms': round(t_tiled, 1), 'truth': truth}
+        if truth is not None:
+            row['single_error'], row['tiled_error'] = count_error(single, truth), count_error(tiled, truth)
+        rows.append(row)
+        print(f"{name}: single {sum(single.values())} obj {t_single:.0f} ms | tiled {sum(tiled.values())} obj {t_tiled:.0f} ms"
+              + (f" | truth {sum(truth.values())}" if truth is not None else ''))
+
+    if not rows: raise SystemExit("no images found")
+    summary = {'images': len(rows), 'tile': args.tile, 'overlap': args.overlap,
+               'single_ms_median': statistics.median(r['single_ms'] for r in rows),
+               'tiled_ms_median': statistics.median(r['tiled_ms'] for r in rows),
+               'single_objects': sum(sum(r['single'].values()) for r in rows),
+               'tiled_objects': sum(sum(r['tiled'].values()) for r in rows)}
+    labelled = [r for r in rows if r['truth'] is not None]
+    if labelled:
+        summary['single_mae'] = statistics.mean(r['single_error'] for r in labelled)
+        summary['tiled_mae'] = statistics.mean(r['tiled_error'] for r in labelled)
+    print(json.dumps(summary, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'summary': summary, 'images': rows}, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
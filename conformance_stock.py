@@ -0,0 +1,227 @@
+"""ชุดตรวจความถูกต้องที่ทุก Backend ของข้อมูลสต็อก (stock_backend.BACKENDS) ต้องผ่าน
+
+แต่ละข้อเปิด Backend ใหม่ในโฟลเดอร์ชั่วคราว (บางข้อเริ่มจากประวัติตัวอย่างหลายวัน) แล้วตรวจพฤติกรรมตาม BaseStockData:
+id ที่คงที่, version, transaction, การกรอง/เรียงลำดับ, การอ่านทีละก้อน, ยอดรวมรายวัน, การส่งออก และการเปิดไฟล์ใหม่
+ผลรวมต่าง ๆ ถูกเทียบกับการคำนวณตรงจาก get_all_records() และค่าที่รู้ล่วงหน้าของประวัติตัวอย่าง
+Backend ใหม่ให้เพิ่มใน BACKENDS แล้วรันสคริปต์นี้จนผ่านทุกข้อ
+ตัวอย่าง:
+    python conformance_stock.py
+    python conformance_stock.py --backends journal,sqlite -v
+"""
+import argparse
+import csv
+import os
+import shutil
+import sys
+import tempfile
+import traceback
+from bench_stock import seed_store
+from stock_backend import BACKENDS, open_stock_data
+from stock_export import export_records
+
+# ประวัติตัวอย่าง (รูปแบบ stock_data.json เดิม ไม่มี id) เรียงตามเวลา
+HISTORY = [
+    {'product_name': 'milk', 'count': 3, 'timestamp': '2026-01-05 09:00:00'},
+    {'product_name': 'Milk Tea', 'count': 2, 'timestamp': '2026-01-05 10:30:00'},
+    {'product_name': 'bread', 'count': 5, 'timestamp': '2026-01-20 18:15:00'},
+    {'product_name': 'milk', 'count': 4, 'timestamp': '2026-02-01 10:30:00'},
+    {'product_name': 'juice', 'count': 1, 'timestamp': '2026-02-14 12:00:00'},
+    {'product_name': 'milk', 'count': 6, 'timestamp': '2026-02-14 13:45:00'},
+    {'product_name': 'bread', 'count': 2, 'timestamp': '2026-03-03 08:00:00'},
+]
+
+CHECKS = []
+
+def check(fn):
+    CHECKS.append(fn)
+    return fn
+
+def expect(cond, msg):
+    if not cond: raise AssertionError(msg)
+
+def plain(r):
+    return {k: r[k] for k in ('id', 'product_name', 'count', 'timestamp', 'version')}
+
+def reference_totals(records, name='', day=('', '\x7f')):
+    """ยอดรวมรายวันที่คำนวณตรงจากรายการ [(วัน, สินค้า, ยอดรวม, จำนวนรายการ)]"""
+    totals = {}
+    for r in records:
+        d = r['timestamp'][:10]
+        if name.lower() in r['product_name'].lower() and day[0] <= d < day[1]:
+            t = totals.setdefault((d, r['product_name']), [0, 0]); t[0] += r['count']; t[1] += 1
+    return sorted((d, n, t[0], t[1]) for (d, n), t in totals.items())
+
+@check
+def add_and_get(make):
+    s = make()
+    ids = [s.add_record('milk', 3), s.add_record('bread', '5')]
+    expect(len(set(ids)) == 2, f"ids not unique: {ids}")
+    r = s.get_record(ids[1])
+    expect(r is not None and r['product_name'] == 'bread' and r['count'] == 5 and r['version'] == 0, f"get_record: {r}")
+    expect(len(r['timestamp']) == 19 and r['timestamp'][10] == ' ', f"timestamp format: {r['timestamp']}")
+    expect(s.get_record(max(ids) + 1000) is None, 'get_record of missing id should be None')
+    expect([x['id'] for x in s.get_all_records()] == ids, 'get_all_records should be ordered by id')
+
+@check
+def ids_stable_after_delete(make):
+    s = make()
+    ids = [s.add_record(f"p{i}", i) for i in range(5)]
+    expect(s.delete_record(ids[1]), 'delete_record failed')
+    for i in (0, 2, 3, 4): expect(s.get_record(ids[i])['product_name'] == f"p{i}", f"id {ids[i]} moved after delete")
+    expect(s.delete_record(ids[4]), 'delete_record of newest failed')
+    new = s.add_record('p5', 5)
+    expect(new not in ids, f"id {new} reused after delete")
+    expect(s.get_record(ids[1]) is None and not s.delete_record(ids[1]), 'deleted id still present')
+
+@check
+def versions(make):
+    s = make()
+    rid = s.add_record('milk', 1)
+    expect(s.update_record(rid, 'milk', 2), 'update without version failed')
+    expect(s.get_record(rid)['version'] == 1, 'update should bump version')
+    expect(not s.update_record(rid, 'milk', 9, version=0), 'stale version should be refused')
+    expect(s.get_record(rid)['count'] == 2, 'refused update changed the record')
+    expect(s.update_record(rid, 'Milk', 3, version=1), 'update with current version failed')
+    r = s.get_record(rid)
+    expect((r['product_name'], r['count'], r['version']) == ('Milk', 3, 2), f"after update: {r}")
+    expect(not s.update_record(rid + 1000, 'x', 1), 'update of missing id should return False')
+    expect(not s.update_record(rid, 'x', 'abc'), 'update with invalid count should return False')
+    expect(not s.delete_record(rid, version=1), 'stale delete should be refused')
+    expect(s.delete_record(rid, version=2) and s.get_record(rid) is None, 'delete with current version failed')
+
+@check
+def transactions(make):
+    s = make()
+    keep = s.add_record('milk', 1)
+    ids = s.add_records({'a': 1, 'b': 2})
+    expect(len(ids) == 2 and len({s.get_record(i)['timestamp'] for i in ids}) == 1, 'add_records should share one timestamp')
+    before = [plain(r) for r in s.get_all_records()]
+    try:
+        with s.transaction():
+            s.add_record('c', 3); s.update_record(keep, 'zz', 9); s.delete_record(ids[0])
+            with s.transaction(): s.add_record('d', 4)
+            raise KeyError('rollback')
+    except KeyError: pass
+    expect([plain(r) for r in s.get_all_records()] == before, 'transaction was not rolled back')
+    expect(reference_totals(s.get_all_records()) == s.daily_totals(), 'totals out of sync after rollback')
+    with s.transaction():
+        s.update_record(keep, 'milk', 5)
+        with s.transaction(): new = s.add_record('e', 1)
+    expect(s.get_record(keep)['count'] == 5 and s.get_record(new) is not None, 'nested transaction not committed')
+
+@check
+def queries(make):
+    s = make(HISTORY)
+    all_ids = [r['id'] for r in s.get_all_records()]
+    expect([r['timestamp'] for r in s.get_all_records()] == [h['timestamp'] for h in HISTORY], 'import should keep file order')
+    cases = {('', ''): 7, ('milk', ''): 4, ('MILK', ''): 4, ('tea', ''): 1, ('', '2026-02'): 3, ('', '2026-02-14'): 2,
+             ('', '2026-01..2026-02'): 6, ('', '2026-02..'): 4, ('', '..2026-01'): 3, ('milk', '2026-01..2026-03'): 4,
+             ('', '10:30'): 2, ('', '14'): 2, ('', '13'): 1, ('bread', '08:00'): 1, ('nothing', ''): 0}
+    for (name, date), n in cases.items():
+        rows = s.query_records(name, date)
+        expect(len(rows) == n, f"query_records({name!r}, {date!r}): {len(rows)} rows, expected {n}")
+        keys = [k for k, _ in rows]
+        expect(keys == sorted(keys, reverse=True) and set(keys) <= set(all_ids), f"query_records({name!r}, {date!r}) not newest first")
+        expect(all(k == r['id'] for k, r in rows), 'query_records key should be the record id')
+        expect(s.count_records(name, date) == n, f"count_records({name!r}, {date!r}) != {n}")
+        chunks = list(s.iter_records(name, date, chunk=2))
+        expect(all(0 < len(c) <= 2 for c in chunks), 'iter_records chunk size')
+        expect([r['id'] for c in chunks for r in c] == keys[::-1], f"iter_records({name!r}, {date!r}) order/content")
+
+@check
+def aggregates(make):
+    s = make(HISTORY)
+    expect(s.get_products() == ['milk', 'Milk Tea', 'bread', 'juice'], f"get_products: {s.get_products()}")
+    expect(s.get_product_trend('milk') == {'2026-01-05': 3, '2026-02-01': 4, '2026-02-14': 6}, f"trend: {s.get_product_trend('milk')}")
+    expect(s.get_product_trend('nothing') == {}, 'trend of unknown product should be empty')
+    expect(s.daily_totals('', '2026-02') == [('2026-02-01', 'milk', 4, 1), ('2026-02-14', 'juice', 1, 1), ('2026-02-14', 'milk', 6, 1)],
+           f"daily_totals: {s.daily_totals('', '2026-02')}")
+    # เปลี่ยนข้อมูลแล้วตรวจว่ายอดรวมตามทัน
+    recs = s.get_all_records()
+    first, last = recs[0]['id'], recs[len(recs) - 1]['id']
+    s.update_record(first, 'juice', 10); s.delete_record(last); s.add_record('milk', 1)
+    recs = [plain(r) for r in s.get_all_records()]
+    expect(s.daily_totals() == reference_totals(recs), 'daily_totals out of sync after writes')
+    expect(s.daily_totals('MILK', '2026-02') == reference_totals(recs, 'milk', ('2026-02', '2026-02\x7f')), 'filtered daily_totals')
+    trends = s.get_product_daily_trends()
+    expect(set(trends) == set(s.get_products()) == {r['product_name'] for r in recs}, 'products out of sync after writes')
+    for n, t in trends.items():
+        want = {}
+        for d, name, total, _ in reference_totals(recs):
+            if name == n: want[d] = total
+        expect(t == want == s.get_product_trend(n) and list(t) == sorted(t), f"trend of {n}: {t} != {want}")
+
+@check
+def export(make):
+    s = make(HISTORY)
+    folder = tempfile.mkdtemp(prefix='conformance_export_')
+    try:
+        path = export_records(s, os.path.join(folder, 'out.csv'), 'csv', 'milk')
+        with open(path, encoding='utf-8-sig') as f: rows = list(csv.reader(f))
+        expect(len(rows) == 5, f"exported {len(rows) - 1} rows, expected 4")
+        expect(export_records(s, os.path.join(folder, 'none.csv'), 'csv', 'nothing') is None, 'empty export should return None')
+    finally: shutil.rmtree(folder, ignore_errors=True)
+
+@check
+def reopen(make):
+    s = make(HISTORY)
+    if make.persistent is False: return 'skipped (not persistent)'
+    rid = s.add_record('cola', 7); s.update_record(rid, 'cola', 8); s.delete_record(s.get_all_records()[0]['id'])
+    last = s.add_record('tmp', 1); s.delete_record(last) # ลบรายการล่าสุด: id นี้ต้องไม่ถูกใช้ซ้ำหลังเปิดใหม่
+    before = [plain(r) for r in s.get_all_records()]
+    s.close()
+    s = make.reopen()
+    expect([plain(r) for r in s.get_all_records()] == before, 'records changed after reopen')
+    new = s.add_record('cola', 1)
+    expect(new not in {r['id'] for r in before}, 'id reused after reopen')
+    expect(new != last, 'id of the deleted last record reused after reopen')
+    # อีก Instance (เช่นอีกเครื่อง) เห็นการเขียนหลัง sync()
+    other = make.reopen()
+    s.add_record('water', 2)
+    expect(isinstance(other.sync(), bool), 'sync() should return a bool')
+    expect(other.count_records('water') == 1, 'second instance does not see writes after sync()')
+    other.close(); s.close()
+
+class Maker:
+    """เปิด Backend ใหม่ (ว่าง หรือเริ่มจาก records) ในโฟลเดอร์ของแต่ละข้อ และเปิดไฟล์เดิมซ้ำได้ด้วย reopen()"""
+    def __init__(self, backend, folder):
+        self.backend, self.folder, self.persistent, self.n = backend, folder, BACKENDS[backend][2] is not None, 0
+
+    def __call__(self, records=()):
+        self.n += 1
+        self.store, _ = seed_store(self.backend, self.folder, f"case{self.n}", records)
+        return self.store
+
+    def reopen(self):
+        return open_stock_data(self.backend, getattr(self.store, 'filename', None))
+
+def run(backend, verbose=False):
+    """รันทุกข้อกับ Backend หนึ่งตัว คืนค่าจำนวนข้อที่ไม่ผ่าน"""
+    failed = 0
+    for fn in CHECKS:
+        folder = tempfile.mkdtemp(prefix=f"conformance_{backend}_")
+        make = Maker(backend, folder)
+        try:
+            note = fn(make)
+            if verbose or note: print(f"  {backend} {fn.__name__}: {note or 'ok'}")
+        except Exception as e:
+            failed += 1
+            print(f"  {backend} {fn.__name__}: FAIL {type(e).__name__}: {e}", file=sys.stderr)
+            if verbose: traceback.print_exc()
+        finally:
+            try: make.store.close()
+            except Exception: pass
+            shutil.rmtree(folder, ignore_errors=True)
+    print(f"{backend}: {len(CHECKS) - failed}/{len(CHECKS)} passed")
+    return failed
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Conformance checks for every stock storage backend')
+    ap.add_argument('--backends', default=','.join(BACKENDS), help='comma-separated backend names')
+    ap.add_argument('-v', '--verbose', action='store_true')
+    args = ap.parse_args(argv)
+    failed = sum(run(b, args.verbose) for b in args.backends.split(','))
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""ทดสอบโหลดของ stock_server.py บน localhost: เครื่องลูกข่ายจำลองหลายตัวส่งภาพ /detect พร้อมกัน (ปนกับ /records และ /trends)
+
+วัดจำนวนคำขอต่อวินาที เวลาตอบ p50/p95/p99 แยกตามชนิดคำขอ จำนวนที่ถูกปฏิเสธ (503) และขนาด Batch เฉลี่ยที่เซิร์ฟเวอร์รวมได้
+--spawn เปิดเซิร์ฟเวอร์ใหม่ (Backend memory) บนพอร์ตว่างให้เอง แล้วปิดเมื่อจบ ส่งตัวเลือกเพิ่มด้วย --server-args
+ตัวอย่าง:
+    python load_stock_server.py --spawn --clients 32 --requests 1000 --server-args "--mock --mock-delay-ms 40"
+    python load_stock_server.py --spawn --server-args "--mock --max-batch 1 --mock-delay-ms 40"   (เทียบกับไม่รวม Batch)
+    python load_stock_server.py --url http://127.0.0.1:8080 --images shelf_photos/ --json load.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shlex
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+def sample_jpegs(folder, limit=16, size=(640, 480)):
+    """ภาพ JPEG สำหรับส่ง: จากโฟลเดอร์ หรือภาพสุ่ม (เข้ารหัสครั้งเดียวก่อนเริ่มวัด)"""
+    import cv2
+    import numpy as np
+    if folder:
+        from batch_count import iter_images
+        imgs = [img for _, img in zip(range(limit), iter_images(folder))]
+    else:
+        rng = np.random.default_rng(0)
+        imgs = [rng.integers(0, 255, (size[1], size[0], 3), dtype=np.uint8) for _ in range(limit)]
+    return [cv2.imencode('.jpg', img)[1].tobytes() for img in imgs]
+
+async def request(reader, writer, method, path, body=b'', ctype='application/octet-stream'):
+    """ส่งคำขอหนึ่งครั้งบน Connection เดิม (Keep-alive) คืนค่า (status, JSON)"""
+    head = f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n"
+    if body: head += f"Content-Type: {ctype}\r\n"
+    writer.write(head.encode('latin-1') + b'\r\n' + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while True:
+        h = await reader.readline()
+        if h in (b'\r\n', b'\n', b''): break
+        k, _, v = h.decode('latin-1').partition(':'); headers[k.strip().lower()] = v.strip()
+    data = await reader.readexactly(int(headers.get('content-length', 0)))
+    return status, json.loads(data or b'null')
+
+def summarize(samples):
+    s = sorted(samples)
+    if not s: return {'n': 0}
+    pct = lambda q: round(s[min(len(s) - 1, int(q * len(s)))] * 1000, 2)
+    return {'n': len(s), 'mean_ms': round(statistics.mean(s) * 1000, 2), 'p50_ms': pct(0.5), 'p95_ms': pct(0.95),
+            'p99_ms': pct(0.99), 'max_ms': round(s[-1] * 1000, 2)}
+
+async def run_load(host, port, images, clients, total, mix, save, seed):
+    rnd, left = random.Random(seed), [total]
+    lat, status, batches = {}, {}, []
+
+    async def client(cid):
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            while left[0] > 0:
+                left[0] -= 1
+                r = rnd.random()
+                if r < mix / 2: kind, method, path, body = 'records', 'GET', '/records?name=item&limit=20', b''
+                elif r < mix * 3 / 4: kind, method, path, body = 'trends', 'GET', '/trends', b''
+                elif r < mix: kind, method, path, body = 'add', 'POST', '/records', json.dumps({'items': {f"item{cid}": 1}}).encode()
+                else: kind, method, path, body = 'detect', 'POST', '/detect' + ('?save=1' if save else ''), rnd.choice(images)
+                t0 = time.perf_counter()
+                code, res = await request(reader, writer, method, path, body)
+                status[code] = status.get(code, 0) + 1
+                if code == 200:
+                    lat.setdefault(kind, []).append(time.perf_counter() - t0)
+                    if kind == 'detect': batches.append(res['batch'])
+                elif code == 503: await asyncio.sleep(0.05) # Back-pressure: ถอยก่อนส่งใหม่
+        finally: writer.close()
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(clients)))
+    elapsed = time.perf_counter() - t0
+    reader, writer = await asyncio.open_connection(host, port)
+    _, health = await request(reader, writer, 'GET', '/health'); writer.close()
+    ok = sum(len(v) for v in lat.values())
+    return {'clients': clients, 'requests': total, 'elapsed_s': round(elapsed, 3), 'ok_per_s': round(ok / elapsed, 1),
+            'status': {str(k): v for k, v in sorted(status.items())}, 'latency': {k: summarize(v) for k, v in lat.items()},
+            'mean_batch_seen': round(statistics.mean(batches), 2) if batches else 0, 'server': health}
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0)); return s.getsockname()[1]
+
+def spawn_server(extra):
+    """เปิด stock_server.py (Backend memory) บนพอร์ตว่าง รอจน /health ตอบ คืนค่า (process, port)"""
+    port, here = free_port(), os.path.dirname(os.path.abspath(__file__))
+    proc = subprocess.Popen([sys.executable, os.path.join(here, 'stock_server.py'), '--host', '127.0.0.1', '--port', str(port),
+                             '--backend', 'memory', *shlex.split(extra)], cwd=here, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 120 # การโหลดโมเดลครั้งแรกอาจใช้เวลา
+    while time.time() < deadline:
+        if proc.poll() is not None: raise RuntimeError(f"stock_server.py exited with code {proc.returncode}")
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.2): return proc, port
+        except OSError: time.sleep(0.2)
+    proc.kill(); raise RuntimeError('stock_server.py did not start')
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Load test for stock_server.py on localhost')
+    ap.add_argument('--url', default='http://127.0.0.1:8080')
+    ap.add_argument('--spawn', action='store_true', help='start a fresh server (memory backend) on a free port')
+    ap.add_argument('--server-args', default='', help='extra stock_server.py options with --spawn')
+    ap.add_argument('--clients', type=int, default=16, help='concurrent stations (one keep-alive connection each)')
+    ap.add_argument('--requests', type=int, default=500, help='total requests')
+    ap.add_argument('--mix', type=float, default=0.2, help='fraction of /records and /trends requests')
+    ap.add_argument('--save', action='store_true', help='send /detect?save=1 (add the counts to the store)')
+    ap.add_argument('--images', help='folder of sample images (default: random 640x480 frames)')
+    ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--json', help='write results to this file')
+    args = ap.parse_args(argv)
+
+    images, proc = sample_jpegs(args.images), None
+    if args.spawn: proc, port = spawn_server(args.server_args); host = '127.0.0.1'
+    else: u = urlsplit(args.url); host, port = u.hostname, u.port or 80
+    try: res = asyncio.run(run_load(host, port, images, args.clients, args.requests, args.mix, args.save, args.seed))
+    finally:
+        if proc: proc.terminate(); proc.wait()
+
+    det = res['latency'].get('detect', {'n': 0})
+    print(f"{res['clients']} clients, {res['requests']} requests in {res['elapsed_s']:.2f} s ({res['ok_per_s']} ok/s) status {res['status']}", file=sys.stderr)
+    if det['n']: print(f"detect p50 {det['p50_ms']} ms | p95 {det['p95_ms']} ms | p99 {det['p99_ms']} ms | mean batch {res['mean_batch_seen']}", file=sys.stderr)
+    text = json.dumps(res, indent=2, ensure_ascii=False)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f: f.write(text)
+    else: print(text)
+
+if __name__ == "__main__":
+    main()
@@ -11,9 +11,8 @@ from kivy.core.window import Window
 from kivy.uix.scrollview import ScrollView
 from kivy.uix.gridlayout import GridLayout
 from kivy.clock import Clock
-from datetime import datetime
-import json
 import os
+from stock_backend import open_stock_data
 
 # ตั้งค่าขนาดหน้าจอ
 Window.size = (400, 700)
@@ -25,47 +24,6 @@ COLOR_NEON_BLUE = (0, 0.7, 1, 1)   # ฟ้า Neon
 COLOR_TEXT_DIM = (0.6, 0.6, 0.6, 1) # ข้อความรอง
 COLOR_CARD = (0.15, 0.15, 0.15, 1) # พื้นหลังรายการสินค้า
 
-class StockData:
-    """จัดการข้อมูลสต็อก"""
-    def __init__(self):
-        self.filename = 'stock_data.json'
-        self.data = self.load_data()
-    
-    def load_data(self):
-        if os.path.exists(self.filename):
-            with open(self.filename, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return []
-    
-    def save_data(self):
-        with open(self.filename, 'w', encoding='utf-8') as f:
-            json.dump(self.data, f, ensure_ascii=False, indent=2)
-    
-    def add_record(self, product_name, count):
-        record = {
-            'product_name': product_name,
-            'count': count,
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
-        self.data.append(record)
-        self.save_data()
-    
-    def get_all_records(self):
-        return self.data
-    
-    def get_product_daily_trends(self):
-        trends = {}
-        for record in self.data:
-            date = record['timestamp'].split(' ')[0]
-            name = record['product_name']
-            count = record['count']
-            if name not in trends:
-                trends[name] = {}
-            trends[name][date] = trends[name].get(date, 0) + count
-        for name in trends:
-            trends[name] = dict(sorted(trends[name].items()))
-        return trends
-
 class HamburgerMenu(BoxLayout):
     def __init__(self, screen_manager, **kwargs):
         super().__init__(**kwargs)
@@ -316,7 +274,7 @@ class AnalyticsScreen(Screen):
 
 class StockCountApp(App):
     def build(self):
-        self.stock_data = StockData()
+        self.stock_data = open_stock_data() # เลือก Backend ด้วย STOCK_BACKEND (ค่าเริ่มต้น journal)
         sm = ScreenManager()
         sm.add_widget(CameraScreen(name='camera', stock_data=self.stock_data))
         sm.add_widget(StockListScreen(name='stock', stock_data=self.stock_data))
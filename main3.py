@@ -1,3 +1,5 @@
+import time
+_T0 = time.perf_counter() # เวลาเริ่มโปรแกรม ใช้วัดเวลาเปิดแอป (STOCK_STARTUP_TIME=1)
 from kivy.app import App
 from kivy.uix.screenmanager import ScreenManager, Screen
 from kivy.uix.boxlayout import BoxLayout
@@ -7,16 +9,22 @@ from kivy.uix.label import Label
 from kivy.uix.camera import Camera
 from kivy.uix.textinput import TextInput
 from kivy.uix.popup import Popup
-from kivy.graphics import Color, Rectangle, Line, Ellipse
+from kivy.graphics import Color, Rectangle, Line, Ellipse, InstructionGroup
 from kivy.core.window import Window
 from kivy.uix.scrollview import ScrollView
 from kivy.uix.gridlayout import GridLayout
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
 from kivy.clock import Clock
-from datetime import datetime
-import json
+from stock_backend import open_stock_data
+from stock_search import StockSearch
+from stock_export import ExportWorker, FORMATS
+from perf_trace import trace
+from collections import OrderedDict
 import os
-import csv
 import random
+import threading
 
 # --- การตั้งค่าพื้นฐานของโปรแกรม ---
 Window.size = (400, 700) # กำหนดขนาดหน้าจอจำลองสำหรับ Mobile
@@ -30,72 +38,6 @@ COLOR_CARD = (0.15, 0.15, 0.15, 1) # สีพื้นหลังของร
 COLOR_DANGER = (0.8, 0.2, 0.2, 1)  # สีแดงสำหรับปุ่มลบ
 COLOR_SUCCESS = (0, 0.8, 0.4, 1)  # สีเขียวสำหรับปุ่มส่งออก/บันทึก
 
-# --- ส่วนจัดการข้อมูล (Data Management) ---
-class StockData:
-    """Class สำหรับจัดการการอ่าน/เขียนไฟล์ JSON และประมวลผลสถิติ"""
-    def __init__(self):
-        self.filename = 'stock_data.json'
-        self.data = self.load_data()
-    
-    def load_data(self):
-        """โหลดข้อมูลจาก JSON หากไม่มีไฟล์จะคืนค่าเป็น List ว่าง"""
-        if os.path.exists(self.filename):
-            with open(self.filename, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return []
-    
-    def save_data(self):
-        """บันทึกข้อมูลปัจจุบันลงในไฟล์ JSON"""
-        with open(self.filename, 'w', encoding='utf-8') as f:
-            json.dump(self.data, f, ensure_ascii=False, indent=2)
-    
-    def add_record(self, product_name, count):
-        """เพิ่มบันทึกสต็อกใหม่พร้อมประทับเวลา"""
-        record = {'product_name': product_name, 'count': count, 'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-        self.data.append(record)
-        self.save_data()
-    
-    def update_record(self, index, new_name, new_count):
-        """แก้ไขข้อมูลในรายการเดิมตาม Index ที่กำหนด"""
-        try:
-            self.data[index]['product_name'] = new_name
-            self.data[index]['count'] = int(new_count)
-            self.save_data()
-            return True
-        except: return False
-
-    def delete_record(self, index):
-        """ลบรายการข้อมูลออกจากระบบ"""
-        try:
-            self.data.pop(index)
-            self.save_data()
-            return True
-        except: return False
-
-    def export_to_csv(self):
-        """ส่งออกข้อมูลประวัติสต็อกทั้งหมดเป็นไฟล์ CSV เพื่อใช้ใน Excel"""
-        if not self.data: return None
-        fn = f"export_{datetime.now().strftime('%Y%m%d_%H%M')}.csv"
-        try:
-            with open(fn, 'w', newline='', encoding='utf-8-sig') as f:
-                w = csv.writer(f)
-                w.writerow(['Product', 'Count', 'Time'])
-                for r in self.data:
-                    w.writerow([r['product_name'], r['count'], r['timestamp']])
-            return fn
-        except: return None
-
-    def get_all_records(self): return self.data
-
-    def get_product_daily_trends(self):
-        """รวมยอดการตรวจนับรายวันแยกตามประเภทสินค้าสำหรับวาดกราฟ"""
-        trends = {}
-        for r in self.data:
-            d, n, c = r['timestamp'].split(' ')[0], r['product_name'], r['count']
-            if n not in trends: trends[n] = {}
-            trends[n][d] = trends[n].get(d, 0) + c
-        return {n: dict(sorted(t.items())) for n, t in trends.items()}
-
 # --- ส่วนเมนูหลัก (Navigation) ---
 class HamburgerMenu(BoxLayout):
     """แถบเมนูด้านข้างที่เลื่อนออกมาเพื่อสลับหน้าจอ"""
@@ -118,15 +60,28 @@ class HamburgerMenu(BoxLayout):
     
     def update_rect(self, *args): self.rect.pos, self.rect.size = self.pos, self.size
     def go_to_screen(self, sn):
-        self.screen_manager.current = sn
+        self.screen_manager.show(sn) # หน้าที่ยังไม่เคยเปิดจะถูกสร้างตอนนี้
         self.parent.remove_widget(self) # ปิดเมนูหลังจากเลือกหน้า
 
+class LazyScreenManager(ScreenManager):
+    """ScreenManager ที่สร้างหน้าจอเมื่อถูกเปิดครั้งแรก (factories: ชื่อหน้า -> ฟังก์ชันสร้างหน้าจอ)"""
+    def __init__(self, factories=None, **kwargs):
+        super().__init__(**kwargs)
+        self.factories = factories or {}
+
+    def show(self, name):
+        if not self.has_screen(name): self.add_widget(self.factories.pop(name)())
+        self.current = name
+
 # --- หน้าจอตรวจจับ (Camera Screen) ---
 class CameraScreen(Screen):
     """หน้าจอหลักสำหรับเปิดกล้องและใช้ AI ตรวจนับสต็อก"""
-    def __init__(self, stock_data, yolo_detector=None, **kwargs):
+    def __init__(self, stock_data, yolo_detector=None, resolution=(640, 480), tiled=False, **kwargs):
         super().__init__(**kwargs)
         self.stock_data, self.yolo_detector, self.menu_open = stock_data, yolo_detector, False
+        self.model_loading = False # True ระหว่างที่โหลดโมเดลอยู่เบื้องหลัง (ดู set_model)
+        self.tiled = tiled # ใช้การตรวจจับแบบแบ่ง Tile สำหรับภาพความละเอียดสูง (ชั้นวางของชิ้นเล็ก)
+        self.live_worker, self.live_counts = None, None # โหมดนับสด (Live) ดู toggle_live
         layout = FloatLayout()
         # พื้นหลัง
         with layout.canvas.before: Color(*COLOR_BG); self.bg_rect = Rectangle(pos=layout.pos, size=layout.size)
@@ -143,17 +98,29 @@ class CameraScreen(Screen):
         header.add_widget(h_btn); header.add_widget(Label(text='STOCK AI SCANNER', font_size='18sp', bold=True))
         
         # วิดเจ็ตกล้อง
-        self.camera = Camera(play=True, resolution=(640, 480), size_hint=(0.9, 0.6), pos_hint={'center_x': 0.5, 'top': 0.88}, index=-1)
+        self.camera = Camera(play=True, resolution=resolution, size_hint=(0.9, 0.6), pos_hint={'center_x': 0.5, 'top': 0.88}, index=-1)
         # ปุ่มชัตเตอร์ (ถ่ายรูป)
         c_btn = Button(size_hint=(None, None), size=(135, 135), pos_hint={'center_x': 0.5, 'y': 0.15}, background_normal='/Users/nannam/Downloads/project2/camera2.png')
         c_btn.bind(on_press=self.start_detect)
         # ปุ่มสลับกล้อง
         s_btn = Button(size_hint=(None, None), size=(100, 100), pos_hint={'right': 0.95, 'y': 0.15}, background_normal='/Users/nannam/Downloads/project2/swcam.png')
         s_btn.bind(on_press=self.switch_camera)
+        # ปุ่มโหมดนับสด (Live Count)
+        self.l_btn = Button(text='LIVE', size_hint=(None, None), size=(100, 100), pos_hint={'x': 0.05, 'y': 0.15},
+                            background_normal='', background_color=COLOR_CARD, color=COLOR_NEON_BLUE, bold=True)
+        self.l_btn.bind(on_press=self.toggle_live)
+        # กรอบของวัตถุที่ตรวจพบในโหมด Live วาดทับภาพกล้อง
+        self.live_boxes = InstructionGroup(); self.camera.canvas.after.add(self.live_boxes)
         
         self.res_lbl = Label(text='Ready to scan', size_hint=(1, None), height=50, pos_hint={'center_x': 0.5, 'y': 0.08}, color=COLOR_NEON_BLUE, bold=True)
 
-        layout.add_widget(header); layout.add_widget(self.camera); layout.add_widget(c_btn); layout.add_widget(s_btn); layout.add_widget(self.res_lbl)
+        layout.add_widget(header); layout.add_widget(self.camera); layout.add_widget(c_btn); layout.add_widget(s_btn); layout.add_widget(self.l_btn); layout.add_widget(self.res_lbl)
+        # แถบแสดงเวลาแต่ละขั้นตอน p50/p95/p99 (เฉพาะเมื่อเปิด STOCK_TRACE=1) แตะเพื่อบันทึกเป็น JSONL
+        if trace.enabled:
+            self.perf_btn = Button(text='perf: no samples yet', font_size='10sp', halign='left', valign='top', size_hint=(1, 0.22),
+                                   pos_hint={'x': 0, 'top': 0.88}, background_normal='', background_color=(0, 0, 0, 0.55))
+            self.perf_btn.bind(size=lambda i, v: setattr(i, 'text_size', v), on_press=self.dump_perf)
+            layout.add_widget(self.perf_btn); Clock.schedule_interval(self.upd_perf, 1)
         self.add_widget(layout); self.layout = layout
 
     def update_bg(self, i, v): self.bg_rect.pos, self.bg_rect.size = i.pos, i.size
@@ -162,6 +129,12 @@ class CameraScreen(Screen):
         if not self.menu_open: self.menu = HamburgerMenu(self.manager); self.layout.add_widget(self.menu); self.menu_open = True
         else: self.layout.remove_widget(self.menu); self.menu_open = False
     def switch_camera(self, *args): self.camera.index = 1 if self.camera.index == 0 else 0
+    def upd_perf(self, dt):
+        text = trace.format_summary() or 'perf: no samples yet'
+        cache = getattr(self.yolo_detector, 'cache', None)
+        if cache: st = cache.stats(); text += f"\ncache: {st['hits']} hits / {st['misses']} misses ({st['hit_rate']:.0%})"
+        self.perf_btn.text = text
+    def dump_perf(self, *args): self.res_lbl.text = f"Trace saved: {trace.dump_jsonl()}"
     
     def _mock_detection(self):
         """จำลองการตรวจจับกรณีไม่ใช้ AI จริงเพื่อทดสอบระบบ"""
@@ -172,18 +145,91 @@ class CameraScreen(Screen):
             res[p] = (random.randint(1, 5), 0.92) 
         return res
 
+    def set_model_loading(self):
+        self.model_loading = True; self.res_lbl.text = 'Loading AI model...'
+
+    def set_model(self, yolo_detector):
+        """รับโมเดลที่โหลดเสร็จแล้ว (None = โหลดไม่ได้ ใช้ตัวสุ่มแทน)"""
+        self.yolo_detector, self.model_loading = yolo_detector, False
+        self.res_lbl.text = 'Ready to scan' if yolo_detector else 'Ready to scan (demo mode)'
+
     def start_detect(self, *args):
-        """เรียกใช้ฟังก์ชันตรวจจับผ่าน Clock เพื่อไม่ให้ UI ค้าง"""
-        self.res_lbl.text = 'Analyzing...'; Clock.schedule_once(self._review, 0.1)
-
-    def _review(self, dt):
-        """ประมวลผลรูปภาพและเปิดหน้าต่าง Review ยืนยันจำนวน"""
-        if self.camera.texture:
-            self.camera.texture.save('temp.png')
-            # ตรวจจับด้วย YOLO ถ้าโมเดลพร้อม ถ้าไม่พร้อมให้ใช้ตัวสุ่ม (Mock)
-            res = self.yolo_detector.detect_from_image('temp.png') if self.yolo_detector else self._mock_detection()
-            self.show_review_popup(res)
-            if os.path.exists('temp.png'): os.remove('temp.png')
+        """ส่งภาพไปตรวจจับใน Thread เบื้องหลัง เพื่อไม่ให้ภาพกล้องค้างระหว่างที่ AI ประมวลผล"""
+        if not self.camera.texture: return
+        if self.model_loading: self.res_lbl.text = 'AI model is still loading...'; return
+        self.scan_t0 = time.perf_counter() # _review วัด scan.total จากจุดนี้ (รวมทางลัดของโหมด Live)
+        # โหมด Live มียอดนับของเฟรมล่าสุดอยู่แล้ว ไม่ต้องรันโมเดลซ้ำ
+        if self.live_worker and self.live_counts: self._review(dict(self.live_counts)); return
+        self.res_lbl.text = 'Analyzing...'
+        # ตรวจจับด้วย YOLO ถ้าโมเดลพร้อม ถ้าไม่พร้อมให้ใช้ตัวสุ่ม (Mock)
+        if not self.yolo_detector: self._review(self._mock_detection()); return
+        # ส่ง Pixel ของ Texture ให้โมเดลโดยตรง ไม่ต้อง encode/decode PNG ผ่านดิสก์
+        with trace.span('scan.capture'):
+            tex = self.camera.texture
+            frame = self.yolo_detector.frame_from_rgba(tex.pixels, tex.width, tex.height)
+        detect = self.yolo_detector.detect_tiled if self.tiled else self.yolo_detector.detect_from_array
+        self.yolo_detector.detect_async(frame, callback=self._review, detect=detect)
+
+    # --- โหมดนับสด (Live Count) ---
+    LIVE_MIN_INTERVAL, LIVE_MAX_INTERVAL = 1 / 15, 1.0 # ช่วงห่างของการส่งเฟรม (วินาที) ที่ปรับตามความเร็วโมเดล
+
+    def toggle_live(self, *args):
+        """เปิด/ปิดโหมดนับสด: ดึงภาพจากกล้องเป็นระยะ ส่งให้ Thread ตรวจจับ (เฟรมล่าสุดชนะ) แล้ววาดกรอบและยอดนับทับภาพ"""
+        if self.live_worker: self.stop_live(); return
+        if self.model_loading or not self.yolo_detector: self.res_lbl.text = 'Live mode needs the AI model'; return
+        from yolo_detector import LatestFrameWorker
+        det = self.yolo_detector
+        process = (lambda f: det.detect_tiled_boxes(f)) if self.tiled else (lambda f: det.detect_boxes(f))
+        self.live_worker = LatestFrameWorker(process, self._live_result)
+        self.live_latency, self.live_interval, self.live_last = None, self.LIVE_MIN_INTERVAL, 0
+        self.live_ev = Clock.schedule_interval(self._live_tick, 1 / 30)
+        self.l_btn.text, self.l_btn.color = 'STOP', COLOR_DANGER; self.res_lbl.text = 'Live: starting...'
+
+    def stop_live(self):
+        if not self.live_worker: return
+        self.live_worker.stop(); self.live_ev.cancel()
+        self.live_worker, self.live_counts = None, None
+        self.live_boxes.clear(); self.l_btn.text, self.l_btn.color = 'LIVE', COLOR_NEON_BLUE; self.res_lbl.text = 'Ready to scan'
+
+    def on_leave(self, *args): self.stop_live() # หยุดนับสดเมื่อออกจากหน้ากล้อง
+
+    def _live_tick(self, dt):
+        """ดึงภาพจากกล้องเมื่อถึงเวลา (ระยะห่างปรับตามเวลาที่โมเดลใช้ จึงไม่ดึงภาพถี่เกินกว่าที่ประมวลผลทัน)"""
+        now, tex = time.perf_counter(), self.camera.texture
+        if not tex or now - self.live_last < self.live_interval: return
+        self.live_last = now
+        with trace.span('live.capture'):
+            self.live_frame_size = (tex.width, tex.height)
+            self.live_worker.put(self.yolo_detector.frame_from_rgba(tex.pixels, tex.width, tex.height))
+
+    def _live_result(self, boxes, latency):
+        """รับผลของเฟรมล่าสุด (บน Main Thread) ปรับอัตราการส่งเฟรม แล้ววาดกรอบและยอดนับ"""
+        if not self.live_worker: return
+        trace.record('live.detect', latency)
+        # ค่าเฉลี่ยแบบถ่วงน้ำหนัก (EMA) ของเวลาตรวจจับ ส่งเฟรมถัดไปช้ากว่าเวลานี้เล็กน้อย
+        self.live_latency = latency if self.live_latency is None else 0.8 * self.live_latency + 0.2 * latency
+        self.live_interval = min(max(self.live_latency * 1.2, self.LIVE_MIN_INTERVAL), self.LIVE_MAX_INTERVAL)
+        self.live_counts = {}
+        for n, _, _ in boxes: self.live_counts[n] = self.live_counts.get(n, 0) + 1
+        self._draw_live_boxes(boxes)
+        counts = '  '.join(f"{n} {c}" for n, c in sorted(self.live_counts.items())) or 'nothing detected'
+        self.res_lbl.text = f"LIVE {1 / self.live_interval:.0f} fps | {counts}"
+
+    def _draw_live_boxes(self, boxes):
+        """แปลงพิกัดกรอบจากภาพ (มุมซ้ายบน) เป็นพิกัดของวิดเจ็ตกล้อง (ภาพถูกย่อให้พอดีและจัดกึ่งกลาง มุมซ้ายล่าง)"""
+        cam, (fw, fh) = self.camera, self.live_frame_size
+        nw, nh = cam.norm_image_size
+        ox, oy = cam.center_x - nw / 2, cam.center_y - nh / 2
+        sx, sy = nw / fw, nh / fh
+        self.live_boxes.clear(); self.live_boxes.add(Color(*COLOR_NEON_BLUE))
+        for _, _, (x1, y1, x2, y2) in boxes:
+            self.live_boxes.add(Line(rectangle=(ox + x1 * sx, oy + nh - y2 * sy, (x2 - x1) * sx, (y2 - y1) * sy), width=1.5))
+
+    def _review(self, res):
+        """เปิดหน้าต่าง Review ยืนยันจำนวน (ถูกเรียกบน Main Thread เมื่อการตรวจจับเสร็จ)"""
+        self.res_lbl.text = 'Ready to scan'
+        with trace.span('review.popup'): self.show_review_popup(res)
+        if trace.enabled: trace.record('scan.total', time.perf_counter() - self.scan_t0) # กดชัตเตอร์จนเห็นหน้าต่าง Review
 
     def show_review_popup(self, results):
         """Popup สำหรับแสดงผลการนับ และให้ผู้ใช้กด +/- เพื่อแก้ไขจำนวนก่อนบันทึกจริง"""
@@ -214,16 +260,38 @@ class CameraScreen(Screen):
 
     def final_save(self, p):
         """บันทึกยอดที่ยืนยันแล้วลงฐานข้อมูล"""
-        for n, c in self.temp_res.items(): 
-            if c > 0: self.stock_data.add_record(n, c)
+        # ทุกสินค้าของการสแกนนี้ถูกบันทึกพร้อมกัน (เขียนลงดิสก์ครั้งเดียว เวลาประทับเดียวกัน)
+        with trace.span('review.save'): self.stock_data.add_records((n, c) for n, c in self.temp_res.items() if c > 0)
         p.dismiss(); self.res_lbl.text = "Stock Updated!"; Popup(title="Status", content=Label(text="Saved Successfully!"), size_hint=(0.6, 0.2)).open()
 
 # --- หน้าจอประวัติสต็อก (Stock List Screen) ---
+class StockRow(RecycleDataViewBehavior, BoxLayout):
+    """แถวหนึ่งรายการในประวัติสต็อก RecycleView จะสร้างเฉพาะแถวที่มองเห็นและนำกลับมาใช้ซ้ำเมื่อเลื่อน"""
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.orientation, self.spacing = 'horizontal', 5
+        self.key, self.record, self.screen = None, None, None
+        # ปุ่มข้อมูลกดเพื่อ Edit
+        self.info = Button(background_color=COLOR_CARD, halign='left', padding=[15,0])
+        self.info.bind(on_press=lambda x: self.screen.open_edit(self.key, self.record))
+        # ปุ่มลบข้อมูล (DEL)
+        self.del_b = Button(text='DEL', size_hint_x=None, width=60, background_color=COLOR_DANGER)
+        self.del_b.bind(on_press=lambda x: self.screen.confirm_del(self.key, self.record))
+        self.add_widget(self.info); self.add_widget(self.del_b)
+
+    def refresh_view_attrs(self, rv, index, data):
+        """ผูกข้อมูลของแถวที่ index เข้ากับวิดเจ็ตนี้ (ถูกเรียกทุกครั้งที่แถวถูกนำกลับมาใช้)"""
+        self.key, self.record, self.screen = data['key'], data['record'], rv.screen
+        r = self.record
+        self.info.text = f"{r['product_name']} : {r['count']}\n{r['timestamp']}"
+
 class StockListScreen(Screen):
     """หน้าจอแสดงรายการประวัติทั้งหมด พร้อมระบบค้นหาและกรองตามวันที่"""
     def __init__(self, stock_data, **kwargs):
         super().__init__(**kwargs)
-        self.stock_data = stock_data
+        self.stock_data, self.searcher = stock_data, StockSearch(stock_data)
+        # หน่วงการค้นหาไว้จนผู้ใช้หยุดพิมพ์ 0.25 วินาที แทนการค้นหาใหม่ทุกตัวอักษร
+        self.refresh_later = Clock.create_trigger(self.refresh, 0.25)
         with self.canvas.before: 
             Color(*COLOR_BG); self.bg_rect = Rectangle(pos=self.pos, size=self.size)
         self.bind(pos=self._upd_bg, size=self._upd_bg)
@@ -247,15 +315,15 @@ class StockListScreen(Screen):
         self.search = TextInput(hint_text='Search product name...', multiline=False, size_hint_y=None, height=40,
                                background_color=(0.2, 0.2, 0.2, 1), foreground_color=(1, 1, 1, 1), 
                                hint_text_color=(0.5, 0.5, 0.5, 1))
-        self.search.bind(text=self.refresh)
+        self.search.bind(text=self.refresh_later)
         filter_layout.add_widget(self.search)
         
         # ช่องกรองวันที่และปุ่ม CLEAR
         date_row = BoxLayout(orientation='horizontal', spacing=5, size_hint_y=None, height=40)
-        self.date_filter = TextInput(hint_text='YYYY-MM-DD', multiline=False, size_hint_x=0.7,
+        self.date_filter = TextInput(hint_text='YYYY-MM-DD or 2026-01..2026-03', multiline=False, size_hint_x=0.7,
                                     background_color=(0.2, 0.2, 0.2, 1), foreground_color=(1, 1, 1, 1),
                                     hint_text_color=(0.5, 0.5, 0.5, 1))
-        self.date_filter.bind(text=self.refresh)
+        self.date_filter.bind(text=self.refresh_later)
         
         clear_btn = Button(text='CLEAR', size_hint_x=0.3, background_normal='', 
                           background_color=(0.3, 0.3, 0.3, 1), color=(1, 1, 1, 1), bold=True)
@@ -265,11 +333,15 @@ class StockListScreen(Screen):
         filter_layout.add_widget(date_row); header.add_widget(filter_layout)
         
         # ส่วนแสดงรายการแบบเลื่อนได้ (Scrollable List)
-        self.list_view = GridLayout(cols=1, spacing=10, size_hint_y=None, padding=15)
-        self.list_view.bind(minimum_height=self.list_view.setter('height'))
-        scroll = ScrollView(); scroll.add_widget(self.list_view)
+        # ใช้ RecycleView สร้างวิดเจ็ตเฉพาะแถวที่มองเห็น ไม่ว่าประวัติจะยาวแค่ไหน
+        self.list_view = RecycleView(); self.list_view.screen = self
+        rows = RecycleBoxLayout(orientation='vertical', default_size=(None, 75), default_size_hint=(1, None),
+                                size_hint_y=None, spacing=10, padding=15)
+        rows.bind(minimum_height=rows.setter('height'))
+        self.list_view.add_widget(rows)
+        self.list_view.viewclass = StockRow # ต้องกำหนดหลังเพิ่ม Layout Manager แล้ว
         
-        layout.add_widget(header); layout.add_widget(scroll)
+        layout.add_widget(header); layout.add_widget(self.list_view)
         self.add_widget(layout); self.bind(on_enter=self.refresh)
 
     def _upd_bg(self, i, v): self.bg_rect.pos, self.bg_rect.size = i.pos, i.size
@@ -283,53 +355,164 @@ class StockListScreen(Screen):
 
     def refresh(self, *args):
         """โหลดรายการใหม่เมื่อมีการพิมพ์ในช่องค้นหา หรือเข้าหน้าจอ"""
-        self.list_view.clear_widgets()
-        recs = self.stock_data.get_all_records()
-        q_name = self.search.text.lower()
+        q_name = self.search.text
         q_date = self.date_filter.text.strip()
+        self.stock_data.sync() # รับรายการที่เครื่องอื่น (Process อื่น) บันทึกไว้ในโฟลเดอร์ข้อมูลเดียวกัน
         
-        for i, r in enumerate(reversed(recs)):
-            # ตรองข้อมูลตามชื่อและวันที่
-            if q_name in r['product_name'].lower() and q_date in r['timestamp']:
-                idx = len(recs) - 1 - i
-                box = BoxLayout(orientation='horizontal', size_hint_y=None, height=75, spacing=5)
-                # ปุ่มข้อมูลกดเพื่อ Edit
-                info = Button(text=f"{r['product_name']} : {r['count']}\n{r['timestamp']}", background_color=COLOR_CARD, halign='left', padding=[15,0])
-                info.bind(on_press=lambda x, idx=idx: self.open_edit(idx))
-                # ปุ่มลบข้อมูล (DEL)
-                del_b = Button(text='DEL', size_hint_x=None, width=60, background_color=COLOR_DANGER)
-                del_b.bind(on_press=lambda x, idx=idx: self.confirm_del(idx))
-                box.add_widget(info); box.add_widget(del_b); self.list_view.add_widget(box)
-
-    def open_edit(self, idx):
-        """หน้าต่างแก้ไขข้อมูลรายการประวัติ"""
-        r = self.stock_data.get_all_records()[idx]
+        # ตรองข้อมูลตามชื่อและวันที่ผ่านดัชนีค้นหา (key คือ id ของแถวที่คงที่)
+        # data ของ RecycleView เก็บแค่ key และ record เดิม (ไม่คัดลอก) วิดเจ็ตถูกสร้างเฉพาะแถวที่มองเห็น
+        self.list_view.data = [{'key': key, 'record': r} for key, r in self.searcher.query(q_name, q_date)]
+
+    def open_edit(self, idx, r):
+        """หน้าต่างแก้ไขข้อมูลรายการประวัติ (จำ version ไว้ ถ้ามีคนแก้รายการนี้ก่อนกด UPDATE จะไม่บันทึกทับ)"""
+        ver = r.get('version')
         content = BoxLayout(orientation='vertical', padding=10, spacing=10)
         ni = TextInput(text=r['product_name']); ci = TextInput(text=str(r['count']))
         content.add_widget(Label(text="Name:")); content.add_widget(ni)
         content.add_widget(Label(text="Count:")); content.add_widget(ci)
         b = Button(text='UPDATE', background_color=COLOR_SUCCESS)
-        b.bind(on_press=lambda x: self.do_upd(idx, ni.text, ci.text, p))
+        b.bind(on_press=lambda x: self.do_upd(idx, ni.text, ci.text, p, ver))
         content.add_widget(b); p = Popup(title="Edit Record", content=content, size_hint=(0.8, 0.5)); p.open()
         
-    def do_upd(self, idx, n, c, p): self.stock_data.update_record(idx, n, c); p.dismiss(); self.refresh()
+    def do_upd(self, idx, n, c, p, ver=None):
+        ok = self.stock_data.update_record(idx, n, c, version=ver); p.dismiss(); self.refresh()
+        if not ok and ver is not None: self.conflict()
 
-    def confirm_del(self, idx):
+    def confirm_del(self, idx, r=None):
         """Popup ยืนยันก่อนทำการลบประวัติ"""
+        ver = r.get('version') if r is not None else None
         c = BoxLayout(orientation='vertical', padding=10); c.add_widget(Label(text="Delete this record?"))
         bs = BoxLayout(size_hint_y=None, height=50, spacing=10)
-        y = Button(text="YES", background_color=COLOR_DANGER); y.bind(on_press=lambda x: self.do_del(idx, p))
+        y = Button(text="YES", background_color=COLOR_DANGER); y.bind(on_press=lambda x: self.do_del(idx, p, ver))
         n = Button(text="NO"); n.bind(on_press=lambda x: p.dismiss()); bs.add_widget(y); bs.add_widget(n); c.add_widget(bs)
         p = Popup(title="Confirm", content=c, size_hint=(0.7, 0.3)); p.open()
 
-    def do_del(self, idx, p): self.stock_data.delete_record(idx); p.dismiss(); self.refresh()
+    def do_del(self, idx, p, ver=None):
+        ok = self.stock_data.delete_record(idx, version=ver); p.dismiss(); self.refresh()
+        if not ok and ver is not None: self.conflict()
+
+    def conflict(self):
+        """แจ้งว่ารายการถูกแก้ไข/ลบจากเครื่องอื่นไปก่อน (รายการแสดงค่าล่าสุดแล้ว)"""
+        Popup(title="Not saved", content=Label(text="This record was changed on another station.\nPlease check and try again."),
+              size_hint=(0.8, 0.3)).open()
 
 # --- หน้าจอวิเคราะห์สถิติ (Analytics Screen) ---
+def lttb(values, threshold):
+    """Largest-Triangle-Three-Buckets: เลือก index ของจุดไม่เกิน threshold จุดที่รักษารูปร่างกราฟไว้มากที่สุด"""
+    n = len(values)
+    if n <= threshold or n < 3: return list(range(n))
+    if threshold < 3: return [0, n - 1]
+    every = (n - 2) / (threshold - 2)
+    out, a = [0], 0
+    for i in range(threshold - 2):
+        # ค่าเฉลี่ยของ Bucket ถัดไป ใช้เป็นจุดยอดที่สามของสามเหลี่ยม
+        s, e = int((i + 1) * every) + 1, min(int((i + 2) * every) + 1, n)
+        avg_x, avg_y = (s + e - 1) / 2, sum(values[s:e]) / (e - s)
+        # เลือกจุดใน Bucket ปัจจุบันที่ทำให้สามเหลี่ยมมีพื้นที่มากที่สุด
+        ya, best, best_area = values[a], a, -1
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            area = abs((a - avg_x) * (values[j] - ya) - (a - j) * (avg_y - ya))
+            if area > best_area: best, best_area = j, area
+        out.append(best); a = best
+    out.append(n - 1)
+    return out
+
+class TrendChart(BoxLayout):
+    """กราฟเส้นยอดสต็อกรายวันที่สร้างครั้งเดียวแล้วใช้ซ้ำ (Canvas Instruction และ Label ไม่ถูกสร้างใหม่ตอนวาดซ้ำ)
+
+    ข้อมูลถูกลดทอนด้วย LTTB ให้เหลือไม่เกินความกว้างเป็นพิกเซล ติด Label ตัวเลขไม่เกิน MAX_LABELS จุด
+    และเก็บพิกัดที่คำนวณแล้วไว้ต่อ (สินค้า, ขนาด) เพื่อให้การย่อ/ขยายหรือสลับสินค้ากลับมาไม่ต้องคำนวณใหม่
+    """
+    MAX_LABELS = 12  # จำนวน Label ตัวเลขเหนือจุดสูงสุด
+    MAX_DOTS = 120   # วาดจุด (Dot) เฉพาะเมื่อจำนวนจุดหลังลดทอนไม่เกินค่านี้
+    CACHE_SIZE = 32  # จำนวนชุดพิกัดที่เก็บไว้
+
+    def __init__(self, **kwargs):
+        super().__init__(orientation='vertical', padding=[60, 20, 40, 60], **kwargs)
+        self.n, self.counts, self.mv, self.cache = None, [], 1, OrderedDict()
+        self.title = Label(size_hint_y=None, height=40, bold=True, color=COLOR_NEON_BLUE)
+        self.plot = FloatLayout()
+        with self.plot.canvas:
+            # เส้น Grid แกน Y, เส้นกราฟ และกลุ่มของจุดข้อมูล
+            Color(0.2, 0.2, 0.2, 1); self.grid = [Line(points=[], width=1) for _ in range(6)]
+            Color(*COLOR_NEON_BLUE); self.line = Line(points=[], width=3, joint='round')
+            Color(1, 1, 1, 1); self.dot_group = InstructionGroup() # สร้างใน with จึงถูกเพิ่มเข้า canvas แล้ว
+        self.dots = []
+        # Label ตัวเลขแกน Y และตัวเลขเหนือจุด สร้างไว้ครั้งเดียว
+        self.y_lbls = [Label(size_hint=(None, None), size=(40, 20), font_size='11sp', color=COLOR_TEXT_DIM) for _ in range(6)]
+        self.v_lbls = [Label(size_hint=(None, None), size=(30, 20), font_size='12sp', bold=True) for _ in range(self.MAX_LABELS)]
+        for l in self.y_lbls + self.v_lbls: self.plot.add_widget(l)
+        # ผูกฟังก์ชันวาดกราฟเข้ากับการเปลี่ยนแปลงขนาด (Resize) ของ FloatLayout
+        self.plot.bind(pos=self._dr, size=self._dr)
+
+        # แสดงวันที่เริ่มต้นและวันที่ล่าสุดที่แกน X
+        xl = FloatLayout(size_hint_y=None, height=30)
+        self.x_first = Label(pos_hint={'x': 0, 'y': 0}, size_hint=(None, 1), font_size='10sp', color=COLOR_TEXT_DIM)
+        self.x_last = Label(pos_hint={'right': 1, 'y': 0}, size_hint=(None, 1), font_size='10sp', color=COLOR_TEXT_DIM)
+        xl.add_widget(self.x_first); xl.add_widget(self.x_last)
+        self.add_widget(self.title); self.add_widget(self.plot); self.add_widget(xl)
+
+    def set_data(self, n, d):
+        """เปลี่ยนสินค้าที่แสดง d คือ {วัน: ยอดรวม} เรียงตามวัน"""
+        dates = list(d.keys())
+        self.n, self.counts = n, list(d.values())
+        self.mv = max(self.counts) or 1 # สเกลสูงสุดของแกน Y
+        self.title.text = f"Stock Trend : {n}"
+        self.x_first.text, self.x_last.text = dates[0], dates[-1]
+        self._dr()
+
+    def _geometry(self, w, h):
+        """พิกัดของเส้นกราฟ (เทียบกับมุมล่างซ้าย) และตำแหน่ง Label ตัวเลข แคชไว้ต่อ (สินค้า, ขนาด)"""
+        key = (self.n, int(w), int(h))
+        if key in self.cache:
+            self.cache.move_to_end(key); return self.cache[key]
+        counts, mv = self.counts, self.mv
+        idx = lttb(counts, max(2, int(w)))
+        x_s = w / (len(counts) - 1) if len(counts) > 1 else w
+        pts = [v for i in idx for v in (i * x_s, (counts[i] / mv) * h * 0.8)]
+        # เลือกจุดที่จะติด Label แบบกระจายเท่า ๆ กัน และติดจุดล่าสุดเสมอ
+        step = -(-len(idx) // self.MAX_LABELS)
+        picks = list(range(len(idx) - 1, -1, -step))
+        labels = [(pts[2 * k], pts[2 * k + 1], counts[idx[k]]) for k in picks]
+        self.cache[key] = (pts, labels)
+        if len(self.cache) > self.CACHE_SIZE: self.cache.popitem(last=False)
+        return pts, labels
+
+    def _dr(self, *args):
+        if self.n is None: return
+        w, h, x, y = self.plot.width, self.plot.height, self.plot.x, self.plot.y
+        # เส้น Grid และ Label ตัวเลขแกน Y
+        for i in range(6):
+            py = y + (h * (i/5) * 0.8)
+            self.grid[i].points = [x, py, x + w, py]
+            self.y_lbls[i].text, self.y_lbls[i].pos = str(int((self.mv / 5) * i)), (x - 50, py - 10)
+
+        pts, labels = self._geometry(w, h)
+        pts = [v + (x if k % 2 == 0 else y) for k, v in enumerate(pts)]
+        # ลากเส้นเชื่อมระหว่างจุดข้อมูล
+        self.line.points = pts if len(pts) >= 4 else []
+
+        # วาดจุดข้อมูล (Dot) ใช้ Ellipse เดิมซ้ำ สร้างเพิ่มเมื่อไม่พอ และซ่อนส่วนที่เกิน
+        n_dots = len(pts) // 2 if len(pts) // 2 <= self.MAX_DOTS else 0
+        while len(self.dots) < n_dots:
+            e = Ellipse(size=(0, 0)); self.dot_group.add(e); self.dots.append(e)
+        for i, e in enumerate(self.dots):
+            if i < n_dots: e.pos, e.size = (pts[2 * i] - 5, pts[2 * i + 1] - 5), (10, 10)
+            else: e.size = (0, 0)
+
+        # Label ตัวเลขบอกค่าที่อยู่เหนือจุดที่เลือกไว้
+        for i, lbl in enumerate(self.v_lbls):
+            if i < len(labels):
+                px, py, v = labels[i]
+                lbl.text, lbl.pos, lbl.opacity = str(v), (x + px - 15, y + py + 10), 1
+            else: lbl.text, lbl.opacity = '', 0
+
 class AnalyticsScreen(Screen):
     """หน้าจอแสดงกราฟสถิติรายวันแยกตามประเภทสินค้า"""
     def __init__(self, stock_data, **kwargs):
         super().__init__(**kwargs)
-        self.stock_data, self.sel_p = stock_data, None
+        self.stock_data, self.sel_p, self.p_btns = stock_data, None, {}
+        self.exporter, self.exporting, self.ex_fmt = ExportWorker(), False, 'csv' # ส่งออกใน Thread เบื้องหลัง
         
         with self.canvas.before: 
             Color(*COLOR_BG)
@@ -369,123 +552,113 @@ class AnalyticsScreen(Screen):
         self.sm.add_widget(self.pb)
         layout.add_widget(self.sm)
 
-        # พื้นที่สำหรับวาดกราฟเส้น
-        self.cc = FloatLayout() 
+        # พื้นที่สำหรับวาดกราฟเส้น (ใช้ TrendChart ตัวเดียวตลอด)
+        self.cc = FloatLayout(); self.chart = TrendChart()
         layout.add_widget(self.cc)
         self.add_widget(layout)
         self.bind(on_enter=self.upd_menu)
 
     def _upd_bg(self, i, v): self.bg_rect.pos, self.bg_rect.size = i.pos, i.size
-    def do_ex(self, b): 
-        """ฟังก์ชันส่งออกข้อมูลสต็อกทั้งหมดเป็น CSV"""
-        f = self.stock_data.export_to_csv()
-        if f: b.text = "SAVED!"; Clock.schedule_once(lambda d: setattr(b, 'text', 'EXPORT'), 2)
+    def do_ex(self, b):
+        """หน้าต่างเลือกตัวกรองและรูปแบบไฟล์ก่อนส่งออก (ค่าเริ่มต้นคือสินค้าที่เลือกดูกราฟอยู่)"""
+        if self.exporting: return
+        content = BoxLayout(orientation='vertical', padding=10, spacing=10)
+        ni = TextInput(text=self.sel_p or '', hint_text='all products', multiline=False)
+        di = TextInput(hint_text='2026-01..2026-03', multiline=False)
+        content.add_widget(Label(text="Product:")); content.add_widget(ni)
+        content.add_widget(Label(text="Date / range:")); content.add_widget(di)
+        fb = Button(text=f"FORMAT: {self.ex_fmt.upper()}")
+        fb.bind(on_press=lambda x: self._next_fmt(fb)); content.add_widget(fb)
+        bs = BoxLayout(size_hint_y=None, height=50, spacing=10)
+        for text, daily in [('RECORDS', False), ('DAILY TOTALS', True)]:
+            eb = Button(text=text, background_color=COLOR_SUCCESS)
+            eb.bind(on_press=lambda x, d=daily: self.start_ex(b, ni.text.strip(), di.text.strip(), d, p))
+            bs.add_widget(eb)
+        content.add_widget(bs); p = Popup(title="Export", content=content, size_hint=(0.85, 0.6)); p.open()
+
+    def _next_fmt(self, fb):
+        self.ex_fmt = FORMATS[(FORMATS.index(self.ex_fmt) + 1) % len(FORMATS)]; fb.text = f"FORMAT: {self.ex_fmt.upper()}"
+
+    def start_ex(self, b, name, date, daily, p):
+        """ส่งออกใน Thread เบื้องหลัง ปุ่ม EXPORT แสดงเปอร์เซ็นต์ความคืบหน้าระหว่างเขียนไฟล์"""
+        p.dismiss(); self.exporting = True; b.text = '0%'
+        self.exporter.submit(self.stock_data, daily, fmt=self.ex_fmt, name=name, date=date,
+                             on_progress=lambda done, total: setattr(b, 'text', f"{done * 100 // total}%"),
+                             on_done=lambda path: self._ex_done(b, path))
+
+    def _ex_done(self, b, path):
+        self.exporting = False; b.text = "SAVED!" if path else "NO DATA"
+        Clock.schedule_once(lambda d: setattr(b, 'text', 'EXPORT'), 2)
 
     def upd_menu(self, *args):
         """สร้างปุ่มสินค้าที่มีอยู่ในระบบเพื่อใช้เลือกดูกราฟ"""
-        self.pb.clear_widgets(); tr = self.stock_data.get_product_daily_trends()
-        if not tr: return
-        for n in tr.keys():
-            b = Button(text=n, size_hint=(None, 1), width=110, background_normal='', 
-                      background_color=(0.2,0.2,0.2,1) if n != self.sel_p else COLOR_NEON_BLUE)
-            b.bind(on_press=lambda x, name=n: self.draw(name)); self.pb.add_widget(b)
-        if not self.sel_p and tr: self.draw(list(tr.keys())[0])
+        self.pb.clear_widgets(); self.p_btns = {}
+        self.stock_data.sync(); self.chart.cache.clear() # ข้อมูลอาจเปลี่ยนระหว่างที่อยู่หน้าอื่น (หรือจากเครื่องอื่น)
+        products = self.stock_data.get_products()
+        if not products: return
+        for n in products:
+            b = Button(text=n, size_hint=(None, 1), width=110, background_normal='', background_color=(0.2,0.2,0.2,1))
+            b.bind(on_press=lambda x, name=n: self.draw(name)); self.pb.add_widget(b); self.p_btns[n] = b
+        self.draw(self.sel_p if self.sel_p in self.p_btns else products[0])
 
     def draw(self, n):
-        """ล้างพื้นกราฟเดิมและวาดข้อมูลของสินค้าที่เลือก"""
-        self.sel_p = n; self.upd_menu(); self.cc.clear_widgets()
-        d = self.stock_data.get_product_daily_trends().get(n, {})
-        if d: self.cc.add_widget(self.create_chart(n, d))
-
-    def create_chart(self, n, d):
-        """Logic การวาดกราฟเส้นด้วย Kivy Canvas (Line Drawing)"""
-        dates, counts = list(d.keys()), list(d.values())
-        mv = max(counts) if counts else 10 # สเกลสูงสุดของแกน Y
-        root = BoxLayout(orientation='vertical', padding=[60, 20, 40, 60])
-        plot = FloatLayout()
-        
-        def _dr(inst, val):
-            # ล้าง Widget ตัวเลข (Label) ของกราฟเก่าออกก่อนวาดใหม่
-            to_remove = [c for c in plot.children if hasattr(c, 'is_v') or hasattr(c, 'is_y')]
-            for child in to_remove:
-                plot.remove_widget(child)
-
-            w, h, x, y = inst.width, inst.height, inst.x, inst.y
-            
-            plot.canvas.clear()
-            with plot.canvas:
-                # วาดเส้น Grid แกน Y
-                Color(0.2, 0.2, 0.2, 1)
-                for i in range(6): 
-                    py = y + (h * (i/5) * 0.8)
-                    Line(points=[x, py, x + w, py], width=1)
-            
-            # วาด Label บอกตัวเลขแกน Y
-            for i in range(6):
-                py = y + (h * (i/5) * 0.8)
-                val_y = int((mv / 5) * i)
-                y_lbl = Label(text=str(val_y), size_hint=(None, None), size=(40, 20),
-                             pos=(x - 50, py - 10), font_size='11sp', color=COLOR_TEXT_DIM)
-                y_lbl.is_y = True
-                plot.add_widget(y_lbl)
-
-            # วาดเส้นกราฟ
-            with plot.canvas:
-                Color(*COLOR_NEON_BLUE)
-                x_s = w / (len(dates) - 1) if len(dates) > 1 else w
-                pts = []
-                for i, v in enumerate(counts):
-                    px, py = x + (i * x_s), y + ((v / mv) * h * 0.8)
-                    pts.extend([px, py])
-                
-                # ลากเส้นเชื่อมระหว่างจุดข้อมูล
-                if len(pts) >= 4:
-                    Line(points=pts, width=3, joint='round')
-                
-                # วาดจุดข้อมูล (Dot)
-                Color(1, 1, 1, 1)
-                for i in range(0, len(pts), 2):
-                    Ellipse(pos=(pts[i]-5, pts[i+1]-5), size=(10, 10))
-            
-            # วาด Label ตัวเลขบอกค่าที่อยู่เหนือแต่ละจุด
-            for i, v in enumerate(counts):
-                px = x + (i * x_s)
-                py = y + ((v / mv) * h * 0.8)
-                val_lbl = Label(text=str(v), size_hint=(None, None), size=(30, 20), 
-                               pos=(px-15, py+10), font_size='12sp', bold=True)
-                val_lbl.is_v = True
-                plot.add_widget(val_lbl)
-
-        # ผูกฟังก์ชันวาดกราฟเข้ากับการเปลี่ยนแปลงขนาด (Resize) ของ FloatLayout
-        plot.bind(pos=_dr, size=_dr)
-
-        root.add_widget(Label(text=f"Stock Trend : {n}", size_hint_y=None, height=40, bold=True, color=COLOR_NEON_BLUE))
-        root.add_widget(plot)
-        
-        # แสดงวันที่เริ่มต้นและวันที่ล่าสุดที่แกน X
-        xl = FloatLayout(size_hint_y=None, height=30)
-        xl.add_widget(Label(text=dates[0], pos_hint={'x': 0, 'y': 0}, size_hint=(None, 1), font_size='10sp', color=COLOR_TEXT_DIM))
-        xl.add_widget(Label(text=dates[-1], pos_hint={'right': 1, 'y': 0}, size_hint=(None, 1), font_size='10sp', color=COLOR_TEXT_DIM))
-        root.add_widget(xl)
-        
-        return root
+        """วาดข้อมูลของสินค้าที่เลือกลงกราฟเดิม (อ่านยอดรวมรายวันที่ StockData เก็บไว้แล้ว)"""
+        self.sel_p = n
+        # เปลี่ยนแค่สีปุ่มที่เลือก ไม่ต้องสร้างเมนูใหม่ทุกครั้งที่กด
+        for name, b in self.p_btns.items(): b.background_color = COLOR_NEON_BLUE if name == n else (0.2,0.2,0.2,1)
+        d = self.stock_data.get_product_trend(n)
+        if not d: self.cc.clear_widgets(); return
+        if self.chart.parent is None: self.cc.add_widget(self.chart)
+        self.chart.set_data(n, d)
 
 # --- ส่วนหลักที่ใช้รันโปรแกรม (Main Entry) ---
 class StockCountApp(App):
     def build(self):
-        self.stock_data = StockData()
-        # พยายามโหลด YOLO Detector ถ้ามีการติดตั้งไฟล์ไว้
+        # เลือก Backend ผ่านตัวแปรแวดล้อม STOCK_BACKEND=journal|sqlite|json|memory และไฟล์ STOCK_FILE (ดู stock_backend)
+        self.stock_data = open_stock_data()
+        self.yolo_detector = None
+        # STOCK_STARTUP_TIME=1 พิมพ์เวลาจนถึงเฟรมแรกและจนโมเดลพร้อมใช้งาน
+        self.startup_time = os.environ.get('STOCK_STARTUP_TIME') == '1'
+
+        # แสดงเฉพาะหน้ากล้องก่อน หน้ารายการสต็อกและหน้าวิเคราะห์จะถูกสร้างเมื่อเปิดครั้งแรก
+        sm = LazyScreenManager(factories={
+            'stock': lambda: StockListScreen(name='stock', stock_data=self.stock_data),
+            'analytics': lambda: AnalyticsScreen(name='analytics', stock_data=self.stock_data)})
+        # STOCK_TILED=1 เปิดกล้องความละเอียดสูงและตรวจจับแบบแบ่ง Tile
+        tiled = os.environ.get('STOCK_TILED') == '1'
+        self.camera_screen = CameraScreen(name='camera', stock_data=self.stock_data,
+                                          resolution=(1920, 1080) if tiled else (640, 480), tiled=tiled)
+        self.camera_screen.set_model_loading()
+        sm.add_widget(self.camera_screen)
+        # โหลด YOLO (cv2, numpy, ultralytics และไฟล์ Weights) ใน Thread เบื้องหลัง ไม่ให้หน้าจอแรกต้องรอ
+        threading.Thread(target=self._load_model, daemon=True).start()
+        if self.startup_time: Window.bind(on_flip=self._first_frame)
+        return sm
+
+    def _load_model(self):
         try:
             from yolo_detector import YOLODetector
-            self.yolo_detector = YOLODetector('yolov8n.pt')
-        except: self.yolo_detector = None
-        
-        # จัดการหน้าจอด้วย ScreenManager
-        sm = ScreenManager()
-        sm.add_widget(CameraScreen(name='camera', stock_data=self.stock_data, yolo_detector=self.yolo_detector))
-        sm.add_widget(StockListScreen(name='stock', stock_data=self.stock_data))
-        sm.add_widget(AnalyticsScreen(name='analytics', stock_data=self.stock_data))
-        return sm
+            # STOCK_MODEL=yolov8n.onnx ใช้ ONNX Runtime บน CPU (STOCK_THREADS จำนวน Thread, STOCK_INT8=1 ใช้โมเดล INT8)
+            detector = YOLODetector(os.environ.get('STOCK_MODEL', 'yolov8n.pt'), max_pending=1,
+                                    threads=int(os.environ.get('STOCK_THREADS', 0)) or None, int8=os.environ.get('STOCK_INT8') == '1')
+        except: detector = None
+        Clock.schedule_once(lambda dt: self._model_ready(detector))
+
+    def _model_ready(self, detector):
+        """ส่งโมเดลให้หน้ากล้อง (ทำงานบน Main Thread)"""
+        self.yolo_detector = detector
+        self.camera_screen.set_model(detector)
+        if self.startup_time: print(f"startup: model ready in {time.perf_counter() - _T0:.2f}s")
+
+    def _first_frame(self, *args):
+        Window.unbind(on_flip=self._first_frame)
+        print(f"startup: first frame in {time.perf_counter() - _T0:.2f}s")
+
+    def on_stop(self):
+        # ปิด Thread ตรวจจับเบื้องหลังเมื่อปิดแอป
+        self.camera_screen.stop_live()
+        if self.yolo_detector: self.yolo_detector.shutdown()
+        if trace.enabled and trace.stages: print(f"perf trace saved to {trace.dump_jsonl()}")
 
 if __name__ == '__main__': 
     StockCountApp().run()
\ No newline at end of file
@@ -0,0 +1,117 @@
+from collections import Counter
+
+# --- ระบบติดตามวัตถุข้ามเฟรม (Multi-frame Object Tracking) ---
+def iou(a, b):
+    """สัดส่วนพื้นที่ซ้อนทับ (Intersection over Union) ของกรอบ (x1, y1, x2, y2) สองกรอบ"""
+    iw = min(a[2], b[2]) - max(a[0], b[0])
+    ih = min(a[3], b[3]) - max(a[1], b[1])
+    if iw <= 0 or ih <= 0: return 0.0
+    inter = iw * ih
+    return inter / ((a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter)
+
+def centroid_distance(a, b):
+    """ระยะห่างระหว่างจุดศูนย์กลางของสองกรอบ หารด้วยขนาดกรอบเฉลี่ย (ไม่ขึ้นกับความละเอียดภาพ)"""
+    ax, ay, bx, by = (a[0] + a[2]) / 2, (a[1] + a[3]) / 2, (b[0] + b[2]) / 2, (b[1] + b[3]) / 2
+    size = ((a[2] - a[0]) + (a[3] - a[1]) + (b[2] - b[0]) + (b[3] - b[1])) / 4 or 1
+    return ((ax - bx) ** 2 + (ay - by) ** 2) ** 0.5 / size
+
+class Track:
+    """วัตถุหนึ่งชิ้นที่ถูกติดตาม มี id คงที่ตลอดการสแกน"""
+    def __init__(self, track_id, cls, box):
+        self.id, self.cls, self.box = track_id, cls, tuple(box)
+        self.vx = self.vy = 0.0      # ความเร็วต่อเฟรม ใช้เดาตำแหน่งในเฟรมที่ไม่ได้ตรวจจับ
+        self.hits, self.missed = 1, 0
+
+    def predict(self, frames=1):
+        """เลื่อนกรอบไปตามความเร็วล่าสุด (ใช้ในเฟรมที่ข้ามการตรวจจับ)"""
+        dx, dy = self.vx * frames, self.vy * frames
+        x1, y1, x2, y2 = self.box
+        self.box = (x1 + dx, y1 + dy, x2 + dx, y2 + dy)
+
+    def correct(self, box, frames=1):
+        """อัปเดตตำแหน่งจากผลตรวจจับจริง และปรับความเร็วตามความคลาดเคลื่อนจากตำแหน่งที่เดาไว้"""
+        old = self.box
+        self.vx += 0.5 * ((box[0] + box[2]) - (old[0] + old[2])) / 2 / frames
+        self.vy += 0.5 * ((box[1] + box[3]) - (old[1] + old[3])) / 2 / frames
+        self.box, self.hits, self.missed = tuple(box), self.hits + 1, 0
+
+class IoUTracker:
+    """จับคู่ผลตรวจจับกับ Track เดิมด้วย IoU (ถ้า IoU ต่ำใช้ระยะจุดศูนย์กลางแทน) แยกตามคลาส
+
+    วัตถุที่ถูกพบต่อเนื่องอย่างน้อย min_hits ครั้งจะถูกนับเป็นวัตถุจริง (กันกรอบหลอกที่โผล่มาเฟรมเดียว)
+    Track ที่หายไปเกิน max_missed ครั้งของการตรวจจับจะถูกลบ แต่ยังนับอยู่ในยอดของการสแกนนี้
+    """
+    def __init__(self, iou_threshold=0.3, max_distance=1.0, max_missed=5, min_hits=2):
+        self.iou_threshold, self.max_distance = iou_threshold, max_distance
+        self.max_missed, self.min_hits = max_missed, min_hits
+        self.reset()
+
+    def reset(self):
+        """เริ่มการสแกนใหม่ ล้าง Track และยอดนับทั้งหมด"""
+        self.tracks, self.next_id = [], 1
+        self.counted = {} # id -> คลาส ของวัตถุที่ยืนยันแล้วในการสแกนนี้
+
+    def predict(self, frames=1):
+        for t in self.tracks: t.predict(frames)
+
+    def update(self, detections, frames=1):
+        """รับผลตรวจจับ [(คลาส, กรอบ), ...] ของเฟรมล่าสุด frames คือจำนวนเฟรมนับจากการตรวจจับครั้งก่อน
+        (เฟรมที่ข้ามไประหว่างนั้นต้องเรียก predict() มาแล้ว)
+        """
+        self.predict()
+        # คะแนนการจับคู่: IoU สูงดีที่สุด ถ้าไม่ซ้อนกันเลยใช้ระยะจุดศูนย์กลาง (คะแนนติดลบ)
+        pairs = []
+        for ti, t in enumerate(self.tracks):
+            for di, (cls, box) in enumerate(detections):
+                if cls != t.cls: continue
+                o = iou(t.box, box)
+                if o >= self.iou_threshold: pairs.append((o, ti, di))
+                else:
+                    d = centroid_distance(t.box, box)
+                    if d <= self.max_distance: pairs.append((-d, ti, di))
+        pairs.sort(reverse=True)
+        used_t, used_d = set(), set()
+        for _, ti, di in pairs:
+            if ti in used_t or di in used_d: continue
+            self.tracks[ti].correct(detections[di][1], frames); used_t.add(ti); used_d.add(di)
+
+        for ti, t in enumerate(self.tracks):
+            if ti not in used_t: t.missed += 1
+        self.tracks = [t for t in self.tracks if t.missed <= self.max_missed]
+        for di, (cls, box) in enumerate(detections):
+            if di not in used_d:
+                self.tracks.append(Track(self.next_id, cls, box)); self.next_id += 1
+        for t in self.tracks:
+            if t.hits >= self.min_hits: self.counted[t.id] = t.cls
+        return self.tracks
+
+    def unique_counts(self):
+        """จำนวนวัตถุไม่ซ้ำต่อคลาสตลอดการสแกน เช่น {'bottle': 12}"""
+        return dict(Counter(self.counted.values()))
+
+class TrackingCounter:
+    """นับสต็อกจากภาพกล้องต่อเนื่องโดยไม่นับซ้ำ: ตรวจจับด้วย YOLO ทุก detect_every เฟรม
+    ส่วนเฟรมระหว่างนั้นใช้ Tracker เดาตำแหน่ง ทำให้ทำงานทันความเร็วกล้องได้
+    raise_errors=True ส่ง Exception ของโมเดลต่อให้ผู้เรียก (เฟรมนั้นไม่ถูกนับ และเฟรมถัดไปจะตรวจจับใหม่)
+    แทนการถือว่าไม่เจออะไรเลย
+    """
+    def __init__(self, detector, detect_every=3, confidence=0.5, tracker=None, raise_errors=False):
+        self.detector, self.detect_every, self.confidence = detector, max(1, detect_every), confidence
+        self.raise_errors = raise_errors
+        self.tracker = tracker or IoUTracker()
+        self.frame_no, self.last_detect = 0, 0
+
+    def reset(self):
+        self.tracker.reset(); self.frame_no = self.last_detect = 0
+
+    def update(self, frame):
+        """ส่งเฟรมล่าสุดเข้ามา คืนค่า (Track ที่กำลังติดตาม, ยอดนับไม่ซ้ำต่อคลาส)"""
+        if self.frame_no % self.detect_every == 0:
+            boxes = (self.detector.detect_batch_boxes([frame], self.confidence)[0][1] if self.raise_errors
+                     else self.detector.detect_boxes(frame, self.confidence))
+            dets = [(cls, box) for cls, _, box in boxes]
+            self.tracker.update(dets, max(1, self.frame_no - self.last_detect))
+            self.last_detect = self.frame_no
+        else: self.tracker.predict()
+        self.frame_no += 1
+        return self.tracker.tracks, self.tracker.unique_counts()
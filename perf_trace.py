@@ -0,0 +1,69 @@
+import json
+import os
+import time
+from collections import deque
+
+# --- วัดเวลาแต่ละขั้นตอนของการสแกน (Per-stage Latency Trace) ---
+class _Span:
+    """Context manager ที่จับเวลาโค้ดในบล็อก with แล้วบันทึกลง PerfTrace"""
+    __slots__ = ('trace', 'stage', 't0')
+    def __init__(self, trace, stage): self.trace, self.stage = trace, stage
+    def __enter__(self): self.t0 = time.perf_counter(); return self
+    def __exit__(self, *exc): self.trace.record(self.stage, time.perf_counter() - self.t0)
+
+class _NullSpan:
+    """ใช้แทน _Span เมื่อปิดการวัด ไม่ทำอะไรเลย (ใช้ Instance เดียวร่วมกัน ไม่ต้องสร้าง Object ใหม่)"""
+    __slots__ = ()
+    def __enter__(self): return self
+    def __exit__(self, *exc): pass
+
+_NULL = _NullSpan()
+
+class PerfTrace:
+    """เก็บเวลาของแต่ละขั้นตอนใน Ring buffer (ขั้นละ size ค่าล่าสุด) และสรุปเป็น p50/p95/p99
+
+    เมื่อปิดอยู่ (enabled=False) span() คืน Object ว่างตัวเดิมและ record() ออกทันที จึงแทบไม่มีต้นทุน
+    deque.append ปลอดภัยเมื่อเรียกจากหลาย Thread (เช่น Thread ตรวจจับกับ Main Thread)
+    """
+    def __init__(self, enabled=False, size=512):
+        self.enabled, self.size = enabled, size
+        self.stages = {} # ชื่อขั้นตอน -> deque ของ (เวลาที่บันทึก, วินาทีที่ใช้)
+
+    def span(self, stage):
+        """ใช้กับ with: with trace.span('detect.model'): ..."""
+        return _Span(self, stage) if self.enabled else _NULL
+
+    def record(self, stage, seconds):
+        if not self.enabled: return
+        buf = self.stages.get(stage)
+        if buf is None: buf = self.stages.setdefault(stage, deque(maxlen=self.size))
+        buf.append((time.time(), seconds))
+
+    def reset(self): self.stages = {}
+
+    def summary(self):
+        """สรุปแต่ละขั้นตอนเป็นมิลลิวินาที {ขั้นตอน: {'n', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms'}}"""
+        res = {}
+        for stage, buf in list(self.stages.items()):
+            s = sorted(v for _, v in list(buf))
+            if not s: continue
+            pct = lambda q: round(s[min(len(s) - 1, int(q * len(s)))] * 1000, 2)
+            res[stage] = {'n': len(s), 'p50_ms': pct(0.5), 'p95_ms': pct(0.95), 'p99_ms': pct(0.99), 'max_ms': round(s[-1] * 1000, 2)}
+        return res
+
+    def format_summary(self):
+        """ข้อความสรุปสำหรับแสดงบนหน้าจอ บรรทัดละหนึ่งขั้นตอน"""
+        return '\n'.join(f"{k}: {v['p50_ms']:.1f} / {v['p95_ms']:.1f} / {v['p99_ms']:.1f} ms (n={v['n']})"
+                         for k, v in sorted(self.summary().items()))
+
+    def dump_jsonl(self, path=None):
+        """เขียนค่าที่เก็บไว้ทั้งหมดเป็น JSONL บรรทัดละค่า {'t', 'stage', 'ms'} เรียงตามเวลา และบรรทัดสรุปท้ายไฟล์"""
+        path = path or os.environ.get('STOCK_TRACE_FILE', 'perf_trace.jsonl')
+        rows = sorted((t, stage, v) for stage, buf in list(self.stages.items()) for t, v in list(buf))
+        with open(path, 'w', encoding='utf-8') as f:
+            for t, stage, v in rows: f.write(json.dumps({'t': round(t, 6), 'stage': stage, 'ms': round(v * 1000, 3)}) + '\n')
+            f.write(json.dumps({'summary': self.summary()}) + '\n')
+        return path
+
+# ตัววัดที่ใช้ร่วมกันทั้งแอป เปิดด้วย STOCK_TRACE=1 (ขนาด Ring buffer ต่อขั้นตอนกำหนดด้วย STOCK_TRACE_SIZE)
+trace = PerfTrace(os.environ.get('STOCK_TRACE') == '1', int(os.environ.get('STOCK_TRACE_SIZE', '512')))
@@ -0,0 +1,101 @@
+import importlib
+import os
+from abc import ABC, abstractmethod
+
+# --- ส่วนต่อประสานของระบบจัดเก็บ (Storage Interface) ---
+class BaseStockData(ABC):
+    """ส่วนต่อประสาน (Interface) ที่ทุก Backend ของข้อมูลสต็อกต้องมี หน้าจอและสคริปต์เรียกผ่านเมธอดเหล่านี้เท่านั้น
+
+    รายการเป็น dict {id, product_name, count, timestamp, version} อ้างอิงด้วย id ที่คงที่ (ไม่ใช่ตำแหน่งใน List)
+    update_record/delete_record ที่ระบุ version จะไม่แก้ถ้ารายการถูกแก้ไปแล้ว (คืนค่า False)
+    transaction() รวมหลายการเขียนเป็นก้อนเดียว ใช้เวลาประทับเดียวกัน และย้อนกลับทั้งหมดถ้าเกิด Exception
+    ทุก Backend ต้องผ่าน conformance_stock.py
+    """
+    pushdown = True # กรองด้วย query_records เอง (StockSearch ไม่ต้องสร้างดัชนีในหน่วยความจำ)
+                    # Backend ที่ตั้ง False ต้องมี listeners และเรียก fn(op, ตำแหน่ง, ข้อมูลเดิม) หลังข้อมูลเปลี่ยน
+
+    @abstractmethod
+    def transaction(self):
+        """Context manager รวมหลายการเพิ่ม/แก้ไข/ลบ (ซ้อนกันได้ ชั้นในรวมกับชั้นนอกสุด)"""
+
+    @abstractmethod
+    def add_record(self, product_name, count):
+        """เพิ่มรายการใหม่พร้อมประทับเวลา คืนค่า id"""
+
+    def add_records(self, items):
+        """เพิ่มหลายรายการ [(ชื่อสินค้า, จำนวน), ...] (หรือ dict) ใน transaction เดียว คืนค่า List ของ id"""
+        items = items.items() if isinstance(items, dict) else items
+        with self.transaction(): return [self.add_record(n, c) for n, c in items]
+
+    @abstractmethod
+    def get_record(self, record_id):
+        """รายการตาม id (dict) หรือ None ถ้าไม่มี"""
+
+    @abstractmethod
+    def update_record(self, record_id, new_name, new_count, version=None):
+        """แก้ไขตาม id คืนค่า True ถ้าสำเร็จ"""
+
+    @abstractmethod
+    def delete_record(self, record_id, version=None):
+        """ลบตาม id คืนค่า True ถ้าสำเร็จ"""
+
+    @abstractmethod
+    def get_all_records(self):
+        """ทุกรายการเรียงจากเก่าไปใหม่ (ตาม id)"""
+
+    @abstractmethod
+    def query_records(self, name='', date=''):
+        """กรองตามชื่อ (ไม่สนตัวพิมพ์) และวันที่/ช่วงวันที่ (parse_date_query) คืนค่า [(id, record)] เรียงจากใหม่ไปเก่า"""
+
+    @abstractmethod
+    def iter_records(self, name='', date='', chunk=1000):
+        """Generator ของ List รายการที่ตรงเงื่อนไขทีละก้อน เรียงจากเก่าไปใหม่ (ใช้ส่งออกแบบ Streaming)"""
+
+    @abstractmethod
+    def count_records(self, name='', date=''):
+        """จำนวนรายการที่ตรงเงื่อนไข"""
+
+    @abstractmethod
+    def daily_totals(self, name='', date=''):
+        """ยอดรวมรายวันที่ตรงเงื่อนไข [(วัน, สินค้า, ยอดรวม, จำนวนรายการ)] เรียงตามวันและสินค้า"""
+
+    @abstractmethod
+    def get_products(self):
+        """รายชื่อสินค้าทั้งหมด เรียงตามลำดับที่พบครั้งแรก"""
+
+    @abstractmethod
+    def get_product_trend(self, n):
+        """ยอดรวมรายวันของสินค้าหนึ่งรายการ {วัน: ยอดรวม} เรียงตามวันที่"""
+
+    def get_product_daily_trends(self):
+        """ยอดรวมรายวันของทุกสินค้า {สินค้า: {วัน: ยอดรวม}} สำหรับวาดกราฟ"""
+        return {n: self.get_product_trend(n) for n in self.get_products()}
+
+    def sync(self):
+        """อ่านการเปลี่ยนแปลงจาก Process อื่น คืนค่า True ถ้าข้อมูลเปลี่ยน (Backend ที่อ่านจากไฟล์ทุกครั้งไม่ต้องทำอะไร)"""
+        return False
+
+    def export_to_csv(self):
+        """ส่งออกข้อมูลทั้งหมดเป็น CSV (ตัวกรอง/รูปแบบอื่นดู stock_export)"""
+        from stock_export import export_records
+        try: return export_records(self)
+        except: return None
+
+    def close(self): pass
+
+# ชื่อ Backend -> (Module, Class, ไฟล์ข้อมูลเริ่มต้น)
+BACKENDS = {
+    'journal': ('stock_store', 'StockData', 'stock_data.json'),       # Snapshot ไบนารี + Journal (ค่าเริ่มต้น หลายเครื่องเขียนพร้อมกันได้)
+    'sqlite': ('stock_sqlite', 'SQLiteStockData', 'stock_data.db'),   # SQLite (หลายเครื่องเขียนพร้อมกันได้)
+    'json': ('stock_memory', 'JSONStockData', 'stock_data.json'),     # JSON เขียนใหม่ทั้งไฟล์ทุกครั้ง (แบบเดิม เครื่องเดียว ประวัติเล็ก)
+    'memory': ('stock_memory', 'MemoryStockData', None),              # ในหน่วยความจำ ไม่บันทึกลงดิสก์ (ทดสอบ/เดโม)
+}
+
+def open_stock_data(backend=None, filename=None):
+    """เปิด Backend ตามชื่อ หรือตามค่าตั้ง STOCK_BACKEND (ค่าเริ่มต้น journal) และไฟล์ STOCK_FILE (ถ้าไม่ระบุ)"""
+    backend = backend or os.environ.get('STOCK_BACKEND', 'journal')
+    if backend not in BACKENDS: raise ValueError(f"unknown backend: {backend}")
+    module, cls, default = BACKENDS[backend]
+    cls = getattr(importlib.import_module(module), cls)
+    if default is None: return cls()
+    return cls(filename or os.environ.get('STOCK_FILE') or default)
@@ -0,0 +1,291 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import numpy as np
+
+# --- ตารางข้อมูลแบบคอลัมน์ (Columnar Record Table) ---
+DAY = 86400
+
+def parse_times(timestamps):
+    """แปลงเวลา 'YYYY-MM-DD HH:MM:SS' เป็นวินาทีนับจาก 1970-01-01 (ไม่ผ่าน Timezone) ทั้ง Array ในครั้งเดียว"""
+    return np.asarray(timestamps, dtype='datetime64[s]').astype(np.int64)
+
+def format_times(seconds):
+    """แปลงวินาทีกลับเป็นข้อความ 'YYYY-MM-DD HH:MM:SS' แบบเดียวกับที่บันทึก"""
+    s = np.datetime_as_string(np.asarray(seconds, dtype='datetime64[s]'))
+    return np.char.replace(s, 'T', ' ') if s.size else s
+
+def format_days(seconds):
+    """แปลงวินาทีเป็นข้อความวัน 'YYYY-MM-DD'"""
+    return np.datetime_as_string((np.asarray(seconds, dtype=np.int64) // DAY).astype('datetime64[D]'))
+
+_HMS = [] # ข้อความ 'HH:MM:SS' ของทุกวินาทีในวัน สร้างครั้งแรกที่ใช้
+
+def time_strings(seconds):
+    """เหมือน format_times แต่คืน List ของ str และเร็วกว่า: แปลงเฉพาะวันที่ไม่ซ้ำ แล้วต่อกับเวลาในวันจากตารางที่สร้างไว้"""
+    if not _HMS: _HMS.extend(f"{h:02d}:{m:02d}:{s:02d}" for h in range(24) for m in range(60) for s in range(60))
+    days, sod = np.divmod(np.asarray(seconds, dtype=np.int64), DAY)
+    uniq, inv = np.unique(days, return_inverse=True)
+    names = [d + ' ' for d in np.datetime_as_string(uniq.astype('datetime64[D]')).tolist()]
+    return [names[d] + _HMS[t] for d, t in zip(inv.tolist(), sod.tolist())]
+
+class RecordView:
+    """มุมมองแบบ dict ของแถวหนึ่งในตาราง (อ่าน/เขียนผ่านคอลัมน์โดยตรง ไม่คัดลอกข้อมูล)
+
+    ผูกกับตำแหน่งของแถว จึงใช้ได้จนกว่าจะมีการลบแถวก่อนหน้า (เหมือน Index ของ List) id และ version อ่านได้อย่างเดียว
+    """
+    __slots__ = ('table', 'i')
+    KEYS = ('id', 'product_name', 'count', 'timestamp', 'version')
+    def __init__(self, table, i): self.table, self.i = table, i
+
+    def __getitem__(self, key):
+        t = self.table
+        if key == 'product_name': return t.products[t._pid[self.i]]
+        if key == 'count': return int(t._count[self.i])
+        if key == 'timestamp': return str(np.datetime64(int(t._time[self.i]), 's')).replace('T', ' ')
+        if key == 'id': return int(t._id[self.i])
+        if key == 'version': return int(t._ver[self.i])
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        t = self.table
+        if key == 'product_name': t._pid[self.i] = t.intern(value)
+        elif key == 'count': t._count[self.i] = int(value)
+        elif key == 'timestamp': t._time[self.i] = parse_times(value)
+        else: raise KeyError(key)
+
+    def get(self, key, default=None): return self[key] if key in self.KEYS else default
+    def keys(self): return list(self.KEYS)
+    def values(self): return [self[k] for k in self.KEYS]
+    def items(self): return [(k, self[k]) for k in self.KEYS]
+    def __iter__(self): return iter(self.KEYS)
+    def __len__(self): return len(self.KEYS)
+    def __contains__(self, key): return key in self.KEYS
+    def update(self, other):
+        for k, v in dict(other).items(): self[k] = v
+    def __eq__(self, other):
+        try: return dict(self) == dict(other)
+        except (TypeError, ValueError): return NotImplemented
+    def __repr__(self): return repr(dict(self))
+
+class RecordTable:
+    """เก็บบันทึกสต็อกเป็นคอลัมน์แทน List ของ dict: ชื่อสินค้าเก็บเป็นรหัส (int32) อ้างอิงตารางชื่อที่ Intern ไว้
+    จำนวนเป็น int64 และเวลาเป็นวินาที (int64) ใช้หน่วยความจำราว 20 byte ต่อรายการ
+
+    ใช้แทน List เดิมได้ (len, [i], [a:b], append, pop, insert, วนลูป) โดย [i] คืน RecordView
+    ส่วน [a:b] และการวนลูปคืน dict ที่คัดลอกแล้ว และมีคำสั่งกรอง/รวมยอดแบบ Vectorized (mask, daily_groups)
+    ทุกแถวมี id ที่คงที่ (เพิ่มขึ้นตามลำดับที่เพิ่ม ไม่ถูกใช้ซ้ำ คอลัมน์ id จึงเรียงอยู่เสมอ) และ version ที่เพิ่มทุกครั้งที่แก้ไข
+    """
+    _COLS = ('_pid', '_count', '_time', '_id', '_ver')
+
+    def __init__(self, records=()):
+        self.products, self.product_ids = [], {} # รหัส -> ชื่อ, ชื่อ -> รหัส
+        self._n, self.next_id = 0, 0 # next_id คือ id ของแถวถัดไป (มากกว่า id ทุกตัวที่เคยใช้)
+        self._pid, self._count, self._time = np.empty(0, np.int32), np.empty(0, np.int64), np.empty(0, np.int64)
+        self._id, self._ver = np.empty(0, np.int64), np.empty(0, np.int32)
+        self.mapped = None # mmap ของไฟล์ Snapshot ที่คอลัมน์อ้างอิงอยู่ (ดู open_snapshot)
+        records = list(records)
+        if records:
+            # ไฟล์ JSON แบบเดิมไม่มี id ให้ใช้ลำดับในไฟล์แทน
+            keep = all('id' in r for r in records)
+            self.extend_columns([r['product_name'] for r in records], [r['count'] for r in records],
+                                parse_times([r['timestamp'] for r in records]),
+                                [r['id'] for r in records] if keep else None, [r.get('version', 0) for r in records])
+
+    # คอลัมน์เฉพาะส่วนที่ใช้งาน (View ไม่คัดลอก)
+    @property
+    def pid(self): return self._pid[:self._n]
+    @property
+    def count(self): return self._count[:self._n]
+    @property
+    def time(self): return self._time[:self._n]
+    @property
+    def ids(self): return self._id[:self._n]
+    @property
+    def versions(self): return self._ver[:self._n]
+
+    @classmethod
+    def from_columns(cls, products, pid, count, time, ids, ver, next_id, mapped=None):
+        """สร้างตารางจากคอลัมน์ที่มีอยู่แล้ว (ไม่คัดลอก) ความจุเท่ากับจำนวนแถว การเพิ่มครั้งแรกจึงย้ายไปหน่วยความจำของตัวเอง"""
+        t = cls()
+        t.products, t.product_ids = list(products), {p: i for i, p in enumerate(products)}
+        t._pid, t._count, t._time, t._id, t._ver = pid, count, time, ids, ver
+        t._n, t.next_id, t.mapped = len(pid), next_id, mapped
+        return t
+
+    def take(self, idx):
+        """ตารางใหม่ของแถวตามตำแหน่งใน idx (คัดลอกคอลัมน์ จึงไม่เปลี่ยนตามตารางเดิมหรือ mmap)"""
+        idx = np.asarray(idx, dtype=np.int64)
+        return RecordTable.from_columns(self.products, self._pid[idx], self._count[idx], self._time[idx],
+                                        self._id[idx], self._ver[idx], self.next_id)
+
+    def detach(self):
+        """คัดลอกคอลัมน์ออกจาก mmap แล้วปิดไฟล์ (ต้องทำก่อนเขียน Snapshot ทับ เพราะ Windows เปลี่ยนชื่อทับไฟล์ที่ถูก map ไม่ได้)"""
+        if self.mapped is None: return
+        for name in self._COLS: setattr(self, name, getattr(self, name)[:self._n].copy())
+        try: self.mapped.close()
+        except BufferError: pass # ยังมี Array อื่นอ้างอิงอยู่ ปล่อยให้ถูกปิดเมื่อไม่มีใครใช้
+        self.mapped = None
+
+    def intern(self, name):
+        pid = self.product_ids.get(name)
+        if pid is None: pid = self.product_ids[name] = len(self.products); self.products.append(name)
+        return pid
+
+    def _reserve(self, n):
+        """ขยายความจุทีละเท่าตัว ทำให้ append เฉลี่ยเป็น O(1)"""
+        if n <= len(self._pid): return
+        cap = max(n, 2 * len(self._pid), 1024)
+        self.mapped = None # Array ใหม่ไม่อ้างอิง mmap แล้ว
+        for name in self._COLS:
+            old = getattr(self, name); new = np.empty(cap, old.dtype); new[:self._n] = old[:self._n]; setattr(self, name, new)
+
+    def extend_columns(self, names, counts, times, ids=None, versions=0):
+        """เพิ่มหลายแถวจากคอลัมน์ (ชื่อสินค้า, จำนวน, เวลาเป็นวินาที) ในครั้งเดียว ถ้าไม่ระบุ ids จะออก id ใหม่ต่อจาก next_id"""
+        n = len(names)
+        if not n: return
+        ids = np.arange(self.next_id, self.next_id + n) if ids is None else np.asarray(ids, dtype=np.int64)
+        self._reserve(self._n + n)
+        s = slice(self._n, self._n + n)
+        self._pid[s] = [self.intern(p) for p in names]
+        self._count[s], self._time[s], self._id[s], self._ver[s] = counts, times, ids, versions
+        self._n += n
+        self.next_id = max(self.next_id, int(ids.max()) + 1)
+
+    def append(self, r):
+        """เพิ่มแถวท้ายตาราง (ใช้ id ของ r ถ้ามี ซึ่งต้องมากกว่า id ของทุกแถว) คืนค่า id ของแถว"""
+        rid = int(r.get('id', self.next_id))
+        self._reserve(self._n + 1)
+        i = self._n
+        self._pid[i], self._count[i], self._time[i] = self.intern(r['product_name']), int(r['count']), parse_times(r['timestamp'])
+        self._id[i], self._ver[i] = rid, r.get('version', 0)
+        self._n += 1
+        self.next_id = max(self.next_id, rid + 1)
+        return rid
+
+    def insert(self, i, r):
+        """ใส่แถวกลับที่ตำแหน่ง i (ใช้ย้อนการลบ r ต้องมี id เดิม)"""
+        next_id = self.next_id
+        self.append(r); self.next_id = next_id
+        for name in self._COLS:
+            col = getattr(self, name); col[i:self._n] = np.roll(col[i:self._n], 1)
+
+    def pop(self, i=-1):
+        i = range(self._n)[i]
+        r = dict(self[i])
+        for name in self._COLS:
+            col = getattr(self, name); col[i:self._n - 1] = col[i + 1:self._n]
+        self._n -= 1
+        return r
+
+    def set(self, i, name, count, version=None):
+        """แก้ชื่อและจำนวนของแถว i แล้วตั้ง version (ค่าเริ่มต้นคือเพิ่มขึ้น 1)"""
+        i = range(self._n)[i]
+        self._pid[i], self._count[i] = self.intern(name), int(count)
+        self._ver[i] = self._ver[i] + 1 if version is None else version
+
+    def index_of(self, rid):
+        """ตำแหน่งของแถวที่มี id นี้ (ค้นหาแบบ Binary search เพราะคอลัมน์ id เรียงอยู่) ไม่พบจะ raise KeyError"""
+        i = int(np.searchsorted(self.ids, rid))
+        if i >= self._n or self._id[i] != rid: raise KeyError(rid)
+        return i
+
+    def __len__(self): return self._n
+
+    def __getitem__(self, i):
+        if isinstance(i, slice): return self.rows(np.arange(self._n)[i])
+        return RecordView(self, range(self._n)[i])
+
+    def __iter__(self):
+        for s in range(0, self._n, 4096): yield from self.rows(np.arange(s, min(s + 4096, self._n)))
+
+    def __eq__(self, other):
+        if isinstance(other, RecordTable): return self.to_list() == other.to_list()
+        if isinstance(other, list): return self.to_list() == other
+        return NotImplemented
+
+    def rows(self, idx):
+        """dict ของแถวตามตำแหน่งใน idx (สร้างทั้งชุดแบบ Vectorized)"""
+        idx = np.asarray(idx, dtype=np.int64)
+        names = [self.products[p] for p in self._pid[idx].tolist()]
+        return [{'id': i, 'product_name': n, 'count': c, 'timestamp': t, 'version': v} for i, n, c, t, v in
+                zip(self._id[idx].tolist(), names, self._count[idx].tolist(), time_strings(self._time[idx]), self._ver[idx].tolist())]
+
+    def to_list(self): return self.rows(np.arange(self._n))
+
+    # --- การกรองและรวมยอดแบบ Vectorized ---
+    def name_mask(self, name):
+        """แถวที่ชื่อสินค้ามีคำค้นอยู่ (ไม่สนตัวพิมพ์) ตรวจเฉพาะตารางชื่อที่ไม่ซ้ำ แล้วเทียบรหัสทั้งคอลัมน์"""
+        name = name.lower()
+        ids = [i for i, p in enumerate(self.products) if name in p.lower()]
+        return np.isin(self.pid, ids)
+
+    def day_mask(self, lo, hi):
+        """แถวที่วัน (ข้อความ YYYY-MM-DD) อยู่ในช่วง lo <= วัน < hi แบบเดียวกับ parse_date_query"""
+        days = self.time // DAY
+        uniq = np.unique(days)
+        names = format_days(uniq * DAY)
+        return np.isin(days, uniq[(names >= lo) & (names < hi)])
+
+    def text_mask(self, q):
+        """แถวที่ข้อความเวลามี q อยู่ (ใช้กับคำค้นที่ไม่ใช่วันที่ เช่น 10:30)"""
+        return np.fromiter((q in t for t in time_strings(self.time)), bool, self._n)
+
+    def daily_groups(self, mask=None):
+        """ยอดรวมต่อ (สินค้า, วัน) คืนค่า (รหัสสินค้า, วันเป็นวินาที, ยอดรวม, จำนวนแถว) เป็น Array เรียงตามรหัสและวัน"""
+        pid, days, count = self.pid, self.time // DAY, self.count
+        if mask is not None: pid, days, count = pid[mask], days[mask], count[mask]
+        if not len(pid): return (np.empty(0, np.int64),) * 4
+        key = pid.astype(np.int64) * (1 << 32) + (days - days.min())
+        uniq, inv = np.unique(key, return_inverse=True)
+        totals = np.bincount(inv, weights=count, minlength=len(uniq)).astype(np.int64)
+        rows = np.bincount(inv, minlength=len(uniq))
+        return uniq >> 32, ((uniq & 0xFFFFFFFF) + days.min()) * DAY, totals, rows
+
+# --- Snapshot แบบไบนารี (เปิดด้วย mmap ได้ทันทีโดยไม่ต้อง Parse) ---
+# โครงสร้างไฟล์: MAGIC, ความยาว Header (uint32), Header เป็น JSON (ตารางชื่อสินค้า, digest, ตำแหน่งของแต่ละคอลัมน์)
+# แล้วตามด้วยคอลัมน์ความกว้างคงที่ (little-endian) เรียงต่อกันทีละ 8 byte
+# pid/count/time/id/ver คือข้อมูลดิบ ส่วน g_* คือยอดรวมต่อ (สินค้า, วัน) จาก daily_groups เพื่อไม่ต้องรวมใหม่ตอนเปิด
+MAGIC = b'STKSNAP1'
+_COLUMNS = (('pid', '<i4'), ('count', '<i8'), ('time', '<i8'), ('id', '<i8'), ('ver', '<i4'),
+            ('g_pid', '<i8'), ('g_day', '<i8'), ('g_total', '<i8'), ('g_rows', '<i8'))
+
+def snapshot_bytes(table):
+    """แปลงตารางเป็นไฟล์ Snapshot ไบนารี คืนค่า (bytes, digest)"""
+    cols = dict(zip(('pid', 'count', 'time', 'id', 'ver'), (table.pid, table.count, table.time, table.ids, table.versions)))
+    cols.update(zip(('g_pid', 'g_day', 'g_total', 'g_rows'), table.daily_groups()))
+    blobs = [np.ascontiguousarray(cols[name], dtype=dt).tobytes() for name, dt in _COLUMNS]
+    blobs = [b + bytes(-len(b) % 8) for b in blobs]
+    digest = hashlib.sha1(json.dumps(table.products).encode('utf-8'))
+    for b in blobs: digest.update(b)
+    digest = digest.hexdigest()
+    layout, off = {}, 0
+    for (name, dt), b in zip(_COLUMNS, blobs):
+        layout[name] = [off, len(cols[name])]; off += len(b)
+    header = json.dumps({'digest': digest, 'products': table.products, 'next_id': table.next_id, 'columns': layout},
+                        ensure_ascii=False).encode('utf-8')
+    header += b' ' * (-(len(MAGIC) + 4 + len(header)) % 8)
+    return b''.join([MAGIC, struct.pack('<I', len(header)), header] + blobs), digest
+
+def open_snapshot(path):
+    """เปิด Snapshot ไบนารีด้วย mmap (Copy-on-write: แก้ไขในหน่วยความจำได้โดยไม่กระทบไฟล์) ใช้เวลาแทบคงที่ไม่ขึ้นกับจำนวนรายการ
+    คืนค่า (RecordTable, digest, ยอดรวมรายวันในรูปแบบเดียวกับ daily_groups)
+
+    บน Windows อ่านทั้งไฟล์เข้าหน่วยความจำแทน เพราะไฟล์ที่ถูก map อยู่จะถูก Process อื่นเขียนทับ (Compaction) ไม่ได้
+    """
+    with open(path, 'rb') as f:
+        if os.name == 'nt': mm = bytearray(os.path.getsize(path)); f.readinto(mm)
+        else: mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    if mm[:len(MAGIC)] != MAGIC: raise ValueError(f"{path} is not a stock snapshot")
+    size, = struct.unpack_from('<I', mm, len(MAGIC))
+    base = len(MAGIC) + 4 + size
+    header = json.loads(bytes(mm[len(MAGIC) + 4:base]).decode('utf-8'))
+    cols = {name: np.frombuffer(mm, dtype=dt, count=header['columns'][name][1], offset=base + header['columns'][name][0])
+            for name, dt in _COLUMNS if name in header['columns']}
+    n = len(cols['pid'])
+    if 'id' not in cols: cols['id'], cols['ver'] = np.arange(n, dtype=np.int64), np.zeros(n, np.int32) # Snapshot ก่อนมี id
+    table = RecordTable.from_columns(header['products'], cols['pid'], cols['count'], cols['time'], cols['id'], cols['ver'],
+                                     header.get('next_id', n), mm if isinstance(mm, mmap.mmap) else None)
+    return table, header['digest'], (cols['g_pid'], cols['g_day'], cols['g_total'], cols['g_rows'])
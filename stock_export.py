@@ -0,0 +1,149 @@
+"""ส่งออกประวัติสต็อกแบบ Streaming: อ่านจาก Backend ทีละก้อน (iter_records) แล้วเขียนต่อท้ายไฟล์ทันที
+
+รองรับกรองตามชื่อสินค้า/ช่วงวันที่ ส่งออกยอดรวมรายวันที่รวมไว้แล้ว (daily_totals)
+และรูปแบบ CSV, CSV บีบอัด (.csv.gz), แบบคอลัมน์ของ NumPy (.npz) สำหรับงานวิเคราะห์
+หรือ JSON รูปแบบเดียวกับ stock_data.json (นำเข้าเครื่องอื่นได้)
+ตัวอย่าง:
+    python stock_export.py --product milk --date 2026-01..2026-03 --format csv.gz
+    python stock_export.py --daily --format npz --backend sqlite
+    python stock_export.py --format json --out backup.json
+"""
+import argparse
+import csv
+import gzip
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+FORMATS = ('csv', 'csv.gz', 'npz', 'json')
+
+def export_path(prefix='export', fmt='csv'):
+    return f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M')}.{fmt}"
+
+def _write_file(path, fmt, write):
+    """เขียนลงไฟล์ .part ก่อนแล้วค่อยเปลี่ยนชื่อ ไฟล์ที่ยังเขียนไม่เสร็จ (หรือล้มเหลว) จะไม่ปรากฏเป็นผลลัพธ์"""
+    tmp = path + '.part'
+    try:
+        if fmt == 'npz':
+            with open(tmp, 'wb') as f: write(f)
+        else:
+            opener = gzip.open if fmt == 'csv.gz' else open
+            with opener(tmp, 'wt', newline='', encoding='utf-8' if fmt == 'json' else 'utf-8-sig') as f: write(f)
+        os.replace(tmp, path)
+    except:
+        if os.path.exists(tmp): os.remove(tmp)
+        raise
+    return path
+
+class _Columns:
+    """สะสมข้อมูลเป็นคอลัมน์ทีละก้อน ชื่อสินค้าเก็บเป็นรหัส (product_id) อ้างอิงตาราง products"""
+    def __init__(self, *names):
+        self.names, self.cols, self.ids = names, {n: [] for n in names}, {}
+
+    def product_ids(self, products):
+        return [self.ids.setdefault(p, len(self.ids)) for p in products]
+
+    def extend(self, **chunks):
+        for n, v in chunks.items(): self.cols[n].append(v)
+
+    def save(self, f, dtypes):
+        import numpy as np
+        arrays = {n: np.concatenate([np.asarray(c, dtype=dtypes[n]) for c in self.cols[n]]) if self.cols[n]
+                  else np.empty(0, dtype=dtypes[n]) for n in self.names}
+        np.savez_compressed(f, products=np.array(list(self.ids), dtype=str), **arrays)
+
+def export_records(stock_data, path=None, fmt='csv', name='', date='', chunk=2000, progress=None):
+    """ส่งออกรายการที่ตรงเงื่อนไข (Product, Count, Time) คืนค่าชื่อไฟล์ หรือ None ถ้าไม่มีข้อมูล
+
+    progress(จำนวนที่เขียนแล้ว, ทั้งหมด) ถูกเรียกหลังเขียนแต่ละก้อน
+    .npz มีคอลัมน์ product_id, count, time (datetime64[s]) และตาราง products
+    .json เป็น List ของ {product_name, count, timestamp} แบบเดียวกับ stock_data.json
+    """
+    total = stock_data.count_records(name, date)
+    if not total: return None
+    path = path or export_path('export', fmt)
+
+    def write(f):
+        done, cols = 0, _Columns('product_id', 'count', 'time') if fmt == 'npz' else None
+        w = csv.writer(f) if fmt in ('csv', 'csv.gz') else None
+        if w: w.writerow(['Product', 'Count', 'Time'])
+        if fmt == 'json': f.write('[')
+        for rows in stock_data.iter_records(name, date, chunk):
+            if cols: cols.extend(product_id=cols.product_ids(r['product_name'] for r in rows),
+                                 count=[r['count'] for r in rows], time=[r['timestamp'] for r in rows])
+            elif w: w.writerows([r['product_name'], r['count'], r['timestamp']] for r in rows)
+            else: f.write(('\n  ' if not done else ',\n  ') + ',\n  '.join(json.dumps(
+                {'product_name': r['product_name'], 'count': r['count'], 'timestamp': r['timestamp']}, ensure_ascii=False) for r in rows))
+            done += len(rows)
+            if progress: progress(done, total)
+        if cols: cols.save(f, {'product_id': 'int32', 'count': 'int64', 'time': 'datetime64[s]'})
+        if fmt == 'json': f.write('\n]\n')
+    return _write_file(path, fmt, write)
+
+def export_daily_totals(stock_data, path=None, fmt='csv', name='', date='', progress=None):
+    """ส่งออกยอดรวมรายวันต่อสินค้า (Day, Product, Total, Records) จากยอดที่ Backend รวมไว้แล้ว"""
+    rows = stock_data.daily_totals(name, date)
+    if not rows: return None
+    path = path or export_path('daily', fmt)
+
+    def write(f):
+        if fmt == 'npz':
+            cols = _Columns('day', 'product_id', 'total', 'records')
+            day, products, totals, n = zip(*rows)
+            cols.extend(day=day, product_id=cols.product_ids(products), total=totals, records=n)
+            cols.save(f, {'day': 'datetime64[D]', 'product_id': 'int32', 'total': 'int64', 'records': 'int64'})
+        elif fmt == 'json':
+            json.dump([dict(zip(('day', 'product_name', 'total', 'records'), r)) for r in rows], f, ensure_ascii=False, indent=2)
+        else:
+            w = csv.writer(f); w.writerow(['Day', 'Product', 'Total', 'Records']); w.writerows(rows)
+        if progress: progress(len(rows), len(rows))
+    return _write_file(path, fmt, write)
+
+def _on_main_thread(fn, *args):
+    """เรียก fn บน Main Thread ของ Kivy (ถ้าไม่ได้รันในแอป Kivy เรียกทันที)"""
+    if fn is None: return
+    try:
+        from kivy.clock import Clock
+        Clock.schedule_once(lambda dt: fn(*args))
+    except ImportError: fn(*args)
+
+class ExportWorker:
+    """รันการส่งออกทีละงานใน Thread เบื้องหลัง แล้วส่งความคืบหน้าและผลลัพธ์กลับ Main Thread"""
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='export')
+
+    def submit(self, stock_data, daily=False, on_progress=None, on_done=None, **options):
+        """options คือ path, fmt, name, date ของ export_records/export_daily_totals
+        on_progress(ทำแล้ว, ทั้งหมด) และ on_done(ชื่อไฟล์ หรือ None) ถูกเรียกบน Main Thread
+        """
+        export = export_daily_totals if daily else export_records
+        def job():
+            try: path = export(stock_data, progress=lambda d, t: _on_main_thread(on_progress, d, t), **options)
+            except Exception as e:
+                print(f"export error: {e}"); path = None
+            _on_main_thread(on_done, path)
+            return path
+        return self.executor.submit(job)
+
+    def shutdown(self): self.executor.shutdown(wait=True)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Export stock history')
+    ap.add_argument('--backend', choices=('journal', 'sqlite', 'json'), default='journal')
+    ap.add_argument('--file', help='data file (default: stock_data.json / stock_data.db)')
+    ap.add_argument('--product', default='', help='product name filter (case-insensitive substring)')
+    ap.add_argument('--date', default='', help='day prefix or range, e.g. 2026-02 or 2026-01..2026-03')
+    ap.add_argument('--daily', action='store_true', help='export daily totals per product')
+    ap.add_argument('--format', choices=FORMATS, default='csv')
+    ap.add_argument('--out', help='output file')
+    args = ap.parse_args(argv)
+
+    from stock_backend import open_stock_data
+    stock_data = open_stock_data(args.backend, args.file)
+    export = export_daily_totals if args.daily else export_records
+    path = export(stock_data, args.out, args.format, args.product, args.date)
+    print(f"exported to {path}" if path else "no matching records")
+
+if __name__ == "__main__":
+    main()
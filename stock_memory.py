@@ -0,0 +1,176 @@
+import bisect
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime
+from stock_backend import BaseStockData
+from stock_store import parse_date_query, _atomic_write, _file_sig
+
+# --- Backend แบบ List ในหน่วยความจำ (In-memory / JSON) ---
+class MemoryStockData(BaseStockData):
+    """เก็บรายการเป็น List ของ dict ในหน่วยความจำ ไม่บันทึกลงดิสก์ (ใช้ทดสอบ เดโม และเป็นตัวอ้างอิงของ conformance_stock)
+
+    รายการเรียงตาม id จึงหาตำแหน่งด้วย bisect ได้ การกรอง/รวมยอดวนทุกรายการแบบ Python ธรรมดา
+    หน้าจอค้นหาจึงใช้ดัชนีของ StockSearch (pushdown = False) ซึ่งอัปเดตตาม listeners
+    การแก้ไขแทนที่ dict ทั้งตัว (ไม่แก้ของเดิม) transaction จึงย้อนกลับได้ด้วยการเก็บสำเนาของ List ไว้
+    """
+    pushdown = False
+
+    def __init__(self, records=()):
+        self._tx = None # (สำเนาข้อมูลก่อนเริ่ม, เวลาประทับ) ของ transaction ที่เปิดอยู่
+        self.listeners = [] # ฟังก์ชัน fn(op, ตำแหน่ง, ข้อมูลเดิม) ที่ถูกเรียกหลังข้อมูลเปลี่ยน (ดัชนีของ StockSearch)
+        self._load(records)
+
+    def _load(self, records, next_id=0):
+        """ตั้งข้อมูลจาก List ของ dict (ไฟล์ JSON แบบเดิมไม่มี id ให้ใช้ลำดับในไฟล์แทน) next_id คือ id ถัดไปที่บันทึกไว้ (ถ้ามี)"""
+        keep = all('id' in r for r in records)
+        self.data = sorted(({'id': r['id'] if keep else i, 'product_name': r['product_name'], 'count': int(r['count']),
+                             'timestamp': r['timestamp'], 'version': r.get('version', 0)} for i, r in enumerate(records)),
+                           key=lambda r: r['id'])
+        self.ids = [r['id'] for r in self.data]
+        self.next_id = max(self.ids[-1] + 1 if self.ids else 0, next_id)
+
+    def _index(self, record_id):
+        i = bisect.bisect_left(self.ids, record_id)
+        if i == len(self.ids) or self.ids[i] != record_id: raise KeyError(record_id)
+        return i
+
+    def _now(self):
+        return self._tx[1] if self._tx is not None else datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    def _changed(self):
+        """เรียกหลังทุกการเขียน บันทึกทันทีถ้าไม่ได้อยู่ใน transaction"""
+        if self._tx is None: self._commit()
+
+    def _commit(self): pass
+
+    def _notify(self, op, index, old):
+        for fn in self.listeners: fn(op, index, old)
+
+    @contextmanager
+    def transaction(self):
+        """รวมหลายการเขียนเป็นก้อนเดียว ใช้เวลาประทับเดียวกัน ย้อนกลับทั้งหมดถ้าเกิด Exception"""
+        if self._tx is not None: yield self; return
+        self._tx = ((list(self.data), list(self.ids), self.next_id), datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        try: yield self
+        except:
+            (self.data, self.ids, self.next_id), self._tx = self._tx[0], None
+            self._notify('reset', None, None)
+            raise
+        self._tx = None
+        self._commit()
+
+    def add_record(self, product_name, count):
+        """เพิ่มรายการใหม่พร้อมประทับเวลา คืนค่า id"""
+        record = {'id': self.next_id, 'product_name': product_name, 'count': int(count), 'timestamp': self._now(), 'version': 0}
+        self.data.append(record); self.ids.append(record['id']); self.next_id += 1
+        self._changed()
+        self._notify('add', len(self.data) - 1, None)
+        return record['id']
+
+    def get_record(self, record_id):
+        try: return dict(self.data[self._index(record_id)])
+        except KeyError: return None
+
+    def update_record(self, record_id, new_name, new_count, version=None):
+        """แก้ไขตาม id ถ้าระบุ version จะแก้เฉพาะเมื่อรายการยังไม่ถูกแก้โดยผู้อื่น"""
+        try:
+            i = self._index(record_id); old = self.data[i]
+            if version is not None and old['version'] != version: return False
+            self.data[i] = dict(old, product_name=new_name, count=int(new_count), version=old['version'] + 1)
+            self._changed()
+        except: return False
+        self._notify('update', i, old)
+        return True
+
+    def delete_record(self, record_id, version=None):
+        """ลบตาม id ถ้าระบุ version จะลบเฉพาะเมื่อรายการยังไม่ถูกแก้โดยผู้อื่น"""
+        try:
+            i = self._index(record_id)
+            if version is not None and self.data[i]['version'] != version: return False
+            old = self.data[i]; del self.data[i]; del self.ids[i]
+            self._changed()
+        except: return False
+        self._notify('delete', i, old)
+        return True
+
+    def get_all_records(self): return self.data
+
+    def _match(self, name, date):
+        """รายการที่ตรงคำกรองชื่อ (ไม่สนตัวพิมพ์) และวันที่/ช่วงวันที่ (หรือ substring ของเวลา) เรียงจากเก่าไปใหม่"""
+        if not (name or date): return list(self.data)
+        name, days = name.lower(), parse_date_query(date) if date else None
+        return [r for r in self.data if name in r['product_name'].lower() and
+                (not date or (days[0] <= r['timestamp'][:10] < days[1] if days else date in r['timestamp']))]
+
+    def query_records(self, name='', date=''):
+        return [(r['id'], r) for r in reversed(self._match(name, date))]
+
+    def iter_records(self, name='', date='', chunk=1000):
+        rows = self._match(name, date)
+        for i in range(0, len(rows), chunk): yield rows[i:i + chunk]
+
+    def count_records(self, name='', date=''): return len(self._match(name, date))
+
+    def daily_totals(self, name='', date=''):
+        totals = {}
+        for r in self._match(name, date):
+            t = totals.setdefault((r['timestamp'][:10], r['product_name']), [0, 0])
+            t[0] += r['count']; t[1] += 1
+        return sorted((d, n, t[0], t[1]) for (d, n), t in totals.items())
+
+    def get_products(self): return list(dict.fromkeys(r['product_name'] for r in self.data))
+
+    def get_product_trend(self, n):
+        trend = {}
+        for r in self.data:
+            if r['product_name'] == n: d = r['timestamp'][:10]; trend[d] = trend.get(d, 0) + r['count']
+        return dict(sorted(trend.items()))
+
+    def get_product_daily_trends(self):
+        """รวมยอดรายวันแยกตามสินค้าจากทุกรายการ (คำนวณใหม่ทุกครั้ง)"""
+        trends = {}
+        for r in self.data:
+            t, d = trends.setdefault(r['product_name'], {}), r['timestamp'][:10]
+            t[d] = t.get(d, 0) + r['count']
+        return {n: dict(sorted(t.items())) for n, t in trends.items()}
+
+class JSONStockData(MemoryStockData):
+    """Backend แบบเดิมของ main2: เก็บทั้งหมดในไฟล์ JSON และเขียนใหม่ทั้งไฟล์ทุกครั้งที่ข้อมูลเปลี่ยน
+
+    ไฟล์เป็น List ของ dict (เพิ่ม id และ version) ที่ Backend journal นำเข้าได้ เหมาะกับประวัติไม่กี่พันรายการบนเครื่องเดียว
+    เพราะเวลาเขียนโตตามขนาดประวัติ และไม่มีล็อกสำหรับหลาย Process (sync() อ่านไฟล์ใหม่ถ้าถูกเขียนจากที่อื่นเท่านั้น)
+    id ถัดไปเก็บในไฟล์ <filename>.next_id เมื่อเดาจากไฟล์หลักไม่ได้ (ลบรายการล่าสุดไป) เพื่อไม่ให้ id ถูกใช้ซ้ำหลังเปิดใหม่
+    """
+    def __init__(self, filename='stock_data.json'):
+        self.filename, self.next_id_file = filename, filename + '.next_id'
+        super().__init__(self.load_data())
+
+    def _load(self, records, next_id=0):
+        try:
+            with open(self.next_id_file, 'rb') as f: self.saved_next_id = int(f.read())
+        except: self.saved_next_id = 0 # ไม่มีไฟล์ (หรืออ่านไม่ได้) ใช้ id ล่าสุดในไฟล์หลัก + 1
+        super()._load(records, max(next_id, self.saved_next_id))
+
+    def load_data(self):
+        self.sig = _file_sig(self.filename)
+        if not os.path.exists(self.filename): return []
+        with open(self.filename, 'rb') as f: raw = f.read()
+        return json.loads(raw.decode('utf-8')) if raw.strip() else []
+
+    def save_data(self):
+        """เขียนไฟล์ JSON ใหม่ทั้งไฟล์แบบ Atomic (เขียน next_id ก่อน ถ้าล้มกลางทางไฟล์นั้นจะนำหน้าเสมอ ไม่ทำให้ id ซ้ำ)"""
+        if self.next_id > (self.ids[-1] + 1 if self.ids else 0) and self.next_id != self.saved_next_id:
+            _atomic_write(self.next_id_file, str(self.next_id).encode('ascii'))
+            self.saved_next_id = self.next_id
+        _atomic_write(self.filename, json.dumps(self.data, ensure_ascii=False, indent=2).encode('utf-8'))
+        self.sig = _file_sig(self.filename)
+
+    def _commit(self): self.save_data()
+
+    def sync(self):
+        """โหลดไฟล์ใหม่ถ้าถูกเขียนจาก Process อื่นหลังจากที่อ่าน/เขียนครั้งล่าสุด"""
+        if self._tx is not None or _file_sig(self.filename) == self.sig: return False
+        self._load(self.load_data())
+        self._notify('reset', None, None)
+        return True
@@ -0,0 +1,101 @@
+import bisect
+from stock_store import parse_date_query
+
+# --- ระบบค้นหาประวัติสต็อก (Search Index) ---
+class StockSearch:
+    """ดัชนีค้นหาประวัติสต็อก: n-gram ของชื่อสินค้า และรายการวันที่แบบเรียงลำดับ
+
+    ดัชนีถูกสร้างครั้งแรกที่ค้นหา แล้วอัปเดตตามการเพิ่ม/แก้ไขผ่าน listeners ของ StockData
+    (การลบทำให้ตำแหน่งเลื่อน จึงสร้างใหม่ในการค้นหาครั้งถัดไป)
+    ถ้าผู้ใช้พิมพ์ต่อจากคำค้นเดิม จะกรองจากผลลัพธ์ก่อนหน้าแทนการค้นหาใหม่ทั้งหมด
+    Backend ที่กรองเองได้ (pushdown เช่น SQLite) จะส่งคำค้นต่อให้ query_records โดยตรง
+    """
+    def __init__(self, stock_data, n=2):
+        self.stock_data, self.n = stock_data, n
+        self.pushdown = getattr(stock_data, 'pushdown', False)
+        self.dirty, self.version, self._last = True, 0, None
+        if not self.pushdown: stock_data.listeners.append(self._on_change)
+
+    def _on_change(self, op, index, old):
+        """อัปเดตดัชนีทีละรายการเมื่อข้อมูลเปลี่ยน"""
+        self.version += 1
+        if self.dirty: return
+        if op not in ('add', 'update'): self.dirty = True; return # ลบ หรือ reset (transaction ถูกย้อนกลับ)
+        if op == 'update': self._remove(index, old)
+        self._insert(index, self.stock_data.get_all_records()[index])
+
+    def _rebuild(self):
+        self.pos_by_name, self.grams = {}, {} # ชื่อ(ตัวเล็ก) -> ตำแหน่ง, n-gram -> ชื่อ
+        self.pos_by_day, self.days = {}, []  # วัน -> ตำแหน่ง, รายการวันเรียงลำดับ
+        for i, r in enumerate(self.stock_data.get_all_records()): self._insert(i, r)
+        self.dirty = False
+
+    def _insert(self, i, r):
+        name, day = r['product_name'].lower(), r['timestamp'][:10]
+        if name not in self.pos_by_name:
+            self.pos_by_name[name] = set()
+            for g in self._grams(name): self.grams.setdefault(g, set()).add(name)
+        self.pos_by_name[name].add(i)
+        if day not in self.pos_by_day:
+            self.pos_by_day[day] = set(); bisect.insort(self.days, day)
+        self.pos_by_day[day].add(i)
+
+    def _remove(self, i, r):
+        name, day = r['product_name'].lower(), r['timestamp'][:10]
+        self.pos_by_name[name].discard(i)
+        if not self.pos_by_name[name]:
+            del self.pos_by_name[name]
+            for g in self._grams(name):
+                self.grams[g].discard(name)
+                if not self.grams[g]: del self.grams[g]
+        self.pos_by_day[day].discard(i)
+        if not self.pos_by_day[day]:
+            del self.pos_by_day[day]; self.days.remove(day)
+
+    def _grams(self, s): return {s[i:i + self.n] for i in range(len(s) - self.n + 1)}
+
+    def _names_matching(self, q):
+        """ชื่อสินค้าที่มีคำค้นอยู่ ใช้ n-gram คัดตัวเลือกก่อนแล้วตรวจ substring จริง"""
+        if len(q) < self.n: cands = self.pos_by_name
+        else:
+            sets = sorted((self.grams.get(g, set()) for g in self._grams(q)), key=len)
+            cands = set.intersection(*sets) if sets else set()
+        return [nm for nm in cands if q in nm]
+
+    def _positions_for_date(self, q):
+        days = parse_date_query(q)
+        if days is None:
+            # ไม่ใช่รูปแบบวันที่ (เช่นค้นหาเวลา) ค้นหาแบบ substring ในทุกรายการ
+            return {i for i, r in enumerate(self.stock_data.get_all_records()) if q in r['timestamp']}
+        lo, hi = bisect.bisect_left(self.days, days[0]), bisect.bisect_left(self.days, days[1])
+        return set().union(*(self.pos_by_day[d] for d in self.days[lo:hi]))
+
+    def _narrows(self, name, date):
+        """คำค้นใหม่เป็นส่วนขยายของคำค้นเดิม (ผลลัพธ์ต้องเป็นส่วนหนึ่งของผลเดิม) หรือไม่"""
+        last = self._last
+        if last is None or last[0] != self.version: return False
+        _, l_name, l_date, _ = last
+        if not (l_name or l_date): return False # ผลเดิมไม่ได้กรองอะไร ใช้ดัชนีเร็วกว่า
+        if l_date == date: return l_name in name
+        return l_name == name and parse_date_query(l_date) is not None and '..' not in date + l_date and date.startswith(l_date)
+
+    def query(self, name='', date=''):
+        """ค้นหาตามชื่อ (ไม่สนตัวพิมพ์) และวันที่/ช่วงวันที่ คืนค่า (id, record) เรียงจากใหม่ไปเก่า เหมือน query_records"""
+        name, date = name.lower(), date.strip()
+        if self.pushdown: return self.stock_data.query_records(name, date)
+        if self.dirty: self._rebuild()
+        recs = self.stock_data.get_all_records()
+        if self._narrows(name, date):
+            days = parse_date_query(date)
+            pos = [i for i in self._last[3] if name in recs[i]['product_name'].lower()
+                   and (days[0] <= recs[i]['timestamp'][:10] < days[1] if days else date in recs[i]['timestamp'])]
+        else:
+            sets = []
+            if name: sets.append(set().union(*(self.pos_by_name[nm] for nm in self._names_matching(name))))
+            if date: sets.append(self._positions_for_date(date))
+            if sets:
+                sets.sort(key=len)
+                pos = sorted(sets[0].intersection(*sets[1:]), reverse=True)
+            else: pos = list(range(len(recs) - 1, -1, -1))
+        self._last = (self.version, name, date, pos)
+        return [(recs[i]['id'], recs[i]) for i in pos]
@@ -0,0 +1,258 @@
+"""เซิร์ฟเวอร์ HTTP/JSON (asyncio) สำหรับเครื่องสแกนระยะไกล: ส่งภาพมานับบนเครื่อง CPU ที่โหลดโมเดลไว้เครื่องเดียว
+
+Endpoints (ตอบเป็น JSON ทั้งหมด):
+    GET  /health                          สถานะ โมเดล ความยาวคิว และสถิติการรวม Batch
+    POST /detect?confidence=0.5&boxes=1&save=1
+                                          Body เป็นไฟล์ภาพ (JPEG/PNG) คืน {'counts', 'boxes', 'batch'} save=1 บันทึกยอดลง StockData
+                                          ถ้าโหลดโมเดลไม่ได้จะตอบ 503 (เว้นแต่เปิด --mock ซึ่งตอบผลสุ่มพร้อม 'mock': true และไม่บันทึก)
+    POST /records                         Body {"items": {"milk": 3}} หรือ [{"product_name", "count"}, ...] คืน {'ids'}
+    GET  /records?name=&date=&limit=100&offset=0
+                                          รายการเรียงจากใหม่ไปเก่า (ตัวกรองเหมือนหน้า Stock History)
+    GET  /trends?product=milk             ยอดรวมรายวัน (ไม่ระบุ product คือทุกสินค้า)
+
+คำขอ /detect จากหลายเครื่องที่มาถึงพร้อมกันจะถูกรวมเป็น Batch เดียว (YOLODetector.detect_batch_boxes)
+โดยรอภาพเพิ่มไม่เกิน --max-wait-ms หลังภาพแรก หรือจนครบ --max-batch ภาพ
+คิวมีขนาดจำกัด (--queue) ถ้าเต็มจะตอบ 503 พร้อม Retry-After ทันทีแทนการรับงานค้างจนหน่วยความจำหมด
+โมเดลรันใน Thread ของตัวเอง ส่วน StockData รันใน Thread เดียวอีกตัว (Backend ไม่รองรับการเรียกพร้อมกันหลาย Thread)
+ตัวอย่าง:
+    python stock_server.py --port 8080 --model yolov8n.onnx --backend journal
+    curl --data-binary @shelf.jpg "http://localhost:8080/detect?save=1"
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+STATUS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 411: 'Length Required',
+          413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+class HTTPError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status, self.headers = status, headers or {}
+
+class StockServer:
+    """รับคำขอ HTTP ด้วย asyncio.start_server (ไม่ต้องติดตั้ง Library เพิ่ม) รองรับ Keep-alive และ Content-Length เท่านั้น"""
+    def __init__(self, detector, store_factory, max_batch=8, max_wait=0.005, queue_size=64, max_body=10 << 20,
+                 mock=False, mock_delay=0.0):
+        self.detector, self.store_factory = detector, store_factory
+        self.max_batch, self.max_wait, self.queue_size, self.max_body = max_batch, max_wait, queue_size, max_body
+        # mock: ไม่มีโมเดลก็ตอบผลสุ่มได้ (ใช้ทดสอบโหลด) mock_delay คือเวลาจำลองต่อ Batch
+        self.mock, self.mock_delay = mock and not detector.enabled, mock_delay
+        self.model_pool = ThreadPoolExecutor(1, thread_name_prefix='server-model')
+        self.store_pool = ThreadPoolExecutor(1, thread_name_prefix='server-store')
+        self.store, self.store_pending = None, 0
+        self.stats = {'requests': 0, 'rejected': 0, 'batches': 0, 'images': 0, 'max_batch_seen': 0}
+        self.queue = self.server = None
+
+    async def start(self, host='127.0.0.1', port=8080):
+        loop = asyncio.get_running_loop()
+        # สร้าง StockData ใน Thread ที่จะใช้ตลอด (Connection ของ SQLite ใช้ได้เฉพาะ Thread ที่สร้าง)
+        self.store = await loop.run_in_executor(self.store_pool, self.store_factory)
+        self.queue = asyncio.Queue(self.queue_size)
+        self._batcher = asyncio.ensure_future(self._batch_loop())
+        self.server = await asyncio.start_server(self._handle, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        self.server.close(); await self.server.wait_closed()
+        self._batcher.cancel()
+        await asyncio.get_running_loop().run_in_executor(self.store_pool, self.store.close)
+        self.model_pool.shutdown(wait=False, cancel_futures=True); self.store_pool.shutdown(wait=False)
+
+    # --- HTTP ---
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line.strip(): break
+                method, target, version = line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    h = await reader.readline()
+                    if h in (b'\r\n', b'\n', b''): break
+                    k, _, v = h.decode('latin-1').partition(':'); headers[k.strip().lower()] = v.strip()
+                keep = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                try:
+                    if 'chunked' in headers.get('transfer-encoding', ''): raise HTTPError(411, 'Content-Length required')
+                    n = int(headers.get('content-length') or 0)
+                    if n > self.max_body: keep = False; raise HTTPError(413, f"body larger than {self.max_body} bytes")
+                    body = await reader.readexactly(n) if n else b''
+                    status, payload, extra = 200, await self._route(method, target, body), {}
+                except HTTPError as e: status, payload, extra = e.status, {'error': str(e)}, e.headers
+                except Exception as e: status, payload, extra = 500, {'error': f"{type(e).__name__}: {e}"}, {}
+                writer.write(_response(status, payload, keep, extra))
+                await writer.drain()
+                if not keep: break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError): pass
+        finally: writer.close()
+
+    async def _route(self, method, target, body):
+        url = urlsplit(target)
+        q = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        routes = {'/health': ('GET', self.health), '/detect': ('POST', self.detect), '/records': (None, self.records), '/trends': ('GET', self.trends)}
+        if url.path not in routes: raise HTTPError(404, f"no such endpoint: {url.path}")
+        want, fn = routes[url.path]
+        if want and method != want: raise HTTPError(405, f"{url.path} accepts {want}")
+        self.stats['requests'] += 1
+        return await fn(method, q, body)
+
+    # --- Endpoints ---
+    async def health(self, method, q, body):
+        s = self.stats
+        return {'ok': self.detector.enabled or self.mock, 'model': self.detector.model_path, 'model_loaded': self.detector.enabled,
+                'mock': self.mock, 'queue': self.queue.qsize(),
+                'queue_size': self.queue_size, 'max_batch': self.max_batch, **s,
+                'mean_batch': round(s['images'] / s['batches'], 2) if s['batches'] else 0}
+
+    async def detect(self, method, q, body):
+        if not (self.detector.enabled or self.mock): raise HTTPError(503, f"model not loaded: {self.detector.model_path}")
+        if not body: raise HTTPError(400, 'empty body (send the image bytes)')
+        try: conf = float(q.get('confidence', 0.5))
+        except ValueError: raise HTTPError(400, 'confidence must be a number')
+        if not 0 < conf <= 1: raise HTTPError(400, 'confidence must be in (0, 1]')
+        # ปัดเป็น 2 ตำแหน่ง ให้เครื่องที่ส่งค่าต่างกันเล็กน้อยรวม Batch เดียวกันได้
+        conf = round(conf, 2) or 0.01
+        if self.queue.full(): self._busy()
+        loop = asyncio.get_running_loop()
+        frame = await loop.run_in_executor(None, _decode, body) # ถอดรหัส JPEG นอก Event loop
+        if frame is None: raise HTTPError(400, 'cannot decode image')
+        fut = loop.create_future()
+        try: self.queue.put_nowait((frame, conf, fut))
+        except asyncio.QueueFull: self._busy()
+        counts, boxes, size = await fut
+        res = {'counts': counts, 'batch': size}
+        if self.mock: res['mock'] = True; return res # ผลสุ่ม ไม่บันทึกลง StockData
+        if q.get('boxes') == '1': res['boxes'] = [{'name': n, 'score': round(s, 4), 'box': [round(v, 1) for v in b]} for n, s, b in boxes]
+        if q.get('save') == '1': res['ids'] = await self._store(lambda s: s.add_records((n, c) for n, c in counts.items() if c > 0))
+        return res
+
+    async def records(self, method, q, body):
+        if method == 'POST':
+            try: items = json.loads(body.decode('utf-8') or 'null')
+            except ValueError: raise HTTPError(400, 'body is not JSON')
+            items = items.get('items') if isinstance(items, dict) else items
+            if isinstance(items, dict): items = list(items.items())
+            elif isinstance(items, list): items = [(r['product_name'], r['count']) for r in items if isinstance(r, dict) and 'product_name' in r]
+            else: raise HTTPError(400, 'expected {"items": {name: count}} or a list of records')
+            try: items = [(str(n), int(c)) for n, c in items]
+            except (TypeError, ValueError): raise HTTPError(400, 'count must be an integer')
+            return {'ids': await self._store(lambda s: s.add_records(items))}
+        if method != 'GET': raise HTTPError(405, '/records accepts GET or POST')
+        try: limit, offset = int(q.get('limit', 100)), int(q.get('offset', 0))
+        except ValueError: raise HTTPError(400, 'limit/offset must be integers')
+        def query(s):
+            s.sync()
+            rows = s.query_records(q.get('name', ''), q.get('date', ''))
+            return len(rows), [dict(r) for _, r in rows[offset:offset + limit]]
+        total, rows = await self._store(query)
+        return {'total': total, 'records': rows}
+
+    async def trends(self, method, q, body):
+        p = q.get('product')
+        def read(s):
+            s.sync()
+            return {p: s.get_product_trend(p)} if p else s.get_product_daily_trends()
+        return {'trends': await self._store(read)}
+
+    # --- คิวและ Batch ---
+    def _busy(self):
+        self.stats['rejected'] += 1
+        raise HTTPError(503, 'server busy, retry later', {'Retry-After': '1'})
+
+    async def _store(self, fn):
+        """รันงานของ StockData ใน Thread ของมัน (จำกัดงานค้างเท่ากับขนาดคิว)"""
+        if self.store_pending >= self.queue_size: self._busy()
+        self.store_pending += 1
+        try: return await asyncio.get_running_loop().run_in_executor(self.store_pool, fn, self.store)
+        finally: self.store_pending -= 1
+
+    async def _batch_loop(self):
+        """หยิบภาพแรกจากคิว แล้วรอภาพที่ตามมาไม่เกิน max_wait (หรือจนครบ max_batch) ส่งเข้าโมเดลครั้งเดียว
+        ระหว่างที่โมเดลทำงาน คำขอใหม่จะสะสมในคิวและถูกรวมเป็น Batch ถัดไปเอง"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                if not self.queue.empty(): batch.append(self.queue.get_nowait()); continue
+                left = deadline - loop.time()
+                if left <= 0: break
+                try: batch.append(await asyncio.wait_for(self.queue.get(), left))
+                except asyncio.TimeoutError: break
+            batch = [b for b in batch if not b[2].done()] # ผู้ขอที่ตัดการเชื่อมต่อไปแล้ว
+            groups = {}
+            for item in batch: groups.setdefault(item[1], []).append(item) # ค่าความเชื่อมั่นเดียวกันต่อการเรียกโมเดล
+            for conf, items in groups.items():
+                try: results = await loop.run_in_executor(self.model_pool, self._run_batch, [f for f, _, _ in items], conf)
+                except Exception as e:
+                    for _, _, fut in items:
+                        if not fut.done(): fut.set_exception(e)
+                    continue
+                self.stats['batches'] += 1; self.stats['images'] += len(items)
+                self.stats['max_batch_seen'] = max(self.stats['max_batch_seen'], len(items))
+                for (_, _, fut), (counts, boxes) in zip(items, results):
+                    if not fut.done(): fut.set_result((counts, boxes, len(items)))
+
+    def _run_batch(self, frames, conf):
+        if self.mock:
+            if self.mock_delay: time.sleep(self.mock_delay * (1 + 0.25 * (len(frames) - 1)))
+            return [(c, []) for c in self.detector.detect_batch(frames, conf)]
+        return self.detector.detect_batch_boxes(frames, conf)
+
+def _decode(body):
+    import cv2
+    import numpy as np
+    return cv2.imdecode(np.frombuffer(body, np.uint8), cv2.IMREAD_COLOR)
+
+def _json_default(o):
+    # ค่าจาก NumPy (เช่นจำนวน/เวลาในตารางคอลัมน์)
+    if hasattr(o, 'item'): return o.item()
+    raise TypeError(f"{type(o).__name__} is not JSON serializable")
+
+def _response(status, payload, keep, headers):
+    body = json.dumps(payload, ensure_ascii=False, default=_json_default).encode('utf-8')
+    head = [f"HTTP/1.1 {status} {STATUS.get(status, '')}", 'Content-Type: application/json; charset=utf-8',
+            f"Content-Length: {len(body)}", f"Connection: {'keep-alive' if keep else 'close'}"]
+    head += [f"{k}: {v}" for k, v in headers.items()]
+    return ('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='HTTP/JSON ingest server for remote counting stations')
+    ap.add_argument('--host', default='0.0.0.0')
+    ap.add_argument('--port', type=int, default=8080)
+    ap.add_argument('--model', default=os.environ.get('STOCK_MODEL', 'yolov8n.pt'))
+    ap.add_argument('--threads', type=int, default=0, help='ONNX Runtime threads (0 = default)')
+    ap.add_argument('--int8', action='store_true', help='use the INT8 ONNX model')
+    ap.add_argument('--backend', help='stock backend (default: STOCK_BACKEND or journal)')
+    ap.add_argument('--file', help='stock data file')
+    ap.add_argument('--max-batch', type=int, default=8, help='images per model call')
+    ap.add_argument('--max-wait-ms', type=float, default=5, help='wait this long for more images after the first')
+    ap.add_argument('--queue', type=int, default=64, help='pending images before answering 503')
+    ap.add_argument('--mock', action='store_true', help='answer /detect with random counts when no model is loaded (never saved)')
+    ap.add_argument('--mock-delay-ms', type=float, default=0, help='simulated model time per batch with --mock')
+    args = ap.parse_args(argv)
+
+    from stock_backend import open_stock_data
+    from yolo_detector import YOLODetector
+    detector = YOLODetector(args.model, threads=args.threads or None, int8=args.int8, cache_ttl=0)
+    server = StockServer(detector, lambda: open_stock_data(args.backend, args.file), args.max_batch,
+                         args.max_wait_ms / 1000, args.queue, mock=args.mock, mock_delay=args.mock_delay_ms / 1000)
+
+    async def serve():
+        port = await server.start(args.host, args.port)
+        model = args.model if detector.enabled else 'mock' if server.mock else 'NOT LOADED, /detect answers 503'
+        print(f"stock server on http://{args.host}:{port} (model {model}, "
+              f"batch {args.max_batch}, queue {args.queue})", flush=True)
+        try: await asyncio.Event().wait()
+        finally: await server.close()
+
+    try: asyncio.run(serve())
+    except KeyboardInterrupt: pass
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from stock_backend import BaseStockData
+from stock_store import parse_date_query
+
+# --- ฐานข้อมูล SQLite (SQLite Backend) ---
+class SQLiteStockData(BaseStockData):
+    """StockData เวอร์ชัน SQLite: ใช้ id ของแถวที่คงที่แทนตำแหน่งใน List และให้ SQLite กรอง/รวมยอดแทน Python"""
+    pushdown = True # กรองข้อมูลด้วย SQL เอง ไม่ต้องใช้ดัชนีค้นหาในหน่วยความจำ (StockSearch)
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_name TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            timestamp TEXT NOT NULL,
+            day TEXT NOT NULL,
+            version INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_records_product_day ON records (product_name, day);
+        CREATE INDEX IF NOT EXISTS idx_records_day ON records (day);
+        CREATE INDEX IF NOT EXISTS idx_records_timestamp ON records (timestamp);
+    """
+
+    def __init__(self, filename='stock_data.db'):
+        self.filename = filename
+        self.conn = sqlite3.connect(filename, timeout=30) # รอล็อกของ Process อื่นที่กำลังเขียน
+        self.conn.row_factory = _row_to_dict
+        self.conn.execute('PRAGMA journal_mode=WAL') # เขียนเร็วขึ้นและอ่านพร้อมกันได้
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(self.SCHEMA)
+        if 'version' not in {r['name'] for r in self.conn.execute('PRAGMA table_info(records)')}:
+            # ฐานข้อมูลที่สร้างก่อนมี version
+            with self.conn: self.conn.execute('ALTER TABLE records ADD COLUMN version INTEGER NOT NULL DEFAULT 0')
+        self._tx_time = None # เวลาประทับร่วมของ transaction ที่เปิดอยู่
+
+    @contextmanager
+    def transaction(self):
+        """รวมหลายคำสั่งเป็น SQL Transaction เดียว (Commit ครั้งเดียว ย้อนกลับทั้งหมดถ้าเกิด Exception) และใช้เวลาประทับเดียวกัน"""
+        if self._tx_time is not None: yield self; return
+        self._tx_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        try:
+            with self.conn: yield self
+        finally: self._tx_time = None
+
+    def _write(self, sql, args):
+        """รันคำสั่งแก้ไขข้อมูล (Commit ทันที ถ้าไม่ได้อยู่ใน transaction)"""
+        if self._tx_time is not None: return self.conn.execute(sql, args)
+        with self.conn: return self.conn.execute(sql, args)
+
+    def add_record(self, product_name, count):
+        """เพิ่มบันทึกสต็อกใหม่พร้อมประทับเวลา คืนค่า id ของแถวใหม่"""
+        ts = self._tx_time or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        return self._write('INSERT INTO records (product_name, count, timestamp, day) VALUES (?, ?, ?, ?)',
+                           (product_name, count, ts, ts[:10])).lastrowid
+
+    def update_record(self, record_id, new_name, new_count, version=None):
+        """แก้ไขข้อมูลตาม id ของแถว ถ้าระบุ version จะแก้เฉพาะเมื่อแถวยังไม่ถูกแก้โดยผู้อื่น (ตรวจใน WHERE จึงเป็น Atomic)"""
+        try:
+            sql, args = 'UPDATE records SET product_name = ?, count = ?, version = version + 1 WHERE id = ?', [new_name, int(new_count), record_id]
+            if version is not None: sql += ' AND version = ?'; args.append(version)
+            return self._write(sql, args).rowcount > 0
+        except: return False
+
+    def delete_record(self, record_id, version=None):
+        """ลบรายการข้อมูลตาม id ของแถว (ถ้าระบุ version จะลบเฉพาะเมื่อแถวยังไม่ถูกแก้โดยผู้อื่น)"""
+        sql, args = 'DELETE FROM records WHERE id = ?', [record_id]
+        if version is not None: sql += ' AND version = ?'; args.append(version)
+        try: return self._write(sql, args).rowcount > 0
+        except: return False
+
+    def get_record(self, record_id):
+        """แถวตาม id (รวม version ล่าสุด) หรือ None ถ้าไม่มี"""
+        return self.conn.execute('SELECT id, product_name, count, timestamp, version FROM records WHERE id = ?', (record_id,)).fetchone()
+
+    def sync(self):
+        """SQLite อ่านข้อมูลล่าสุดจากไฟล์ทุกครั้งอยู่แล้ว (การเขียนพร้อมกันหลาย Process ใช้ล็อกของ SQLite) จึงไม่ต้องทำอะไร"""
+        return False
+
+    def get_all_records(self):
+        return self.conn.execute('SELECT id, product_name, count, timestamp, version FROM records ORDER BY id').fetchall()
+
+    def _where(self, name, date):
+        """เงื่อนไข WHERE ของคำกรองชื่อ (ไม่สนตัวพิมพ์) และวันที่ คืนค่า (sql, args)"""
+        sql, args = ' WHERE 1 = 1', []
+        if name:
+            sql += ' AND instr(lower(product_name), ?) > 0'; args.append(name.lower())
+        days = parse_date_query(date) if date else None
+        if days:
+            # วันที่หรือช่วงวันที่ (เช่น 2026-02 หรือ 2026-01..2026-03) ใช้ช่วงบน Index ของ day
+            sql += ' AND day >= ? AND day < ?'; args += list(days)
+        elif date:
+            sql += ' AND instr(timestamp, ?) > 0'; args.append(date)
+        return sql, args
+
+    def query_records(self, name='', date=''):
+        """กรองตามชื่อ (ไม่สนตัวพิมพ์) และวันที่ (รองรับช่วง) ด้วย SQL คืนค่า (id, record) เรียงจากใหม่ไปเก่า"""
+        where, args = self._where(name, date)
+        sql = 'SELECT id, product_name, count, timestamp, version FROM records' + where + ' ORDER BY id DESC'
+        return [(r['id'], r) for r in self.conn.execute(sql, args)]
+
+    def _reader(self):
+        """Connection สำหรับอ่านอย่างเดียวจาก Thread อื่น (Connection หลักใช้ได้เฉพาะ Thread ที่สร้าง)"""
+        conn = sqlite3.connect(self.filename)
+        conn.row_factory = _row_to_dict
+        return conn
+
+    def iter_records(self, name='', date='', chunk=1000):
+        """อ่านรายการที่ตรงเงื่อนไขทีละก้อนด้วย fetchmany (เรียงตาม id) จาก Cursor เดียว จึงเห็นข้อมูลชุดเดียวกันตลอดการอ่าน (WAL)"""
+        where, args = self._where(name, date)
+        conn = self._reader()
+        try:
+            cur = conn.execute('SELECT id, product_name, count, timestamp, version FROM records' + where + ' ORDER BY id', args)
+            while True:
+                rows = cur.fetchmany(chunk)
+                if not rows: break
+                yield rows
+        finally: conn.close()
+
+    def count_records(self, name='', date=''):
+        where, args = self._where(name, date)
+        conn = self._reader()
+        try: return conn.execute('SELECT COUNT(*) AS n FROM records' + where, args).fetchone()['n']
+        finally: conn.close()
+
+    def daily_totals(self, name='', date=''):
+        """ยอดรวมรายวันที่ตรงเงื่อนไข [(วัน, สินค้า, ยอดรวม, จำนวนรายการ)] รวมด้วย GROUP BY"""
+        where, args = self._where(name, date)
+        conn = self._reader()
+        try:
+            return [(r['day'], r['product_name'], r['total'], r['n']) for r in conn.execute(
+                'SELECT day, product_name, SUM(count) AS total, COUNT(*) AS n FROM records' + where +
+                ' GROUP BY day, product_name ORDER BY day, product_name', args)]
+        finally: conn.close()
+
+    def get_product_daily_trends(self):
+        """รวมยอดรายวันแยกตามสินค้าด้วย GROUP BY (เรียงสินค้าตามลำดับที่พบครั้งแรก)"""
+        rows = self.conn.execute('SELECT product_name, day, SUM(count) AS total, MIN(id) AS first_id '
+                                 'FROM records GROUP BY product_name, day ORDER BY day').fetchall()
+        first, trends = {}, {}
+        for r in rows:
+            n = r['product_name']
+            first[n] = min(first.get(n, r['first_id']), r['first_id'])
+            trends.setdefault(n, {})[r['day']] = r['total']
+        return {n: trends[n] for n in sorted(trends, key=first.get)}
+
+    def get_products(self):
+        """รายชื่อสินค้าทั้งหมด เรียงตามลำดับที่พบครั้งแรก"""
+        return [r['product_name'] for r in self.conn.execute(
+            'SELECT product_name FROM records GROUP BY product_name ORDER BY MIN(id)')]
+
+    def get_product_trend(self, n):
+        """ยอดรวมรายวันของสินค้าหนึ่งรายการ (ใช้ Index product_name, day)"""
+        return {r['day']: r['total'] for r in self.conn.execute(
+            'SELECT day, SUM(count) AS total FROM records WHERE product_name = ? GROUP BY day ORDER BY day', (n,))}
+
+    def close(self): self.conn.close()
+
+def _row_to_dict(cursor, row):
+    """แปลงแถวจาก SQLite เป็น dict รูปแบบเดียวกับ record ของ StockData"""
+    return {c[0]: v for c, v in zip(cursor.description, row)}
+
+def migrate_json_to_sqlite(json_file='stock_data.json', db_file='stock_data.db'):
+    """ย้ายข้อมูลจาก stock_data.json/.snap (รวม Journal) เข้า SQLite ครั้งเดียว ข้ามถ้าฐานข้อมูลมีข้อมูลแล้ว
+
+    อ่านแบบ Read-only (ไม่สร้าง .snap/.journal ข้างไฟล์ต้นทาง) และคง id/version เดิม รายการที่ย้ายแล้วจึงอ้างอิงด้วย id เดิมได้
+    """
+    from stock_store import StockData
+    db = SQLiteStockData(db_file)
+    try:
+        if db.conn.execute('SELECT 1 FROM records LIMIT 1').fetchone() is not None:
+            print(f"{db_file} already has records, skip migration")
+            return 0
+        recs = StockData.load_readonly(json_file) # อ่านจาก .snap ถ้ามี หรือจากไฟล์ JSON
+        if not len(recs): return 0
+        with db.conn:
+            db.conn.executemany('INSERT INTO records (id, product_name, count, timestamp, day, version) VALUES (?, ?, ?, ?, ?, ?)',
+                                ((r['id'], r['product_name'], int(r['count']), r['timestamp'], r['timestamp'][:10], r['version']) for r in recs))
+            # id ที่เคยใช้แล้ว (รวมรายการล่าสุดที่ถูกลบ) ต้องไม่ถูกออกซ้ำ
+            db.conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'records'", (recs.next_id - 1,))
+        print(f"migrated {len(recs)} records: {json_file} -> {db_file}")
+        return len(recs)
+    finally: db.close()
+
+# --- ย้ายข้อมูลจาก JSON: python stock_sqlite.py [stock_data.json] [stock_data.db] ---
+if __name__ == "__main__":
+    import sys
+    migrate_json_to_sqlite(*sys.argv[1:3])
@@ -0,0 +1,429 @@
+import json
+import os
+import hashlib
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+from perf_trace import trace
+from stock_backend import BaseStockData
+from stock_columns import RecordTable, format_days, open_snapshot, snapshot_bytes
+
+# --- ส่วนจัดการข้อมูล (Data Management) ---
+class StockData(BaseStockData):
+    """Class สำหรับจัดการข้อมูลสต็อกแบบ Snapshot (ไบนารี) + Journal ต่อท้าย (Append-only) และประมวลผลสถิติ
+
+    ทุกการเพิ่ม/แก้ไข/ลบ จะเขียนเพียง 1 บรรทัดต่อท้ายไฟล์ Journal แทนการเขียนไฟล์ JSON ใหม่ทั้งไฟล์
+    เมื่อ Journal ยาวถึง COMPACT_EVERY รายการ จะรวม (Compaction) กลับเป็น Snapshot ใหม่แบบ Atomic
+    บรรทัดแรกของ Journal เก็บ digest ของ Snapshot ที่มันต่อยอดอยู่ ถ้าไม่ตรงกัน (เช่นเครื่องดับระหว่าง Compaction)
+    แปลว่า Snapshot รวมข้อมูลใน Journal ไปแล้ว จึงไม่ต้องเล่นซ้ำ
+    การแก้ไขหลายรายการใน transaction() ถูกเขียนเป็นบรรทัดเดียว (op 'batch') จึงถูกเล่นซ้ำทั้งหมดหรือไม่ถูกเลย
+    ในหน่วยความจำเก็บเป็นตารางคอลัมน์ (RecordTable) ที่ data[i] คืนมุมมองแบบ dict ให้โค้ดเดิมใช้ได้ตามปกติ
+    Snapshot (.snap) เป็นคอลัมน์ความกว้างคงที่ที่เปิดด้วย mmap ได้ทันที ส่วนไฟล์ JSON ใช้นำเข้าครั้งแรก (ถ้ายังไม่มี .snap)
+    และส่งออกด้วย export_json
+
+    หลาย Process (เช่นเครื่องสแกนกับเครื่องหลังร้านที่ใช้โฟลเดอร์ข้อมูลร่วมกัน) เขียนพร้อมกันได้:
+    ทุกการเขียนถือล็อกไฟล์ (.lock) แล้วอ่าน Operation ที่ Process อื่นต่อท้าย Journal ไว้ก่อน (หรือโหลดใหม่ถ้ามีการ Compaction)
+    รายการอ้างอิงด้วย id ที่คงที่ และการแก้ไข/ลบตรวจ version ได้ (Optimistic concurrency) ถ้ามีคนแก้ไปก่อนจะคืนค่า False
+    """
+    COMPACT_EVERY = 500 # จำนวนรายการใน Journal ก่อนรวมเป็น Snapshot ใหม่
+    pushdown = True     # กรองแบบ Vectorized ได้เอง StockSearch จึงส่งคำค้นให้ query_records โดยตรง
+
+    def __init__(self, filename='stock_data.json'):
+        self._paths(filename)
+        self.lock = FileLock(os.path.splitext(filename)[0] + '.lock') # ล็อกข้าม Process ที่ถือไว้ระหว่างเขียน
+        self.snapshot_digest, self.journal_ops, self.journal_pos = hashlib.sha1(b'').hexdigest(), 0, 0
+        self.trends = {}    # {สินค้า: {วัน: [ยอดรวม, จำนวนรายการ]}} อัปเดตทีละรายการ
+        self.listeners = [] # ฟังก์ชัน fn(op, index, ข้อมูลเดิม) ที่ถูกเรียกหลังข้อมูลเปลี่ยน (เช่นดัชนีค้นหา)
+        self._tx = None     # Operation ที่รอเขียนของ transaction ที่เปิดอยู่
+        with self.lock:
+            self.data = self.load_data()
+            # นำเข้าจาก JSON ครั้งแรก: เขียน Snapshot ไบนารีทันที ครั้งถัดไปจะเปิดได้โดยไม่ต้อง Parse
+            if self.imported and len(self.data): self.save_data()
+
+    def _paths(self, filename):
+        self.filename = filename
+        base = os.path.splitext(filename)[0]
+        self.journal_file, self.snapshot_file = base + '.journal', base + '.snap'
+
+    @classmethod
+    def load_readonly(cls, filename='stock_data.json'):
+        """อ่านข้อมูลทั้งหมด (Snapshot + Journal หรือไฟล์ JSON) เป็น RecordTable โดยไม่สร้าง/แก้ไฟล์ใดและไม่ถือล็อก
+        (ใช้ย้ายข้อมูลไป Backend อื่น ควรรันตอนที่ไม่มี Process อื่นกำลังเขียน)"""
+        self = cls.__new__(cls)
+        self._paths(filename)
+        return self.load_data(readonly=True)
+
+    def load_data(self, readonly=False):
+        """เปิด Snapshot ไบนารี (หรือนำเข้าไฟล์ JSON ถ้ายังไม่มี) แล้วเล่น Journal ซ้ำ (Replay) ต่อท้าย
+        หากไม่มีไฟล์จะคืนค่าเป็นตารางว่าง ยอดรวมรายวัน (self.trends) ถูกสร้างไปพร้อมกัน (ต้องถือล็อกอยู่)
+        readonly=True ไม่ลบ Journal เก่าและไม่ตัดบรรทัดที่เขียนไม่เสร็จ (ข้ามไปเฉย ๆ)"""
+        self.imported = not os.path.exists(self.snapshot_file)
+        if self.imported:
+            data, raw = RecordTable(), b''
+            if os.path.exists(self.filename):
+                with open(self.filename, 'rb') as f: raw = f.read()
+                if raw.strip(): data = RecordTable(json.loads(raw.decode('utf-8')))
+            self.snapshot_digest, groups = hashlib.sha1(raw).hexdigest(), data.daily_groups()
+        else:
+            with trace.span('store.open_snapshot'): data, self.snapshot_digest, groups = open_snapshot(self.snapshot_file)
+        self._trends_from(data.products, *groups)
+        self.snapshot_sig, self.journal_ops, self.journal_pos = _file_sig(self.snapshot_file), 0, 0
+        if not os.path.exists(self.journal_file): return data
+
+        with open(self.journal_file, 'rb') as f: lines = f.read().split(b'\n')
+        # บรรทัดสุดท้ายที่ไม่มี \n ปิดท้าย คือบรรทัดที่เขียนไม่เสร็จ (Torn write) ให้ตัดทิ้ง
+        good, ops = 0, []
+        for line in lines[:-1]:
+            try: ops.append(json.loads(line.decode('utf-8')))
+            except ValueError: break
+            good += len(line) + 1
+        if not ops or ops[0].get('op') != 'base' or ops[0].get('digest') != self.snapshot_digest:
+            # Journal เก่าที่ถูกรวมเข้า Snapshot ไปแล้ว (หรือเสียหาย) ไม่ต้องเล่นซ้ำ
+            if not readonly: os.remove(self.journal_file)
+            return data
+        for op in ops[1:]: self._apply(data, op)
+        self.journal_ops, self.journal_pos = len(ops) - 1, good
+        if not readonly and good < sum(len(l) + 1 for l in lines[:-1]) + len(lines[-1]):
+            with open(self.journal_file, 'r+b') as f: f.truncate(good)
+        return data
+
+    def _apply(self, data, op):
+        """นำ Operation หนึ่งรายการจาก Journal มาใช้กับข้อมูลในหน่วยความจำ (Journal แบบเดิมอ้างอิงด้วย Index 'i')"""
+        if op['op'] == 'batch':
+            for o in op['ops']: self._apply(data, o)
+        elif op['op'] == 'add': data.append(op['rec']); self._trend_add(op['rec'], 1)
+        elif op['op'] == 'update':
+            i = data.index_of(op['id']) if 'id' in op else op['i']
+            self._trend_add(data[i], -1)
+            data.set(i, op['product_name'], op['count'], op.get('v'))
+            self._trend_add(data[i], 1)
+        elif op['op'] == 'delete': self._trend_add(data.pop(data.index_of(op['id']) if 'id' in op else op['i']), -1)
+
+    def sync(self):
+        """อ่านการเปลี่ยนแปลงที่ Process อื่นเขียนไว้ (เรียกก่อนแสดงรายการ) คืนค่า True ถ้าข้อมูลเปลี่ยน"""
+        if self._tx is not None: return False
+        with self.lock: return self._sync()
+
+    def _sync(self):
+        """ตามให้ทัน Journal (ต้องถือล็อกอยู่): เล่นซ้ำเฉพาะบรรทัดที่ต่อท้ายหลัง journal_pos
+        หรือโหลดใหม่ทั้งหมดถ้า Snapshot ถูกเขียนใหม่ (Process อื่นทำ Compaction) แจ้ง listeners ด้วย 'reset' ถ้ามีการเปลี่ยนแปลง"""
+        try:
+            with open(self.journal_file, 'rb') as f:
+                base = f.readline(); start = self.journal_pos or len(base)
+                f.seek(start); tail = f.read()
+        except FileNotFoundError: base = tail = None
+        if _file_sig(self.snapshot_file) != self.snapshot_sig or (base is None and self.journal_pos) \
+                or base is not None and base != _base_line(self.snapshot_digest):
+            with trace.span('store.reload'): self.data = self.load_data()
+            self._notify('reset', None, None)
+            return True
+        if not tail: return False
+        self.journal_pos, n = start, 0
+        for line in tail.split(b'\n')[:-1]:
+            try: op = json.loads(line.decode('utf-8'))
+            except ValueError: break
+            self._apply(self.data, op); n += len(op['ops']) if op['op'] == 'batch' else 1
+            self.journal_pos += len(line) + 1
+        self.journal_ops += n
+        if self.journal_pos < start + len(tail):
+            # บรรทัดที่ไม่สมบูรณ์จาก Process ที่ล้มระหว่างเขียน (ถือล็อกอยู่ จึงไม่มีใครกำลังเขียน) ตัดทิ้งก่อนต่อท้าย
+            with open(self.journal_file, 'r+b') as f: f.truncate(self.journal_pos)
+        if n: self._notify('reset', None, None)
+        return bool(n)
+
+    def _log(self, op):
+        """เขียน Operation ต่อท้าย Journal แบบ Durable (fsync) ใช้เวลาคงที่ไม่ขึ้นกับขนาดประวัติ
+        (ระหว่าง transaction จะเก็บไว้เขียนรวมครั้งเดียวตอนจบ)"""
+        if self._tx is not None: self._tx['ops'].append(op); return
+        self._append_journal(op, 1)
+
+    def _append_journal(self, op, n):
+        new = not os.path.exists(self.journal_file)
+        with trace.span('store.journal_append'), open(self.journal_file, 'ab') as f:
+            if new: f.write(_base_line(self.snapshot_digest))
+            f.write((json.dumps(op, ensure_ascii=False) + '\n').encode('utf-8'))
+            f.flush(); os.fsync(f.fileno())
+            self.journal_pos = f.tell()
+        self.journal_ops += n
+        if self.journal_ops >= self.COMPACT_EVERY: self.save_data()
+
+    @contextmanager
+    def _writing(self):
+        """ถือล็อกไฟล์ระหว่างแก้ไข และตามการเปลี่ยนแปลงของ Process อื่นให้ทันก่อน (ชั้นในของ transaction ไม่ต้องตามซ้ำ)"""
+        with self.lock:
+            if self.lock.depth == 1: self._sync()
+            yield
+
+    @contextmanager
+    def transaction(self):
+        """รวมการเพิ่ม/แก้ไข/ลบหลายรายการเป็นการเขียนลงดิสก์ครั้งเดียว (fsync ครั้งเดียว) และใช้เวลาประทับเดียวกัน
+
+        ถ้าเกิด Exception ในบล็อก with จะย้อนข้อมูลในหน่วยความจำกลับและไม่เขียนอะไรลง Journal
+        transaction ที่ซ้อนกันจะรวมเป็นก้อนเดียวกับชั้นนอกสุด ล็อกไฟล์ถูกถือไว้ตลอด transaction
+        """
+        if self._tx is not None: yield self; return
+        with self._writing():
+            self._tx = {'ops': [], 'undo': [], 'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+            try: yield self
+            except:
+                undo, self._tx = self._tx['undo'], None
+                for fn in reversed(undo): fn()
+                self._build_trends(); self._notify('reset', None, None)
+                raise
+            ops, self._tx = self._tx['ops'], None
+            if ops: self._append_journal(ops[0] if len(ops) == 1 else {'op': 'batch', 'ops': ops}, len(ops))
+
+    def _undo(self, fn):
+        if self._tx is not None: self._tx['undo'].append(fn)
+
+    def _now(self):
+        return self._tx['time'] if self._tx is not None else datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    def save_data(self):
+        """บันทึก Snapshot ไบนารีใหม่ทั้งไฟล์แบบ Atomic (เขียนไฟล์ชั่วคราวแล้ว replace) และเริ่ม Journal ใหม่"""
+        with self._writing(), trace.span('store.save_data'):
+            raw, digest = snapshot_bytes(self.data)
+            self.data.detach()
+            _atomic_write(self.snapshot_file, raw)
+            self.snapshot_digest, self.journal_ops, self.imported = digest, 0, False
+            self.snapshot_sig = _file_sig(self.snapshot_file)
+            # ถ้าเครื่องดับก่อนบรรทัดนี้ Journal เก่าจะมี digest ไม่ตรงกับ Snapshot ใหม่และถูกข้ามตอนโหลด
+            base = _base_line(self.snapshot_digest)
+            _atomic_write(self.journal_file, base)
+            self.journal_pos = len(base)
+
+    def add_record(self, product_name, count):
+        """เพิ่มบันทึกสต็อกใหม่พร้อมประทับเวลา คืนค่า id ของรายการใหม่"""
+        with self._writing():
+            record = {'id': self.data.next_id, 'product_name': product_name, 'count': int(count), 'timestamp': self._now()}
+            self.data.append(record); self._trend_add(record, 1)
+            self._undo(self.data.pop)
+            self._log({'op': 'add', 'rec': record})
+        self._notify('add', len(self.data) - 1, None)
+        return record['id']
+
+    def get_record(self, record_id):
+        """รายการตาม id (dict ที่คัดลอกแล้ว รวม version ล่าสุด) หรือ None ถ้าไม่มี (เรียก sync() ก่อนเพื่อเห็นค่าจาก Process อื่น)"""
+        try: return dict(self.data[self.data.index_of(record_id)])
+        except KeyError: return None
+
+    def update_record(self, record_id, new_name, new_count, version=None):
+        """แก้ไขข้อมูลตาม id ของรายการ ถ้าระบุ version จะแก้เฉพาะเมื่อรายการยังไม่ถูกแก้โดยผู้อื่น (ไม่งั้นคืนค่า False)"""
+        try:
+            with self._writing():
+                index, new_count = self.data.index_of(record_id), int(new_count)
+                old = dict(self.data[index])
+                if version is not None and old['version'] != version: return False
+                self._undo(lambda: self.data.set(index, old['product_name'], old['count'], old['version']))
+                self._trend_add(old, -1)
+                self.data.set(index, new_name, new_count)
+                self._trend_add(self.data[index], 1)
+                self._log({'op': 'update', 'id': record_id, 'v': old['version'] + 1, 'product_name': new_name, 'count': new_count})
+        except: return False
+        self._notify('update', index, old)
+        return True
+
+    def delete_record(self, record_id, version=None):
+        """ลบรายการตาม id ถ้าระบุ version จะลบเฉพาะเมื่อรายการยังไม่ถูกแก้โดยผู้อื่น (ไม่งั้นคืนค่า False)"""
+        try:
+            with self._writing():
+                index = self.data.index_of(record_id)
+                if version is not None and self.data[index]['version'] != version: return False
+                old = self.data.pop(index)
+                self._undo(lambda: self.data.insert(index, old))
+                self._trend_add(old, -1)
+                self._log({'op': 'delete', 'id': record_id})
+        except: return False
+        self._notify('delete', index, old)
+        return True
+
+    def _notify(self, op, index, old):
+        """แจ้งผู้ที่ติดตามการเปลี่ยนแปลง (listeners) หลังเพิ่ม/แก้ไข/ลบ"""
+        for fn in self.listeners: fn(op, index, old)
+
+    def export_json(self, path=None):
+        """ส่งออกประวัติทั้งหมดเป็นไฟล์ JSON รูปแบบเดียวกับ stock_data.json เดิม (ใช้นำเข้าเครื่องอื่นได้)"""
+        from stock_export import export_records
+        return export_records(self, path or self.filename, 'json')
+
+    def get_all_records(self): return self.data
+
+    def _mask(self, name, date):
+        """Boolean mask ของรายการที่ตรงกับคำกรองชื่อ (ไม่สนตัวพิมพ์) และวันที่/ช่วงวันที่ (None คือไม่ได้กรอง)"""
+        mask = self.data.name_mask(name) if name else None
+        if date:
+            days = parse_date_query(date)
+            m = self.data.day_mask(*days) if days else self.data.text_mask(date)
+            mask = m if mask is None else mask & m
+        return mask
+
+    def query_records(self, name='', date=''):
+        """กรองตามชื่อ (ไม่สนตัวพิมพ์) และวันที่ (รองรับช่วงแบบ 2026-01..2026-03) คืนค่า (id, record) เรียงจากใหม่ไปเก่า
+
+        กรองทั้งคอลัมน์แบบ Vectorized แล้วคืน RecordView ของแต่ละแถว (ไม่คัดลอกข้อมูล)
+        """
+        mask = self._mask(name, date)
+        idx = np.arange(len(self.data))[::-1] if mask is None else np.flatnonzero(mask)[::-1]
+        return [(k, self.data[i]) for k, i in zip(self.data.ids[idx].tolist(), idx.tolist())]
+
+    def iter_records(self, name='', date='', chunk=1000):
+        """อ่านรายการที่ตรงเงื่อนไขทีละก้อน (เรียงจากเก่าไปใหม่) สำหรับส่งออกแบบ Streaming จาก Thread เบื้องหลัง
+
+        คัดลอกคอลัมน์ของแถวที่ตรงเงื่อนไขออกมาครั้งเดียวตอนเริ่ม (ถือล็อก) แล้วอ่านจากสำเนานั้น
+        การเพิ่ม/ลบ/Compaction/sync() ระหว่างส่งออกจึงไม่ทำให้ได้แถวผิดตำแหน่ง (ได้ข้อมูล ณ ตอนเริ่มอ่าน)
+        """
+        with self.lock:
+            mask = self._mask(name, date)
+            snap = self.data.take(np.arange(len(self.data)) if mask is None else np.flatnonzero(mask))
+        for i in range(0, len(snap), chunk):
+            rows = snap.rows(np.arange(i, min(i + chunk, len(snap))))
+            if rows: yield rows
+
+    def count_records(self, name='', date=''):
+        """จำนวนรายการที่ตรงเงื่อนไข (ใช้คำนวณความคืบหน้าของการส่งออก)"""
+        mask = self._mask(name, date)
+        return len(self.data) if mask is None else int(mask.sum())
+
+    def daily_totals(self, name='', date=''):
+        """ยอดรวมรายวันที่ตรงเงื่อนไข [(วัน, สินค้า, ยอดรวม, จำนวนรายการ)] เรียงตามวันและสินค้า อ่านจากยอดรวมที่เก็บไว้"""
+        days = parse_date_query(date) if date else ('', '\x7f')
+        if days is None:
+            # กรองด้วยเวลา (เช่น 10:30) ยอดรวมที่เก็บไว้แยกไม่ได้ ต้องรวมจากคอลัมน์ของรายการที่ตรงเงื่อนไข
+            pids, secs, totals, rows = self.data.daily_groups(self._mask(name, date))
+            products = self.data.products
+            return sorted(zip(format_days(secs).tolist(), [products[p] for p in pids.tolist()],
+                              totals.tolist(), rows.tolist()))
+        name = name.lower()
+        return sorted((d, n, t[0], t[1]) for n, ds in list(self.trends.items()) if name in n.lower()
+                      for d, t in list(ds.items()) if days[0] <= d < days[1])
+
+    def _trend_add(self, r, sign):
+        """บวก (sign=1) หรือลบ (sign=-1) ยอดของรายการหนึ่งออกจากยอดรวมรายวันที่เก็บไว้ ใช้เวลา O(1)"""
+        n, d = r['product_name'], r['timestamp'].split(' ', 1)[0]
+        days = self.trends.setdefault(n, {})
+        t = days.setdefault(d, [0, 0])
+        t[0] += sign * r['count']; t[1] += sign
+        # ลบวัน/สินค้าที่ไม่มีรายการเหลือแล้ว เพื่อให้ผลตรงกับการคำนวณใหม่ทั้งหมด
+        if t[1] == 0:
+            del days[d]
+            if not days: del self.trends[n]
+
+    def _build_trends(self):
+        """สร้างยอดรวมรายวันจากข้อมูลทั้งหมดใหม่ (รวมทั้งคอลัมน์แบบ Vectorized)"""
+        return self._trends_from(self.data.products, *self.data.daily_groups())
+
+    def _trends_from(self, products, pids, secs, totals, rows):
+        """ตั้งยอดรวมรายวันจากผลของ daily_groups (คำนวณใหม่ หรืออ่านจาก Snapshot)"""
+        self.trends = {}
+        for p, d, t, c in zip(pids.tolist(), format_days(secs).tolist(), totals.tolist(), rows.tolist()):
+            self.trends.setdefault(products[p], {})[d] = [t, c]
+        return self.trends
+
+    def get_products(self):
+        """รายชื่อสินค้าทั้งหมดที่มีในระบบ (ใช้สร้างเมนูเลือกกราฟ)"""
+        return list(self.trends)
+
+    def get_product_trend(self, n):
+        """ยอดรวมรายวันของสินค้าหนึ่งรายการ เรียงตามวันที่ อ่านจากยอดรวมที่เก็บไว้"""
+        return {d: t[0] for d, t in sorted(self.trends.get(n, {}).items())}
+
+    def get_product_daily_trends(self):
+        """รวมยอดการตรวจนับรายวันแยกตามประเภทสินค้าสำหรับวาดกราฟ (อ่านจากยอดรวมที่เก็บไว้)"""
+        return {n: self.get_product_trend(n) for n in self.trends}
+
+    def check_trends(self):
+        """ตรวจว่ายอดรวมที่อัปเดตทีละรายการตรงกับการคำนวณใหม่ทั้งหมดจากข้อมูลดิบ"""
+        return self.get_product_daily_trends() == self._compute_trends()
+
+    def _compute_trends(self):
+        """คำนวณยอดรวมรายวันใหม่ทั้งหมดจากข้อมูลดิบ (ใช้ตรวจสอบความถูกต้อง)"""
+        trends = {}
+        for r in self.data:
+            d, n, c = r['timestamp'].split(' ')[0], r['product_name'], r['count']
+            if n not in trends: trends[n] = {}
+            trends[n][d] = trends[n].get(d, 0) + c
+        return {n: dict(sorted(t.items())) for n, t in trends.items()}
+
+def parse_date_query(q):
+    """แปลงข้อความกรองวันที่เป็นช่วงของวัน (lo, hi) ที่ lo <= วัน < hi
+
+    '2026-02' คือทุกวันที่ขึ้นต้นด้วย 2026-02, '2026-01..2026-03' คือมกราคมถึงมีนาคม ('2026-01..' หรือ '..2026-03' ได้)
+    คืนค่า None ถ้าไม่ใช่รูปแบบวันที่ (เช่นเวลา 10:30 หรือเลขสั้น ๆ อย่าง 13 ที่ไม่มีปี 4 หลัก) ให้ผู้เรียกค้นหาแบบ substring แทน
+    """
+    q = q.strip()
+    lo, sep, hi = q.partition('..')
+    if not sep: hi = lo
+    lo, hi = lo.strip(), hi.strip()
+    for part in (lo, hi):
+        if part and not (len(part) >= 4 and part[:4].isdigit() and set(part) <= set('0123456789-')): return None
+    if not (lo or hi): return None
+    return lo, (hi or '9999') + '\x7f'
+
+def _base_line(digest):
+    """บรรทัดแรกของ Journal: digest ของ Snapshot ที่ Journal นี้ต่อยอดอยู่"""
+    return (json.dumps({'op': 'base', 'digest': digest}) + '\n').encode('utf-8')
+
+def _file_sig(path):
+    """ลายเซ็นของไฟล์ (inode, ขนาด, เวลาแก้ไข) ใช้ตรวจว่า Process อื่นเขียน Snapshot ใหม่หรือไม่ (None ถ้าไม่มีไฟล์)"""
+    try: st = os.stat(path)
+    except FileNotFoundError: return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+class FileLock:
+    """ล็อกข้าม Process ด้วยไฟล์ (fcntl.flock บน POSIX, msvcrt.locking บน Windows) รอจนได้ล็อก
+    ใช้ซ้อนกันได้ใน Thread เดียวกัน (นับชั้นด้วย depth) และกัน Thread อื่นใน Process เดียวกันด้วย RLock
+    ล็อกถูกปล่อยเองถ้า Process ที่ถือไว้ล้ม"""
+    def __init__(self, path): self.path, self.f, self.depth, self.mutex = path, None, 0, threading.RLock()
+
+    def __enter__(self):
+        self.mutex.acquire()
+        try: self._acquire()
+        except: self.mutex.release(); raise
+        return self
+
+    def _acquire(self):
+        if self.depth == 0:
+            f = open(self.path, 'a+b')
+            try:
+                if os.name == 'nt':
+                    import msvcrt
+                    while True:
+                        f.seek(0)
+                        try: msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1); break
+                        except OSError: pass # LK_LOCK ลองซ้ำ 10 วินาทีแล้วยอมแพ้ ให้ลองใหม่ต่อ
+                else:
+                    import fcntl
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            except: f.close(); raise
+            self.f = f
+        self.depth += 1
+
+    def __exit__(self, *exc):
+        try: self._release()
+        finally: self.mutex.release()
+
+    def _release(self):
+        self.depth -= 1
+        if self.depth: return
+        f, self.f = self.f, None
+        try:
+            if os.name == 'nt':
+                import msvcrt
+                f.seek(0); msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        finally: f.close()
+
+def _atomic_write(path, raw):
+    """เขียนไฟล์แบบ Atomic: เขียนลงไฟล์ชั่วคราว fsync แล้ว os.replace ทับของเดิม"""
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(raw); f.flush(); os.fsync(f.fileno())
+    os.replace(tmp, path)
+    if hasattr(os, 'O_DIRECTORY'):
+        # fsync โฟลเดอร์เพื่อให้การเปลี่ยนชื่อไฟล์ถูกบันทึกถาวร (เฉพาะ POSIX)
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+        try: os.fsync(fd)
+        finally: os.close(fd)
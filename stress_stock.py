@@ -0,0 +1,128 @@
+"""ทดสอบการเขียนพร้อมกันหลาย Process บนไฟล์ข้อมูลเดียวกัน แล้วตรวจว่าไม่มีการแก้ไขหาย (Lost update)
+
+แต่ละ Worker เพิ่ม/แก้ไข/ลบรายการของตัวเอง (ชื่อ w<เลข>) และเพิ่มค่าตัวนับที่ใช้ร่วมกัน (counter_*)
+แบบ Optimistic: อ่าน version ล่าสุด แล้ว update_record(..., version=v) ถ้ามีคนแก้ไปก่อนก็อ่านใหม่แล้วลองอีกครั้ง
+เมื่อทุก Worker จบ จะเปิดข้อมูลใหม่แล้วตรวจว่าตัวนับเท่ากับจำนวนครั้งที่เพิ่มจริง และรายการของทุก Worker ครบและถูกต้อง
+ตัวอย่าง:
+    python stress_stock.py --workers 4 --ops 300
+    python stress_stock.py --backend sqlite --workers 8
+"""
+import argparse
+import multiprocessing as mp
+import os
+import queue
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+def open_store(backend, path, compact_every=None):
+    from stock_backend import open_stock_data
+    store = open_stock_data(backend, path)
+    if compact_every and backend == 'journal': store.COMPACT_EVERY = compact_every # ให้เกิด Compaction ระหว่างที่ Process อื่นกำลังเขียน
+    return store
+
+def worker(backend, path, wid, ops, seed, compact_every, counters, start, results):
+    store = open_store(backend, path, compact_every)
+    rnd, name = random.Random(seed * 1000 + wid), f"w{wid}"
+    mine, increments, conflicts = {}, {c: 0 for c in counters}, 0 # mine: id -> จำนวนล่าสุดของรายการที่ตัวเองเป็นเจ้าของ
+    start.wait()
+    for _ in range(ops):
+        r = rnd.random()
+        if r < 0.3:
+            c = rnd.randint(0, 99); mine[store.add_record(name, c)] = c
+        elif r < 0.35:
+            items = [(name, rnd.randint(0, 99)) for _ in range(3)]
+            mine.update(zip(store.add_records(items), (c for _, c in items)))
+        elif r < 0.5 and mine:
+            rid, c = rnd.choice(list(mine)), rnd.randint(0, 99)
+            store.sync(); rec = store.get_record(rid)
+            if rec is None or not store.update_record(rid, name, c, version=rec['version']):
+                raise AssertionError(f"{name}: update of own record {rid} failed")
+            mine[rid] = c
+        elif r < 0.6 and mine:
+            rid = rnd.choice(list(mine))
+            store.sync(); rec = store.get_record(rid)
+            if rec is None or not store.delete_record(rid, version=rec['version']):
+                raise AssertionError(f"{name}: delete of own record {rid} failed")
+            del mine[rid]
+        else:
+            # อ่าน-แก้-เขียนตัวนับที่ทุก Worker แก้พร้อมกัน ถ้า version ไม่ตรง (มีคนแก้ก่อน) ให้อ่านใหม่
+            cid = rnd.choice(counters)
+            for _ in range(1000):
+                store.sync(); rec = store.get_record(cid)
+                if store.update_record(cid, rec['product_name'], rec['count'] + 1, version=rec['version']): break
+                conflicts += 1
+            else: raise AssertionError(f"{name}: counter {cid} never updated (1000 version conflicts)")
+            increments[cid] += 1
+    store.close()
+    results.put({'wid': wid, 'mine': mine, 'increments': increments, 'conflicts': conflicts})
+
+def verify(store, reports, counters):
+    """ตรวจผลสุดท้ายเทียบกับสิ่งที่ Worker ทุกตัวรายงานว่าทำสำเร็จ คืนค่า List ของข้อผิดพลาด"""
+    errors, records = [], {r['id']: r for r in store.get_all_records()}
+    if len(records) != len(store.get_all_records()): errors.append('duplicate record ids')
+    for cid in counters:
+        want = sum(rep['increments'][cid] for rep in reports)
+        got = records[cid]['count'] if cid in records else None
+        if got != want: errors.append(f"counter {cid}: {got} != {want} increments (lost update)")
+    for rep in reports:
+        name = f"w{rep['wid']}"
+        have = {k: r['count'] for k, r in records.items() if r['product_name'] == name}
+        if have != rep['mine']:
+            missing, extra = set(rep['mine']) - set(have), set(have) - set(rep['mine'])
+            wrong = [k for k in set(have) & set(rep['mine']) if have[k] != rep['mine'][k]]
+            errors.append(f"{name}: {len(missing)} missing, {len(extra)} unexpected, {len(wrong)} wrong counts")
+    expected = len(counters) + sum(len(rep['mine']) for rep in reports)
+    if len(records) != expected: errors.append(f"{len(records)} records, expected {expected}")
+    if hasattr(store, 'check_trends') and not store.check_trends(): errors.append('daily trends out of sync with records')
+    return errors
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Concurrent writer stress test for the stock store')
+    ap.add_argument('--backend', choices=('journal', 'sqlite'), default='journal')
+    ap.add_argument('--workers', type=int, default=4)
+    ap.add_argument('--ops', type=int, default=300, help='operations per worker')
+    ap.add_argument('--counters', type=int, default=3, help='shared counter records')
+    ap.add_argument('--compact-every', type=int, default=40, help='journal compaction threshold (journal backend)')
+    ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--dir', help='data folder (default: temporary, removed afterwards)')
+    args = ap.parse_args(argv)
+
+    folder = args.dir or tempfile.mkdtemp(prefix='stress_stock_')
+    path = os.path.join(folder, 'stock_data.db' if args.backend == 'sqlite' else 'stock_data.json')
+    try:
+        store = open_store(args.backend, path)
+        counters = store.add_records([(f"counter_{i}", 0) for i in range(args.counters)])
+        store.close()
+
+        ctx = mp.get_context('spawn')
+        start, results = ctx.Event(), ctx.Queue()
+        procs = [ctx.Process(target=worker, args=(args.backend, path, w, args.ops, args.seed, args.compact_every, counters, start, results))
+                 for w in range(args.workers)]
+        for p in procs: p.start()
+        time.sleep(0.5); t0 = time.perf_counter(); start.set()
+        reports = []
+        while len(reports) < len(procs):
+            try: reports.append(results.get(timeout=1))
+            except queue.Empty:
+                if any(p.exitcode for p in procs): break # Worker ล้ม (เช่น assert ไม่ผ่าน) ไม่ต้องรอต่อ
+        for p in procs: p.join()
+        elapsed = time.perf_counter() - t0
+        failed = [p.exitcode for p in procs if p.exitcode]
+        if failed or len(reports) != len(procs):
+            print(f"FAIL: {len(failed)} worker(s) crashed", file=sys.stderr); return 1
+
+        errors = verify(open_store(args.backend, path), reports, counters)
+        total = args.workers * args.ops
+        print(f"{args.backend}: {args.workers} workers x {args.ops} ops in {elapsed:.2f} s ({total / elapsed:.0f} ops/s), "
+              f"{sum(r['conflicts'] for r in reports)} version conflicts retried")
+        for e in errors: print(f"FAIL: {e}", file=sys.stderr)
+        if not errors: print("OK: no lost updates")
+        return 1 if errors else 0
+    finally:
+        if not args.dir: shutil.rmtree(folder, ignore_errors=True)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,20 +1,326 @@
+import ast
 import cv2
 import numpy as np
-from collections import Counter
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from perf_trace import trace
+
+class ModelRegistry:
+    """แคชโมเดลที่โหลดแล้วแบบ LRU โดยใช้ (path, เวลาแก้ไขไฟล์) เป็น key เพื่อไม่ต้องโหลด Weight ใหม่ทุกครั้ง
+
+    จำกัดได้ทั้งจำนวนโมเดล (max_models) และหน่วยความจำรวมโดยประมาณ (max_bytes) เมื่อเกินจะทิ้งโมเดลที่ไม่ได้ใช้นานที่สุด
+    ถ้าไฟล์โมเดลถูกแก้ไข (mtime เปลี่ยน) จะโหลดใหม่อัตโนมัติ
+    """
+
+    def __init__(self, max_models=3, max_bytes=None, warmup_size=320):
+        self.max_models, self.max_bytes, self.warmup_size = max_models, max_bytes, warmup_size
+        self._models = OrderedDict() # (path, mtime) -> (model, ขนาดโดยประมาณเป็น byte)
+        self._lock = threading.Lock()
+
+    def _key(self, model_path):
+        path = os.path.abspath(model_path)
+        # ไฟล์ที่ยังไม่มี (เช่น yolov8n.pt ที่ ultralytics ดาวน์โหลดให้) ใช้ชื่อเดิมและไม่มี mtime
+        return (path, os.path.getmtime(path)) if os.path.exists(path) else (model_path, None)
+
+    def get(self, model_path):
+        """คืนโมเดลจากแคช ถ้ายังไม่มีจะโหลด อุ่นเครื่อง (Warm-up) แล้วเก็บไว้"""
+        key = self._key(model_path)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key][0]
+            # โมเดลเดิมที่ไฟล์ถูกแก้ไขไปแล้ว (หรือที่เก็บไว้ด้วยชื่อเดิมก่อนไฟล์ถูกดาวน์โหลด) ไม่ต้องเก็บไว้
+            for old in [k for k in self._models if k[0] in (key[0], model_path)]: del self._models[old]
+            model = self._load(model_path)
+            # ไฟล์ที่เพิ่งถูกดาวน์โหลดระหว่างโหลดจะได้ key จาก path จริง ครั้งถัดไปจึงตรงกันและไม่โหลดซ้ำ
+            key = self._key(model_path)
+            self._models[key] = (model, self._model_bytes(model, key[0]))
+            self._shrink()
+            return model
+
+    def preload(self, *model_paths):
+        """โหลดโมเดลล่วงหน้า (เช่นตอนเปิดแอป) เพื่อให้การสแกนครั้งแรกไม่ช้า"""
+        for p in model_paths: self.get(p)
+
+    def evict(self, model_path=None):
+        """ลบโมเดลออกจากแคช ถ้าไม่ระบุ path จะล้างทั้งหมด"""
+        with self._lock:
+            if model_path is None: self._models.clear(); return
+            for k in [k for k in self._models if k[0] in (model_path, os.path.abspath(model_path))]: del self._models[k]
+
+    def __contains__(self, model_path): return self._key(model_path) in self._models
+    def __len__(self): return len(self._models)
+
+    def total_bytes(self): return sum(size for _, size in self._models.values())
+
+    def _shrink(self):
+        """ทิ้งโมเดลที่ใช้ล่าสุดนานที่สุดจนกว่าจะอยู่ในงบจำนวน/หน่วยความจำ (เก็บตัวล่าสุดไว้เสมอ)"""
+        while len(self._models) > 1 and (len(self._models) > self.max_models or
+                                         (self.max_bytes is not None and self.total_bytes() > self.max_bytes)):
+            key, _ = self._models.popitem(last=False)
+            print(f"evict model: {key[0]}")
+
+    def _load(self, model_path):
+        from ultralytics import YOLO
+        model = YOLO(model_path)
+        if self.warmup_size:
+            # รันภาพว่างหนึ่งครั้งเพื่อให้ Graph/Memory ถูกจัดเตรียมไว้ก่อนการสแกนจริง
+            model(np.zeros((self.warmup_size, self.warmup_size, 3), dtype=np.uint8), verbose=False)
+        print(f"load model done: {model_path}")
+        return model
+
+    @staticmethod
+    def _model_bytes(model, path):
+        """ประมาณขนาดหน่วยความจำจากพารามิเตอร์ของโมเดล (ถ้าอ่านไม่ได้ใช้ขนาดไฟล์แทน)"""
+        try: return sum(p.numel() * p.element_size() for p in model.model.parameters())
+        except Exception: return os.path.getsize(path) if os.path.exists(path) else 0
+
+# แคชโมเดลที่ใช้ร่วมกันทุก YOLODetector
+model_registry = ModelRegistry()
+
+def nms(boxes, scores, iou_threshold=0.5, classes=None, metric='iou', groups=None):
+    """Non-Maximum Suppression แบบ Vectorized ด้วย NumPy คืนค่า index ของกรอบที่เก็บไว้ (เรียงตามคะแนน)
+
+    classes: ถ้าระบุจะตัดกรอบซ้อนเฉพาะในคลาสเดียวกัน (เลื่อนพิกัดแต่ละคลาสให้ไม่ซ้อนกัน)
+    metric: 'iou' หรือ 'ios' (พื้นที่ซ้อน / พื้นที่กรอบเล็ก) ซึ่งเหมาะกับกรอบที่ถูกตัดครึ่งที่ขอบ Tile
+    groups: ถ้าระบุ (เช่นเลข Tile ของแต่ละกรอบ) ใช้ metric เฉพาะคู่ที่ต่างกลุ่ม คู่ในกลุ่มเดียวกันใช้ IoU
+    เพื่อไม่ให้ IoS รวมของสองชิ้นที่วางซ้อนกันจริงในภาพเดียวกันเป็นชิ้นเดียว
+    """
+    boxes, scores = np.asarray(boxes, dtype=np.float32).reshape(-1, 4), np.asarray(scores, dtype=np.float32)
+    if len(boxes) == 0: return np.zeros(0, dtype=int)
+    if classes is not None:
+        boxes = boxes + (np.asarray(classes, dtype=np.float32) * (boxes.max() + 1))[:, None]
+    x1, y1, x2, y2 = boxes.T
+    areas = (x2 - x1) * (y2 - y1)
+    if groups is not None: groups = np.asarray(groups)
+    order, keep = scores.argsort()[::-1], []
+    while order.size:
+        i, rest = order[0], order[1:]
+        keep.append(i)
+        w = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+        h = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        inter = w * h
+        union = areas[i] + areas[rest] - inter
+        denom = np.minimum(areas[i], areas[rest]) if metric == 'ios' else union
+        if groups is not None and metric != 'iou': denom = np.where(groups[rest] == groups[i], union, denom)
+        order = rest[inter / np.maximum(denom, 1e-9) <= iou_threshold]
+    return np.array(keep, dtype=int)
+
+def tile_offsets(width, height, tile=640, overlap=0.2):
+    """คำนวณมุมซ้ายบน (x, y) ของ Tile ที่ซ้อนกัน overlap ส่วน ให้ครอบคลุมทั้งภาพ (Tile สุดท้ายชิดขอบภาพ)"""
+    def starts(size):
+        if size <= tile: return [0]
+        step = max(1, int(tile * (1 - overlap)))
+        s = list(range(0, size - tile, step))
+        return s + [size - tile]
+    return [(x, y) for y in starts(height) for x in starts(width)]
+
+def dhash(frame, size=8):
+    """Perceptual hash แบบ Difference hash (size*size บิต) ของภาพ BGR: ย่อเป็นขาวดำ (size+1)xsize แล้วเทียบความสว่างกับพิกเซลข้างกัน
+    ภาพที่ต่างกันเล็กน้อย (Noise ของกล้อง, แสงเปลี่ยนนิดหน่อย) ได้ hash ที่ต่างกันไม่กี่บิต"""
+    h, w = frame.shape[:2]
+    # สุ่มพิกเซลแบบ stride ก่อน (ถูกกว่าย่อทั้งภาพ และได้ Array ต่อเนื่องที่ OpenCV รับได้)
+    sub = np.ascontiguousarray(frame[::max(1, h // (size * 8)), ::max(1, w // ((size + 1) * 8))])
+    small = cv2.resize(cv2.cvtColor(sub, cv2.COLOR_BGR2GRAY), (size + 1, size), interpolation=cv2.INTER_AREA)
+    return int.from_bytes(np.packbits(small[:, 1:] > small[:, :-1]).tobytes(), 'big')
+
+class DetectionCache:
+    """แคชผลนับของภาพที่เกือบเหมือนกัน (เช่นกดชัตเตอร์ซ้ำที่ชั้นเดิม) ภายในเวลา ttl วินาที
+
+    key คือ (โมเดล, ค่าความเชื่อมั่น, วิธีตรวจจับ) ร่วมกับ dhash ของภาพ ซึ่งถือว่าตรงกันถ้าต่างกันไม่เกิน max_distance บิต
+    เก็บไม่เกิน size รายการ (ทิ้งรายการที่ไม่ได้ใช้นานที่สุด) hits/misses ใช้ปรับค่า ttl และ max_distance
+    """
+    def __init__(self, size=32, ttl=3.0, max_distance=4):
+        self.size, self.ttl, self.max_distance = size, ttl, max_distance
+        self._entries = OrderedDict() # (key, hash) -> (เวลาที่บันทึก, ผลนับ)
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key, frame_hash):
+        now = time.monotonic()
+        with self._lock:
+            for k, (t, res) in list(self._entries.items()):
+                if now - t > self.ttl: del self._entries[k]
+                elif k[0] == key and bin(k[1] ^ frame_hash).count('1') <= self.max_distance:
+                    self._entries.move_to_end(k); self.hits += 1
+                    return res
+            self.misses += 1
+        return None
+
+    def put(self, key, frame_hash, result):
+        with self._lock:
+            self._entries[(key, frame_hash)] = (time.monotonic(), dict(result))
+            self._entries.move_to_end((key, frame_hash))
+            while len(self._entries) > self.size: self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock: self._entries.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / total if total else 0.0, 'size': len(self._entries)}
+
+# --- Backend สำหรับรันโมเดล (Inference Backends) ---
+class Detections:
+    """ผลตรวจจับของภาพหนึ่งภาพที่ไม่ขึ้นกับ Backend: xyxy (Nx4), conf (N), cls (N) เป็น NumPy ในพิกัดของภาพต้นฉบับ"""
+    __slots__ = ('xyxy', 'conf', 'cls', 'names', 'speed', '_plot')
+    def __init__(self, xyxy, conf, cls, names, speed=None, plot=None):
+        self.xyxy, self.conf, self.cls, self.names = xyxy, conf, cls, names
+        self.speed, self._plot = speed or {}, plot # speed: เวลา (ms) ของ preprocess/inference/postprocess
+
+    def counts(self):
+        """จำนวนวัตถุแต่ละชนิด เช่น {'Milk': 2, 'Bread': 1}"""
+        return dict(Counter(self.names[int(c)] for c in self.cls))
+
+    def boxes(self):
+        """[(ชื่อคลาส, ความเชื่อมั่น, (x1, y1, x2, y2)), ...]"""
+        return [(self.names[int(c)], float(s), tuple(float(v) for v in b)) for b, s, c in zip(self.xyxy, self.conf, self.cls)]
+
+    def plot(self, frame):
+        """ภาพที่วาดกรอบและชื่อคลาสแล้ว (ใช้ของ ultralytics ถ้ามี ไม่เช่นนั้นวาดด้วย OpenCV)"""
+        if self._plot: return self._plot()
+        out = np.ascontiguousarray(frame).copy()
+        for (x1, y1, x2, y2), s, c in zip(self.xyxy.astype(int), self.conf, self.cls):
+            cv2.rectangle(out, (x1, y1), (x2, y2), (255, 180, 0), 2)
+            cv2.putText(out, f"{self.names[int(c)]} {s:.2f}", (x1, max(12, y1 - 4)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 180, 0), 1)
+        return out
+
+class UltralyticsBackend:
+    """รันโมเดล .pt ผ่าน ultralytics (PyTorch)"""
+    name = 'ultralytics'
+    def __init__(self, model_path):
+        from ultralytics import YOLO
+        self.model = YOLO(model_path) # โหลดไฟล์ Weight ของโมเดล (.pt)
+        self.names = self.model.names
+
+    def predict(self, source, confidence):
+        results = self.model(source, conf=confidence, verbose=False)
+        return [Detections(r.boxes.xyxy.cpu().numpy(), r.boxes.conf.cpu().numpy(), r.boxes.cls.cpu().numpy().astype(int),
+                           r.names, r.speed, r.plot) for r in results]
+
+def letterbox(img, size=(640, 640), color=114):
+    """ย่อภาพโดยรักษาสัดส่วนให้พอดี size (h, w) แล้วเติมขอบสีเทาให้อยู่กึ่งกลาง แบบเดียวกับตอนเทรน YOLO
+    คืนค่า (ภาพ, อัตราส่วนย่อ, (เติมซ้าย, เติมบน)) ไว้ใช้แปลงพิกัดกลับ"""
+    h, w = img.shape[:2]
+    r = min(size[0] / h, size[1] / w)
+    nw, nh = round(w * r), round(h * r)
+    left, top = (size[1] - nw) // 2, (size[0] - nh) // 2
+    out = np.full((size[0], size[1], 3), color, dtype=np.uint8)
+    out[top:top + nh, left:left + nw] = cv2.resize(np.ascontiguousarray(img), (nw, nh), interpolation=cv2.INTER_LINEAR)
+    return out, r, (left, top)
+
+class OnnxBackend:
+    """รันโมเดล YOLOv8 ที่ export เป็น ONNX ด้วย ONNX Runtime บน CPU (ไม่ต้องโหลด PyTorch)
+
+    ทำ Letterbox, แปลงผลลัพธ์ และ NMS เองด้วย NumPy threads คือจำนวน Thread ภายในของ ONNX Runtime
+    int8=True ใช้ไฟล์ <ชื่อ>.int8.onnx (สร้างด้วย quantize_onnx ถ้ายังไม่มี) ซึ่งเล็กและเร็วกว่าบน CPU
+    providers เปลี่ยนเป็น Execution Provider อื่นได้ เช่น ['OpenVINOExecutionProvider'] ถ้าติดตั้งไว้
+    """
+    name = 'onnx'
+    def __init__(self, model_path, threads=None, int8=False, iou_threshold=0.45, max_det=300, providers=None):
+        import onnxruntime as ort
+        if int8:
+            q = os.path.splitext(model_path)[0] + '.int8.onnx'
+            model_path = q if os.path.exists(q) else quantize_onnx(model_path, q)
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads: opts.intra_op_num_threads, opts.inter_op_num_threads = threads, 1
+        self.session = ort.InferenceSession(model_path, opts, providers=providers or ['CPUExecutionProvider'])
+        inp = self.session.get_inputs()[0]
+        self.input_name, self.iou_threshold, self.max_det = inp.name, iou_threshold, max_det
+        # Input แบบ [batch, 3, h, w] ถ้า batch เป็นตัวเลข (export แบบไม่ dynamic) ต้องส่งทีละภาพ
+        self.batch = inp.shape[0] if isinstance(inp.shape[0], int) else None
+        meta = self.session.get_modelmeta().custom_metadata_map
+        imgsz = ast.literal_eval(meta['imgsz']) if 'imgsz' in meta else inp.shape[2:]
+        self.size = tuple(int(v) if isinstance(v, int) else 640 for v in imgsz)
+        self.names = ast.literal_eval(meta['names']) if 'names' in meta else None
+
+    def predict(self, source, confidence):
+        imgs = list(source) if isinstance(source, (list, tuple)) else [source]
+        imgs = [cv2.imread(i) if isinstance(i, str) else i for i in imgs]
+        out, step = [], self.batch or len(imgs)
+        for i in range(0, len(imgs), step):
+            out += self._predict_batch(imgs[i:i + step], confidence)
+        return out
+
+    def _predict_batch(self, imgs, confidence):
+        t0 = time.perf_counter()
+        boxed = [letterbox(img, self.size) for img in imgs]
+        # BGR HWC uint8 -> RGB NCHW float32 [0, 1]
+        x = np.stack([b[0] for b in boxed])[..., ::-1].transpose(0, 3, 1, 2).astype(np.float32) / 255.0
+        t1 = time.perf_counter()
+        pred = self.session.run(None, {self.input_name: np.ascontiguousarray(x)})[0] # [n, 4 + คลาส, จำนวนกรอบ]
+        t2 = time.perf_counter()
+        res = []
+        for p, img, (_, r, pad) in zip(pred, imgs, boxed):
+            res.append(self._postprocess(p, img.shape[:2], r, pad, confidence))
+        t3 = time.perf_counter()
+        n = len(imgs)
+        speed = {'preprocess': (t1 - t0) * 1000 / n, 'inference': (t2 - t1) * 1000 / n, 'postprocess': (t3 - t2) * 1000 / n}
+        for d in res: d.speed = speed
+        return res
+
+    def _postprocess(self, p, shape, r, pad, confidence):
+        """แปลงผลดิบ (cx, cy, w, h, คะแนนแต่ละคลาส) เป็นกรอบในพิกัดภาพต้นฉบับ กรองด้วย confidence แล้วทำ NMS แยกคลาส"""
+        p = p.T
+        scores_all = p[:, 4:]
+        cls = scores_all.argmax(1)
+        scores = scores_all[np.arange(len(p)), cls]
+        keep = scores >= confidence
+        p, cls, scores = p[keep], cls[keep], scores[keep]
+        names = self.names or {i: str(i) for i in range(scores_all.shape[1])}
+        if not len(p): return Detections(np.zeros((0, 4), np.float32), scores, cls, names)
+        xy, wh = p[:, :2], p[:, 2:4] / 2
+        boxes = (np.concatenate([xy - wh, xy + wh], 1) - [pad[0], pad[1], pad[0], pad[1]]) / r
+        boxes = boxes.clip(0, [shape[1], shape[0], shape[1], shape[0]]).astype(np.float32)
+        idx = nms(boxes, scores, self.iou_threshold, classes=cls)[:self.max_det]
+        return Detections(boxes[idx], scores[idx], cls[idx], names)
+
+def quantize_onnx(src, dst=None):
+    """สร้างโมเดล INT8 แบบ Dynamic quantization จากไฟล์ ONNX (น้ำหนักเป็น 8 บิต) คืนค่า path ของไฟล์ใหม่"""
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    dst = dst or os.path.splitext(src)[0] + '.int8.onnx'
+    quantize_dynamic(src, dst, weight_type=QuantType.QUInt8)
+    print(f"quantized model saved: {dst}")
+    return dst
+
+def load_backend(model_path, backend=None, threads=None, int8=False):
+    """เลือก Backend ตามชนิดไฟล์ (.onnx ใช้ ONNX Runtime นอกนั้นใช้ ultralytics) หรือตามที่ระบุ"""
+    backend = backend or ('onnx' if model_path.lower().endswith('.onnx') else 'ultralytics')
+    if backend == 'onnx': return OnnxBackend(model_path, threads, int8)
+    if backend == 'ultralytics': return UltralyticsBackend(model_path)
+    raise ValueError(f"unknown backend: {backend}")
 
 class YOLODetector:
     """Class สำหรับจัดการระบบตรวจจับวัตถุด้วยโมเดล YOLOv8"""
 
-    def __init__(self, model_path='yolov8n.pt'):
-        """เริ่มต้นโหลดโมเดล AI เมื่อเรียกใช้งาน Class"""
+    def __init__(self, model_path='yolov8n.pt', workers=1, max_pending=2, registry=None, cache_ttl=3.0, cache_size=32,
+                 backend=None, threads=None, int8=False):
+        """เริ่มต้นโหลดโมเดล AI เมื่อเรียกใช้งาน Class
+
+        workers คือจำนวน Thread สำหรับตรวจจับเบื้องหลัง และ max_pending คือจำนวนงานค้างสูงสุดของ detect_async (อย่างน้อย 1)
+        registry คือแคชโมเดลสำหรับ detect_custom_objects (ค่าเริ่มต้นใช้ model_registry ร่วมกัน)
+        cache_ttl คืออายุ (วินาที) ของผลนับที่แคชไว้สำหรับภาพที่เกือบเหมือนเดิม (0 = ไม่ใช้แคช)
+        backend คือ 'ultralytics' หรือ 'onnx' (ค่าเริ่มต้นเลือกตามนามสกุลไฟล์) threads และ int8 ใช้กับ ONNX Runtime
+        """
+        if max_pending < 1: raise ValueError(f"max_pending must be at least 1: {max_pending}")
+        self.workers, self.max_pending, self.model_path = workers, max_pending, model_path
+        self.cache = DetectionCache(cache_size, cache_ttl) if cache_ttl > 0 else None
+        self.registry = registry if registry is not None else model_registry
+        self._pool, self._pending = None, []
+        self._lock = threading.Lock()       # ป้องกันคิวงานของ detect_async
+        self._model_lock = threading.Lock() # โมเดลไม่รองรับการเรียกพร้อมกันหลาย Thread
         try:
-            from ultralytics import YOLO
-            self.model = YOLO(model_path) # โหลดไฟล์ Weight ของโมเดล (.pt)
+            self.backend = load_backend(model_path, backend, threads, int8)
+            self.model, self.names = getattr(self.backend, 'model', None), self.backend.names
             self.enabled = True
-            print(f"load model done: {model_path}")
-        except ImportError:
-            # กรณีที่ยังไม่ได้ติดตั้ง Library ultralytics
-            print("Can't import ultralytics, plese type this first pip install ultralytics")
+            print(f"load model done: {model_path} ({self.backend.name})")
+        except ImportError as e:
+            # กรณีที่ยังไม่ได้ติดตั้ง Library ultralytics (หรือ onnxruntime สำหรับไฟล์ .onnx)
+            print(f"Can't import {e.name or 'ultralytics'}, plese type this first pip install {e.name or 'ultralytics'}")
             self.enabled = False
         except Exception as e:
             # กรณีโหลดไฟล์โมเดลไม่สำเร็จ
@@ -22,31 +328,148 @@ class YOLODetector:
             self.enabled = False
     
     def detect_from_image(self, image_path, confidence=0.5):
-        """ฟังก์ชันตรวจจับวัตถุจากไฟล์รูปภาพ (ใช้ในหน้า Scan)"""
+        """ฟังก์ชันตรวจจับวัตถุจากไฟล์รูปภาพ"""
+        return self.detect_from_array(image_path, confidence)
+
+    def detect_from_array(self, frame, confidence=0.5):
+        """ฟังก์ชันตรวจจับวัตถุจากภาพในหน่วยความจำ (NumPy BGR, HxWx3) โดยไม่ต้องเขียนไฟล์ลงดิสก์ (ใช้ในหน้า Scan)
+
+        รับ path ของไฟล์ได้เช่นกัน เพราะโมเดลรับได้ทั้งสองแบบ
+        """
         if not self.enabled:
             return self._mock_detection()
         
         try:
-            # ส่งรูปภาพให้โมเดลประมวลผลตามค่าความเชื่อมั่น (confidence) ที่กำหนด
-            results = self.model(image_path, conf=confidence)
-            
-            # เก็บชื่อวัตถุที่ตรวจจับได้ลงใน List
-            detected_objects = []
-            for result in results:
-                boxes = result.boxes
-                for box in boxes:
-                    class_id = int(box.cls[0]) # รหัสคลาสสินค้า
-                    class_name = result.names[class_id] # แปลงรหัสเป็นชื่อสินค้า
-                    detected_objects.append(class_name)
+            return self._cached(('array', confidence), frame, lambda: self._infer_counts(frame, confidence))
             
-            # สรุปจำนวนวัตถุแต่ละชนิดโดยใช้ Counter
-            object_counts = Counter(detected_objects)
+        except Exception as e:
+            print(f"detection error: {e}")
+            return self._mock_detection()
+
+    def _predict(self, source, confidence, stage='detect.model'):
+        """ส่งภาพ (หรือ List ของภาพ) ให้ Backend ประมวลผลตามค่าความเชื่อมั่น คืนค่า List ของ Detections ต่อภาพ"""
+        with self._model_lock, trace.span(stage): dets = self.backend.predict(source, confidence)
+        if trace.enabled and dets:
+            # เวลา preprocess/inference/postprocess (มิลลิวินาทีต่อภาพ) ที่ Backend วัดไว้
+            for k, ms in dets[0].speed.items():
+                if ms is not None: trace.record(f"detect.{k}", ms / 1000)
+        return dets
+
+    def _infer_counts(self, frame, confidence):
+        dets = self._predict(frame, confidence)
+        return dets[0].counts() if dets else {} # คืนค่าเป็น Dictionary เช่น {'Milk': 2, 'Bread': 1}
+
+    def _cached(self, kind, frame, detect):
+        """คืนผลนับจากแคชถ้าเคยตรวจภาพที่เกือบเหมือนกันภายใน TTL ไม่เช่นนั้นเรียก detect() แล้วเก็บผล
+        (ใช้เฉพาะภาพ NumPy ไม่ใช้กับ path ของไฟล์)"""
+        if self.cache is None or not isinstance(frame, np.ndarray): return detect()
+        key, h = (self.model_path, *kind), dhash(frame)
+        res = self.cache.get(key, h)
+        if res is None:
+            res = detect(); self.cache.put(key, h, res)
+        return dict(res)
+
+    def detect_boxes(self, frame, confidence=0.5):
+        """ตรวจจับวัตถุแล้วคืนค่ากรอบของแต่ละชิ้น [(ชื่อคลาส, ความเชื่อมั่น, (x1, y1, x2, y2)), ...] สำหรับระบบติดตามวัตถุ"""
+        if not self.enabled:
+            return [] # Mock ไม่มีตำแหน่งจริง จึงไม่มีกรอบให้ติดตาม
+        
+        try:
+            return [b for d in self._predict(frame, confidence) for b in d.boxes()]
             
-            return dict(object_counts) # คืนค่าเป็น Dictionary เช่น {'Milk': 2, 'Bread': 1}
+        except Exception as e:
+            print(f"detection error: {e}")
+            return []
+
+    def detect_tiled_boxes(self, frame, confidence=0.5, tile=640, overlap=0.2, iou_threshold=0.5):
+        """ตรวจจับภาพความละเอียดสูงแบบแบ่ง Tile ที่ซ้อนกัน ส่งทุก Tile เข้าโมเดลเป็น Batch เดียว
+        แล้วรวมกรอบที่ซ้ำกันข้าม Tile ด้วย NMS คืนค่าเหมือน detect_boxes
+        """
+        if not self.enabled: return []
+        try:
+            return self._tiled_boxes(frame, confidence, tile, overlap, iou_threshold)
+        except Exception as e:
+            print(f"detection error: {e}")
+            return []
+
+    def _tiled_boxes(self, frame, confidence, tile, overlap, iou_threshold):
+        """งานจริงของ detect_tiled_boxes ที่ปล่อย Exception ของโมเดลออกไป (ผลที่ล้มเหลวจะได้ไม่ถูกเก็บในแคช)"""
+        h, w = frame.shape[:2]
+        offsets = tile_offsets(w, h, tile, overlap)
+        tiles = [frame[y:y + tile, x:x + tile] for x, y in offsets] # เป็น View ไม่คัดลอกภาพ
+        results = self._predict(tiles, confidence, 'detect.tiled_model')
+
+        dets, tile_of = [], []
+        for t, ((x, y), r) in enumerate(zip(offsets, results)):
+            boxes = r.boxes()
+            dets += [(n, s, (b[0] + x, b[1] + y, b[2] + x, b[3] + y)) for n, s, b in boxes]; tile_of += [t] * len(boxes)
+        if len(offsets) == 1 or not dets: return dets
+        names = sorted({n for n, _, _ in dets})
+        with trace.span('detect.tiled_nms'):
+            # IoS เฉพาะกรอบต่าง Tile (ชิ้นที่ถูกตัดครึ่งที่ขอบ) ภายใน Tile เดียวกันใช้ IoU แบบ NMS ปกติ
+            keep = nms([b for _, _, b in dets], [s for _, s, _ in dets], iou_threshold,
+                       classes=[names.index(n) for n, _, _ in dets], metric='ios', groups=tile_of)
+        return [dets[i] for i in keep]
+
+    def detect_tiled(self, frame, confidence=0.5, tile=640, overlap=0.2, iou_threshold=0.5):
+        """นับวัตถุจากภาพความละเอียดสูงด้วยการแบ่ง Tile (เหมาะกับชั้นวางที่มีของชิ้นเล็กแน่น ๆ)"""
+        if not self.enabled:
+            return self._mock_detection()
+        
+        try:
+            return self._cached(('tiled', confidence, tile, overlap, iou_threshold), frame,
+                                lambda: dict(Counter(n for n, _, _ in self._tiled_boxes(frame, confidence, tile, overlap, iou_threshold))))
             
         except Exception as e:
             print(f"detection error: {e}")
             return self._mock_detection()
+
+    def detect_batch(self, frames, confidence=0.5):
+        """ตรวจจับหลายภาพในการเรียกโมเดลครั้งเดียว (Batch) คืนค่า List ของ Dictionary จำนวนวัตถุ ตามลำดับภาพ"""
+        if not frames: return []
+        if not self.enabled:
+            return [self._mock_detection() for _ in frames]
+        
+        try:
+            return [d.counts() for d in self._predict(list(frames), confidence, 'detect.batch_model')]
+            
+        except Exception as e:
+            print(f"detection error: {e}")
+            return [self._mock_detection() for _ in frames]
+
+    def detect_batch_boxes(self, frames, confidence=0.5):
+        """เหมือน detect_batch แต่คืนทั้งจำนวนและกรอบของแต่ละภาพ [(counts, boxes), ...] จากการเรียกโมเดลครั้งเดียว
+
+        ไม่ใช้ผล Mock: ถ้ายังไม่ได้โหลดโมเดลจะ raise RuntimeError และข้อผิดพลาดของโมเดลส่งต่อให้ผู้เรียก
+        (ผลนับสุ่มต้องไม่ถูกบันทึกเป็นสต็อกจริง)
+        """
+        if not frames: return []
+        if not self.enabled: raise RuntimeError(f"model not loaded: {self.model_path}")
+        return [(d.counts(), d.boxes()) for d in self._predict(list(frames), confidence, 'detect.batch_model')]
+
+    @staticmethod
+    def frame_from_rgba(pixels, width, height):
+        """แปลง Buffer RGBA ของ Kivy Texture เป็นภาพ BGR แบบ OpenCV โดยไม่คัดลอกข้อมูล
+
+        Texture ของ Kivy เก็บแถวจากล่างขึ้นบน จึงกลับแนวตั้งด้วย [::-1] และสลับ RGBA เป็น BGR ด้วย [..., 2::-1]
+        ทั้งสองขั้นเป็นเพียง View (stride) บน Buffer เดิม
+        """
+        rgba = np.frombuffer(pixels, dtype=np.uint8).reshape(height, width, 4)
+        return rgba[::-1, :, 2::-1]
+
+    def _count_results(self, results):
+        """สรุปจำนวนวัตถุแต่ละชนิดจากผลลัพธ์ของโมเดล"""
+        # เก็บชื่อวัตถุที่ตรวจจับได้ลงใน List
+        detected_objects = []
+        for result in results:
+            boxes = result.boxes
+            for box in boxes:
+                class_id = int(box.cls[0]) # รหัสคลาสสินค้า
+                class_name = result.names[class_id] # แปลงรหัสเป็นชื่อสินค้า
+                detected_objects.append(class_name)
+        
+        # สรุปจำนวนวัตถุแต่ละชนิดโดยใช้ Counter
+        return dict(Counter(detected_objects))
     
     def detect_from_camera(self, frame, confidence=0.5):
         """ฟังก์ชันตรวจจับวัตถุจากเฟรมวิดีโอแบบ Real-time"""
@@ -55,24 +478,13 @@ class YOLODetector:
         
         try:
             # ประมวลผลภาพจากเฟรมกล้อง
-            results = self.model(frame, conf=confidence)
+            dets = self._predict(frame, confidence)[0]
             
             # วาดกรอบสี่เหลี่ยม (Bounding Box) และชื่อคลาสลงบนภาพ
-            annotated_frame = results[0].plot()
+            annotated_frame = dets.plot(frame)
             
-            # วนลูปนับจำนวนวัตถุที่พบในเฟรม
-            detected_objects = []
-            for result in results:
-                boxes = result.boxes
-                for box in boxes:
-                    class_id = int(box.cls[0])
-                    class_name = result.names[class_id]
-                    detected_objects.append(class_name)
-            
-            object_counts = Counter(detected_objects)
-            
-            # คืนค่าทั้งภาพที่วาดกรอบแล้ว และจำนวนสินค้าที่นับได้
-            return annotated_frame, dict(object_counts)
+            # คืนค่าทั้งภาพที่วาดกรอบแล้ว และจำนวนสินค้าที่นับได้ในเฟรม
+            return annotated_frame, dets.counts()
             
         except Exception as e:
             print(f"detection error: {e}")
@@ -81,27 +493,69 @@ class YOLODetector:
     def detect_custom_objects(self, image_path, custom_model_path, confidence=0.5):
         """ฟังก์ชันพิเศษสำหรับเลือกโหลดโมเดลอื่นๆ มาใช้ตรวจจับเฉพาะกิจ"""
         try:
-            from ultralytics import YOLO
-            custom_model = YOLO(custom_model_path)
-            
-            results = custom_model(image_path, conf=confidence)
+            # ใช้โมเดลที่โหลดไว้แล้วในแคช โหลดใหม่เฉพาะครั้งแรกหรือเมื่อไฟล์ถูกแก้ไข
+            custom_model = self.registry.get(custom_model_path)
             
-            detected_objects = []
-            for result in results:
-                boxes = result.boxes
-                for box in boxes:
-                    class_id = int(box.cls[0])
-                    class_name = result.names[class_id]
-                    detected_objects.append(class_name)
-            
-            object_counts = Counter(detected_objects)
-            
-            return dict(object_counts)
+            with self._model_lock: results = custom_model(image_path, conf=confidence)
+            return self._count_results(results)
             
         except Exception as e:
             print(f"An error occurred when using the custom model: {e}")
             return self._mock_detection()
     
+    def detect_async(self, source, callback=None, confidence=0.5, detect=None):
+        """ส่งภาพไปตรวจจับใน Thread เบื้องหลัง คืนค่าเป็น Future และเรียก callback(ผลลัพธ์) บน Kivy Clock เมื่อเสร็จ
+
+        ถ้ามีงานค้างถึง max_pending งานเก่าที่ยังไม่เริ่มจะถูกยกเลิก (ถ้าทุกงานกำลังรัน จะทิ้งผลของงานที่เก่าที่สุดแทน)
+        detect คือฟังก์ชันตรวจจับที่จะใช้ ค่าเริ่มต้นคือ detect_from_image
+        """
+        detect = detect or self.detect_from_image
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='yolo')
+            self._pending = [f for f in self._pending if not f.done() and not f.stale]
+            while len(self._pending) >= self.max_pending:
+                # ยกเลิกงานที่ยังรอคิวก่อน เพราะงานที่กำลังรันอยู่ใกล้เสร็จกว่า
+                old = next((f for f in self._pending if f.cancel()), self._pending[0])
+                old.stale = True; self._pending.remove(old)
+            if trace.enabled: fut = self._pool.submit(self._traced, detect, source, confidence, time.perf_counter())
+            else: fut = self._pool.submit(detect, source, confidence)
+            fut.stale = False
+            self._pending.append(fut)
+        if callback: fut.add_done_callback(lambda f: self._deliver(f, callback))
+        return fut
+
+    @staticmethod
+    def _traced(detect, source, confidence, submitted):
+        """รันงานตรวจจับพร้อมบันทึกเวลารอคิว (detect.queue) และเวลาตรวจจับทั้งหมด (detect.total)"""
+        t0 = time.perf_counter(); trace.record('detect.queue', t0 - submitted)
+        try: return detect(source, confidence)
+        finally: trace.record('detect.total', time.perf_counter() - t0)
+
+    def _deliver(self, fut, callback):
+        """ส่งผลลัพธ์กลับไปเรียก callback บน Main Thread ของ Kivy (ข้ามงานที่ถูกยกเลิกหรือล้าสมัย)"""
+        if fut.cancelled() or fut.stale: return
+        if fut.exception() is not None:
+            print(f"detection error: {fut.exception()}")
+            return
+        res = fut.result()
+        try:
+            from kivy.clock import Clock
+            if trace.enabled:
+                # เวลาตั้งแต่ตรวจจับเสร็จจนถึง callback บน Main Thread (รอเฟรมถัดไปของ Kivy)
+                done = time.perf_counter()
+                Clock.schedule_once(lambda dt: None if fut.stale else (trace.record('detect.deliver', time.perf_counter() - done), callback(res)))
+            else: Clock.schedule_once(lambda dt: None if fut.stale else callback(res))
+        except ImportError:
+            # ใช้งานนอกแอป Kivy (เช่นสคริปต์) เรียก callback จาก Thread ที่ตรวจจับเสร็จได้เลย
+            callback(res)
+
+    def shutdown(self):
+        """ปิด Thread Pool และยกเลิกงานที่ยังค้างอยู่"""
+        with self._lock:
+            if self._pool: self._pool.shutdown(wait=False, cancel_futures=True); self._pool = None
+            self._pending = []
+
     def _mock_detection(self):
         """ระบบจำลองผลการตรวจจับ (Mock Data) กรณีที่ AI ทำงานไม่ได้"""
         import random
@@ -111,6 +565,46 @@ class YOLODetector:
         return {product: count}
 
 
+# --- ประมวลผลภาพต่อเนื่องแบบทิ้งเฟรมเก่า (Live Pipeline) ---
+class LatestFrameWorker:
+    """Thread เดียวที่ประมวลผลเฟรมล่าสุดเสมอ: put() เขียนทับช่องรอเพียงช่องเดียว เฟรมที่ยังไม่ถูกหยิบจะถูกทิ้ง
+
+    ทำให้งานไม่สะสมเป็นคิวเมื่อโมเดลช้ากว่ากล้อง callback(ผลลัพธ์, เวลาที่ใช้เป็นวินาที) ถูกเรียกบน Main Thread ของ Kivy
+    """
+    def __init__(self, process, callback):
+        self.process, self.callback = process, callback
+        self.dropped = 0 # จำนวนเฟรมที่ถูกเฟรมใหม่กว่าเขียนทับก่อนได้ประมวลผล
+        self._slot, self._running = None, True
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name='yolo-live', daemon=True)
+        self._thread.start()
+
+    def put(self, frame):
+        with self._cond:
+            if self._slot is not None: self.dropped += 1
+            self._slot = frame; self._cond.notify()
+
+    def stop(self):
+        with self._cond: self._running, self._slot = False, None; self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and self._slot is None: self._cond.wait()
+                if not self._running: return
+                frame, self._slot = self._slot, None
+            t0 = time.perf_counter()
+            try: res = self.process(frame)
+            except Exception as e:
+                print(f"detection error: {e}"); continue
+            latency = time.perf_counter() - t0
+            if not self._running: return
+            try:
+                from kivy.clock import Clock
+                Clock.schedule_once(lambda dt: self._running and self.callback(res, latency))
+            except ImportError: self.callback(res, latency)
+
+
 # --- ส่วนทดสอบการทำงานของโมดูล ---
 if __name__ == "__main__":
     # สร้าง instance ของ detector และทดสอบโหลดโมเดล